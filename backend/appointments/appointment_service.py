@@ -5,29 +5,17 @@ import json
 import uuid
 from datetime import datetime, timedelta
 from django.http import JsonResponse
+from .fast_json import MongoJsonResponse
 from django.views.decorators.csrf import csrf_exempt
-from pymongo import MongoClient, ASCENDING, DESCENDING
-from bson import json_util
+from pymongo import ASCENDING, DESCENDING, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from .mongo_utils import LazyMongoDatabase
+from . import availability_engine, booking, mongo_stats
+from .appointment_store import doctor_of, patient_of, prepare_update
+from .medical_snapshot import snapshot_of
 
-# MongoDB setup
-MONGO_URI = "mongodb://localhost:27017/"
-DATABASE_NAME = "healthcare_appointment_system"
-
-client = MongoClient(MONGO_URI)
-db = client[DATABASE_NAME]
-
-# Create indexes for better performance
-db.appointments.create_index([("doctor_id", ASCENDING), ("date", ASCENDING)])
-db.appointments.create_index([("patient_id", ASCENDING), ("date", ASCENDING)])
-db.appointments.create_index([("status", ASCENDING)])
-db.doctors.create_index([("specialization", ASCENDING)])
-db.doctors.create_index([("is_available", ASCENDING)])
-db.patients.create_index([("user_id", ASCENDING)])
-db.clinic_staff.create_index([("email", ASCENDING)], unique=True)
-
-# Helper function to parse MongoDB documents to JSON
-def parse_json(data):
-    return json.loads(json_util.dumps(data))
+# MongoDB setup - shares the process-wide connection pool
+db = LazyMongoDatabase()
 
 def book_appointment(patient_id, doctor_id, appointment_date, notes="", medical_data=None):
     """
@@ -54,16 +42,6 @@ def book_appointment(patient_id, doctor_id, appointment_date, notes="", medical_
         return False, "Cannot book appointments in the past"
     
     try:
-        # Check if the time slot is already booked
-        existing = db.appointments.find_one({
-            "doctor_id": doctor_id,
-            "date": appointment_date,
-            "status": "scheduled"
-        })
-        
-        if existing:
-            return False, "This time slot is already booked"
-        
         # Get patient and doctor info
         patient = db.patients.find_one({"id": patient_id}) or db.patients.find_one({"user_id": patient_id})
         doctor = db.doctors.find_one({"id": doctor_id})
@@ -90,13 +68,13 @@ def book_appointment(patient_id, doctor_id, appointment_date, notes="", medical_
         
         # Prepare medical data to embed
         if not medical_data:
-            # Extract from patient's medical info
-            patient_medical_info = patient.get("medical_info", {})
+            # Taken from the patient's medical snapshot
+            snapshot = snapshot_of(patient)
             medical_data = {
-                "blood_type": patient_medical_info.get("blood_type", ""),
-                "allergies": patient_medical_info.get("allergies", []),
-                "medications": patient_medical_info.get("medications", []),
-                "medical_conditions": patient_medical_info.get("chronic_diseases", []),
+                "blood_type": snapshot["blood_type"],
+                "allergies": snapshot["allergies"],
+                "medications": snapshot["medications"],
+                "medical_conditions": snapshot["medical_conditions"],
                 "reason_for_visit": notes
             }
         
@@ -104,7 +82,8 @@ def book_appointment(patient_id, doctor_id, appointment_date, notes="", medical_
         appointment_id = str(ObjectId())
         appointment = {
             "id": appointment_id,
-            "patient_id": patient_id,
+            # Appointments reference the patient's user, not the profile
+            "patient_id": patient.get("user_id") or patient_id,
             "doctor_id": doctor_id,
             "date": appointment_date,
             "status": "scheduled",
@@ -116,25 +95,21 @@ def book_appointment(patient_id, doctor_id, appointment_date, notes="", medical_
             "updated_at": datetime.now()
         }
         
-        # Insert the appointment
-        db.appointments.insert_one(appointment)
-        
-        # Store booking history in MongoDB
+        # Booking history entry, written together with the appointment
         booking_entry = {
             'appointment_id': appointment_id,
             'patient_name': patient_info["name"],
             'date': appointment_date
         }
         
-        # Update doctor's booking history in MongoDB
-        db.doctor_booking_history.update_one(
-            {'doctor_id': doctor_id},
-            {'$push': {'bookings': booking_entry}},
-            upsert=True
-        )
+        # Insert the appointment; the unique slot index rejects a double booking
+        booking.insert_appointment(appointment, booking_entry)
+        mongo_stats.record_appointment_change(after=appointment)
         
         return True, appointment_id
                 
+    except booking.SlotTaken as e:
+        return False, str(e)
     except Exception as e:
         return False, f"Error booking appointment: {str(e)}"
 
@@ -150,65 +125,8 @@ def get_available_slots(doctor_id, date):
         list: List of available time slots
     """
     try:
-        # Get doctor
-        doctor = db.doctors.find_one({"id": doctor_id})
-        if not doctor:
-            return []
-        
-        # Check if doctor is available on this day
-        day_of_week = date.weekday()
-        available_days = doctor.get("available_days", [])
-        
-        # Convert day numbers to day names if needed
-        day_names = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
-        day_name = day_names[day_of_week]
-        
-        if str(day_of_week) not in available_days and day_name not in available_days:
-            return []
-        
-        # Check if doctor has an exception for this date
-        exception = db.doctor_exceptions.find_one({
-            "doctor_id": doctor_id,
-            "date": date.strftime("%Y-%m-%d")
-        })
-        
-        if exception:
-            return []
-        
-        # Define working hours (e.g., 9 AM to 5 PM)
-        start_hour = 9
-        end_hour = 17
-        
-        # Define slot duration in minutes
-        slot_duration = 30
-        
-        # Get booked appointments for this doctor on this date
-        date_start = datetime.combine(date, datetime.min.time())
-        date_end = datetime.combine(date, datetime.max.time())
-        
-        booked_appointments = list(db.appointments.find({
-            "doctor_id": doctor_id,
-            "date": {"$gte": date_start, "$lte": date_end},
-            "status": "scheduled"
-        }))
-        
-        # Extract booked times
-        booked_times = [appointment["date"].time() for appointment in booked_appointments]
-        
-        # Generate all possible slots
-        all_slots = []
-        current_time = datetime.combine(date, datetime.min.time().replace(hour=start_hour))
-        end_time = datetime.combine(date, datetime.min.time().replace(hour=end_hour))
-        
-        while current_time < end_time:
-            # Check if this slot is booked
-            if current_time.time() not in booked_times:
-                all_slots.append(current_time)
-            
-            # Move to next slot
-            current_time = current_time.replace(minute=current_time.minute + slot_duration)
-        
-        return all_slots
+        slots = availability_engine.get_free_slots(doctor_id, date, date + timedelta(days=1))
+        return [slot_start for slot_start, _ in slots]
     
     except Exception as e:
         print(f"Error getting available slots: {str(e)}")
@@ -239,7 +157,7 @@ def cancel_appointment(appointment_id, user_id):
             return False, "User not found"
         
         # Check if user has permission to cancel this appointment
-        if user.get("role") != "admin" and user_id != appointment["patient_id"] and user_id != appointment["doctor_id"]:
+        if user.get("role") != "admin" and user_id != patient_of(appointment) and user_id != doctor_of(appointment):
             return False, "You do not have permission to cancel this appointment"
         
         # Update appointment status
@@ -247,6 +165,7 @@ def cancel_appointment(appointment_id, user_id):
             {"id": appointment_id},
             {"$set": {"status": "cancelled", "updated_at": datetime.now()}}
         )
+        mongo_stats.record_appointment_change(appointment, {**appointment, "status": "cancelled"})
         
         return True, "Appointment cancelled successfully"
     
@@ -279,29 +198,24 @@ def reschedule_appointment(appointment_id, new_date, user_id):
             return False, "User not found"
         
         # Check if user has permission to reschedule this appointment
-        if user.get("role") != "admin" and user_id != appointment["patient_id"] and user_id != appointment["doctor_id"]:
+        if user.get("role") != "admin" and user_id != patient_of(appointment) and user_id != doctor_of(appointment):
             return False, "You do not have permission to reschedule this appointment"
         
         # Check if new date is in the past
         if new_date < timezone.now():
             return False, "Cannot reschedule to a past date"
         
-        # Check if the time slot is already booked
-        existing = db.appointments.find_one({
-            "id": {"$ne": appointment_id},  # Exclude current appointment
-            "doctor_id": appointment["doctor_id"],
-            "date": new_date,
-            "status": "scheduled"
-        })
-        
-        if existing:
-            return False, "This time slot is already booked"
-        
-        # Update appointment date
-        db.appointments.update_one(
-            {"id": appointment_id},
-            {"$set": {"date": new_date, "updated_at": datetime.now()}}
-        )
+        # Update appointment date; the unique slot index rejects a taken slot
+        # (checked before the update while the index is missing)
+        try:
+            booking.check_slot_change(db, appointment, {"date": new_date})
+            db.appointments.update_one(
+                {"id": appointment_id},
+                {"$set": {"date": new_date, "updated_at": datetime.now()}}
+            )
+        except (booking.SlotTaken, DuplicateKeyError):
+            return False, booking.SLOT_TAKEN_MESSAGE
+        mongo_stats.record_appointment_change(appointment, {**appointment, "date": new_date})
         
         return True, "Appointment rescheduled successfully"
     
@@ -333,12 +247,12 @@ def get_appointment_details(appointment_id, user_id):
             return False, "User not found"
         
         # Check if user has permission to view this appointment
-        if user.get("role") != "admin" and user_id != appointment["patient_id"] and user_id != appointment["doctor_id"]:
+        if user.get("role") != "admin" and user_id != patient_of(appointment) and user_id != doctor_of(appointment):
             return False, "You do not have permission to view this appointment"
         
         # Get additional information
-        patient = db.patients.find_one({"id": appointment["patient_id"]})
-        doctor = db.doctors.find_one({"id": appointment["doctor_id"]})
+        patient = db.patients.find_one({"user_id": patient_of(appointment)})
+        doctor = db.doctors.find_one({"id": doctor_of(appointment)})
         
         # Prepare detailed response
         details = {
@@ -406,6 +320,7 @@ def update_appointment_status(appointment_id, new_status, user_id, notes=None):
             {"id": appointment_id},
             {"$set": update_data}
         )
+        mongo_stats.record_appointment_change(appointment, {**appointment, **update_data})
         
         return True, f"Appointment status updated to {new_status}"
     
@@ -485,62 +400,28 @@ def get_appointment_statistics(doctor_id=None, start_date=None, end_date=None):
         dict: Appointment statistics
     """
     try:
-        # Build query
-        query = {}
-        
-        if doctor_id:
-            query["doctor_id"] = doctor_id
-        
-        if start_date and end_date:
-            query["date"] = {
-                "$gte": datetime.combine(start_date, datetime.min.time()),
-                "$lte": datetime.combine(end_date, datetime.max.time())
-            }
-        
-        # Get total appointments
-        total = db.appointments.count_documents(query)
-        
-        # Get appointments by status
-        scheduled = db.appointments.count_documents({**query, "status": "scheduled"})
-        completed = db.appointments.count_documents({**query, "status": "completed"})
-        cancelled = db.appointments.count_documents({**query, "status": "cancelled"})
-        no_show = db.appointments.count_documents({**query, "status": "no_show"})
-        
-        # Calculate completion rate
-        completion_rate = (completed / total) * 100 if total > 0 else 0
-        
-        # Calculate cancellation rate
-        cancellation_rate = ((cancelled + no_show) / total) * 100 if total > 0 else 0
-        
-        # Get appointments by day of week
-        days_of_week = {
-            0: "Monday",
-            1: "Tuesday",
-            2: "Wednesday",
-            3: "Thursday",
-            4: "Friday",
-            5: "Saturday",
-            6: "Sunday"
-        }
-        
-        day_stats = {}
-        for day_num, day_name in days_of_week.items():
-            day_query = query.copy()
-            day_query["date"] = {"$dayOfWeek": day_num + 1}  # MongoDB uses 1-7 for days of week
-            day_stats[day_name] = db.appointments.count_documents(day_query)
+        # One rollup read (or $facet aggregation) instead of a count per status/weekday
+        stats = mongo_stats.get_appointment_statistics(
+            doctor_id=doctor_id,
+            start_day=start_date.strftime('%Y-%m-%d') if start_date else None,
+            end_day=end_date.strftime('%Y-%m-%d') if end_date else None
+        )
+        by_status = stats["by_status"]
         
         # Prepare statistics
         statistics = {
-            "total": total,
+            "total": stats["total"],
             "by_status": {
-                "scheduled": scheduled,
-                "completed": completed,
-                "cancelled": cancelled,
-                "no_show": no_show
+                "scheduled": by_status.get("scheduled", 0),
+                "completed": by_status.get("completed", 0),
+                "cancelled": by_status.get("cancelled", 0),
+                "no_show": by_status.get("no_show", 0)
             },
-            "completion_rate": completion_rate,
-            "cancellation_rate": cancellation_rate,
-            "by_day_of_week": day_stats
+            "completion_rate": stats["completion_rate"],
+            "cancellation_rate": stats["cancellation_rate"],
+            "by_day_of_week": stats["by_weekday"],
+            "today": stats["today"],
+            "by_doctor": stats["by_doctor"]
         }
         
         return statistics
@@ -641,12 +522,9 @@ def appointments(request, id=None):
             appointments_cursor = db.appointments.find(query).sort('date', DESCENDING).skip(skip).limit(limit)
             appointments = list(appointments_cursor)
             
-            # Convert to JSON
-            appointments_json = parse_json(appointments)
-            
             # Add pagination metadata
             response_data = {
-                'appointments': appointments_json,
+                'appointments': appointments,
                 'pagination': {
                     'total': total_count,
                     'page': page,
@@ -655,7 +533,7 @@ def appointments(request, id=None):
                 }
             }
             
-            response = JsonResponse(response_data, safe=False)
+            response = MongoJsonResponse(response_data, safe=False)
             return add_cors_headers(response)
         
         # RETRIEVE
@@ -672,14 +550,11 @@ def appointments(request, id=None):
                 if user.get('role') == 'doctor':
                     doctor = db.doctors.find_one({'user_id': user['id']})
                 
-                if (doctor and doctor['id'] != appointment['doctor_id']) and user['id'] != appointment['patient_id']:
+                if (doctor and doctor['id'] != doctor_of(appointment)) and user['id'] != patient_of(appointment):
                     response = JsonResponse({'error': 'You do not have permission to view this appointment'}, status=403)
                     return add_cors_headers(response)
             
-            # Convert to JSON
-            appointment_json = parse_json(appointment)
-            
-            response = JsonResponse(appointment_json, safe=False)
+            response = MongoJsonResponse(appointment, safe=False)
             return add_cors_headers(response)
         
         # CREATE
@@ -714,10 +589,7 @@ def appointments(request, id=None):
                 # Get appointment
                 appointment = db.appointments.find_one({'id': result})
                 
-                # Convert to JSON
-                appointment_json = parse_json(appointment)
-                
-                response = JsonResponse(appointment_json, status=201)
+                response = MongoJsonResponse(appointment, status=201)
                 return add_cors_headers(response)
             else:
                 response = JsonResponse({'error': result}, status=400)
@@ -738,7 +610,7 @@ def appointments(request, id=None):
                     doctor = db.doctors.find_one({'user_id': user['id']})
                 
                 # Doctors can update appointment status and notes
-                if doctor and doctor['id'] == appointment['doctor_id']:
+                if doctor and doctor['id'] == doctor_of(appointment):
                     allowed_fields = ['status', 'notes', 'medical_data']
                     data = json.loads(request.body)
                     
@@ -752,20 +624,17 @@ def appointments(request, id=None):
                     # Update timestamp
                     update_data['updated_at'] = datetime.now()
                     
-                    # Update appointment
-                    db.appointments.update_one({'id': id}, {'$set': update_data})
-                    
-                    # Get updated appointment
-                    updated_appointment = db.appointments.find_one({'id': id})
+                    # Update appointment and get the updated document back
+                    updated_appointment = db.appointments.find_one_and_update(
+                        {'id': id}, {'$set': update_data}, return_document=ReturnDocument.AFTER
+                    )
+                    mongo_stats.record_appointment_change(appointment, updated_appointment)
                     
-                    # Convert to JSON
-                    appointment_json = parse_json(updated_appointment)
-                    
-                    response = JsonResponse(appointment_json)
+                    response = MongoJsonResponse(updated_appointment)
                     return add_cors_headers(response)
                 
                 # Patients can only reschedule or cancel their own appointments
-                elif user['id'] == appointment['patient_id']:
+                elif user['id'] == patient_of(appointment):
                     data = json.loads(request.body)
                     
                     # Patients can only update date or status (to cancel)
@@ -793,7 +662,7 @@ def appointments(request, id=None):
                         # Check if doctor has another appointment at the same time
                         conflicting_appointments = db.appointments.count_documents({
                             'id': {'$ne': id},  # Exclude current appointment
-                            'doctor_id': appointment['doctor_id'],
+                            'doctor_id': doctor_of(appointment),
                             'status': {'$nin': ['cancelled', 'completed']},
                             '$or': [
                                 # Appointment starts during existing appointment
@@ -812,16 +681,13 @@ def appointments(request, id=None):
                     # Update timestamp
                     update_data['updated_at'] = datetime.now()
                     
-                    # Update appointment
-                    db.appointments.update_one({'id': id}, {'$set': update_data})
-                    
-                    # Get updated appointment
-                    updated_appointment = db.appointments.find_one({'id': id})
+                    # Update appointment and get the updated document back
+                    updated_appointment = db.appointments.find_one_and_update(
+                        {'id': id}, {'$set': update_data}, return_document=ReturnDocument.AFTER
+                    )
+                    mongo_stats.record_appointment_change(appointment, updated_appointment)
                     
-                    # Convert to JSON
-                    appointment_json = parse_json(updated_appointment)
-                    
-                    response = JsonResponse(appointment_json)
+                    response = MongoJsonResponse(updated_appointment)
                     return add_cors_headers(response)
                 
                 else:
@@ -839,16 +705,13 @@ def appointments(request, id=None):
                 # Update timestamp
                 data['updated_at'] = datetime.now()
                 
-                # Update appointment
-                db.appointments.update_one({'id': id}, {'$set': data})
-                
-                # Get updated appointment
-                updated_appointment = db.appointments.find_one({'id': id})
-                
-                # Convert to JSON
-                appointment_json = parse_json(updated_appointment)
+                # Update appointment and get the updated document back
+                updated_appointment = db.appointments.find_one_and_update(
+                    {'id': id}, {'$set': prepare_update(data)}, return_document=ReturnDocument.AFTER
+                )
+                mongo_stats.record_appointment_change(appointment, updated_appointment)
                 
-                response = JsonResponse(appointment_json)
+                response = MongoJsonResponse(updated_appointment)
                 return add_cors_headers(response)
         
         # DELETE
@@ -860,7 +723,7 @@ def appointments(request, id=None):
                 return add_cors_headers(response)
             
             # Check if user has permission to delete this appointment
-            if user.get('role') != 'admin' and user['id'] != appointment['patient_id']:
+            if user.get('role') != 'admin' and user['id'] != patient_of(appointment):
                 response = JsonResponse({'error': 'You do not have permission to delete this appointment'}, status=403)
                 return add_cors_headers(response)
             
@@ -868,9 +731,11 @@ def appointments(request, id=None):
             if user.get('role') == 'admin':
                 # Admins can hard delete
                 db.appointments.delete_one({'id': id})
+                mongo_stats.record_appointment_change(before=appointment)
             else:
                 # Patients just mark as cancelled
                 db.appointments.update_one({'id': id}, {'$set': {'status': 'cancelled', 'updated_at': datetime.now()}})
+                mongo_stats.record_appointment_change(appointment, {**appointment, 'status': 'cancelled'})
             
             response = JsonResponse({'message': 'Appointment deleted successfully'})
             return add_cors_headers(response)
@@ -933,12 +798,9 @@ def clinic_staff(request, id=None):
             staff_cursor = db.clinic_staff.find().sort('name', ASCENDING).skip(skip).limit(limit)
             staff_list = list(staff_cursor)
             
-            # Convert to JSON
-            staff_json = parse_json(staff_list)
-            
             # Add pagination metadata
             response_data = {
-                'clinic_staff': staff_json,
+                'clinic_staff': staff_list,
                 'pagination': {
                     'total': total_count,
                     'page': page,
@@ -947,7 +809,7 @@ def clinic_staff(request, id=None):
                 }
             }
             
-            response = JsonResponse(response_data, safe=False)
+            response = MongoJsonResponse(response_data, safe=False)
             return add_cors_headers(response)
         
         # RETRIEVE
@@ -958,10 +820,7 @@ def clinic_staff(request, id=None):
                 response = JsonResponse({'error': 'Staff member not found'}, status=404)
                 return add_cors_headers(response)
             
-            # Convert to JSON
-            staff_json = parse_json(staff)
-            
-            response = JsonResponse(staff_json, safe=False)
+            response = MongoJsonResponse(staff, safe=False)
             return add_cors_headers(response)
         
         # CREATE
@@ -1001,10 +860,7 @@ def clinic_staff(request, id=None):
             # Insert staff member
             db.clinic_staff.insert_one(data)
             
-            # Convert to JSON
-            staff_json = parse_json(data)
-            
-            response = JsonResponse(staff_json, status=201)
+            response = MongoJsonResponse(data, status=201)
             return add_cors_headers(response)
         
         # UPDATE
@@ -1037,10 +893,7 @@ def clinic_staff(request, id=None):
             # Get updated staff member
             updated_staff = db.clinic_staff.find_one({'id': id})
             
-            # Convert to JSON
-            staff_json = parse_json(updated_staff)
-            
-            response = JsonResponse(staff_json)
+            response = MongoJsonResponse(updated_staff)
             return add_cors_headers(response)
         
         # DELETE
@@ -1121,87 +974,17 @@ def doctors_availability(request, doctor_id):
             start_date = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
             end_date = start_date + timedelta(days=7)
         else:
-            start_date = datetime.fromisoformat(start_date_str.replace('Z', '+00:00'))
-            end_date = datetime.fromisoformat(end_date_str.replace('Z', '+00:00'))
+            start_date = datetime.fromisoformat(start_date_str.replace('Z', '+00:00')).replace(tzinfo=None)
+            end_date = datetime.fromisoformat(end_date_str.replace('Z', '+00:00')).replace(tzinfo=None)
         
-        # Get doctor's working hours
-        working_hours = doctor.get('working_hours', {
-            'monday': {'start': '09:00', 'end': '17:00'},
-            'tuesday': {'start': '09:00', 'end': '17:00'},
-            'wednesday': {'start': '09:00', 'end': '17:00'},
-            'thursday': {'start': '09:00', 'end': '17:00'},
-            'friday': {'start': '09:00', 'end': '17:00'},
-            'saturday': None,
-            'sunday': None
-        })
-        
-        # Get doctor's appointments in the date range
-        appointments = list(db.appointments.find({
-            'doctor_id': doctor_id,
-            'status': {'$nin': ['cancelled']},
-            'date': {'$gte': start_date, '$lt': end_date}
-        }))
-        
-        # Generate available slots
-        available_slots = []
-        current_date = start_date
+        # Past slots can't be booked
+        start_date = max(start_date, datetime.now())
         
-        while current_date < end_date:
-            day_name = current_date.strftime('%A').lower()
-            day_hours = working_hours.get(day_name)
-            
-            if day_hours:
-                # Parse working hours
-                start_hour, start_minute = map(int, day_hours['start'].split(':'))
-                end_hour, end_minute = map(int, day_hours['end'].split(':'))
-                
-                day_start = current_date.replace(hour=start_hour, minute=start_minute, second=0, microsecond=0)
-                day_end = current_date.replace(hour=end_hour, minute=end_minute, second=0, microsecond=0)
-                
-                # Skip if day is already past
-                if day_end < datetime.now():
-                    current_date = current_date + timedelta(days=1)
-                    continue
-                
-                # Generate slots (30-minute intervals)
-                slot_time = day_start
-                while slot_time < day_end:
-                    slot_end = slot_time + timedelta(minutes=30)
-                    
-                    # Check if slot conflicts with any appointment
-                    is_available = True
-                    for appointment in appointments:
-                        appt_time = appointment['date']
-                        appt_end = appt_time + timedelta(minutes=30)
-                        
-                        if (slot_time >= appt_time and slot_time < appt_end) or \
-                           (slot_end > appt_time and slot_end <= appt_end) or \
-                           (slot_time <= appt_time and slot_end >= appt_end):
-                            is_available = False
-                            break
-                    
-                    # Check if we've reached daily patient limit
-                    day_start_check = current_date.replace(hour=0, minute=0, second=0, microsecond=0)
-                    day_end_check = day_start_check + timedelta(days=1)
-                    
-                    daily_appointments = db.appointments.count_documents({
-                        'doctor_id': doctor_id,
-                        'status': {'$nin': ['cancelled']},
-                        'date': {'$gte': day_start_check, '$lt': day_end_check}
-                    })
-                    
-                    if daily_appointments >= doctor.get('daily_patient_limit', 20):
-                        is_available = False
-                    
-                    if is_available:
-                        available_slots.append({
-                            'start': slot_time.isoformat(),
-                            'end': slot_end.isoformat()
-                        })
-                    
-                    slot_time = slot_end
-            
-            current_date = current_date + timedelta(days=1)
+        schedule = availability_engine.load_schedules([doctor], start_date, end_date)[doctor_id]
+        available_slots = [
+            {'start': slot_start.isoformat(), 'end': slot_end.isoformat()}
+            for slot_start, slot_end in schedule.iter_free_slots(start_date, end_date)
+        ]
         
         response = JsonResponse({'available_slots': available_slots})
         return add_cors_headers(response)
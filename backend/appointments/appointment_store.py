@@ -0,0 +1,198 @@
+# appointments/appointment_store.py
+"""
+Canonical appointment fields.
+
+Appointments used to name their doctor and patient ``doctor``/``patient``
+(the API) or ``doctor_id``/``patient_id`` (appointment_service), and the
+notification scheduler read the start time from ``appointment_datetime``
+as well as ``date``. The canonical fields are:
+
+    doctor_id   Doctor profile id
+    patient_id  The patient's user id
+    date        Start time
+
+Every write goes through prepare_appointment or prepare_update, so the
+canonical fields are always present, and every query filters on them
+(doctor_filter, patient_filter) so it can use the compound indexes on
+doctor_id/patient_id. ``doctor`` and ``patient`` are still written as
+copies because API clients read them.
+
+Documents written before this are brought into shape by
+``manage.py normalize_appointments`` (normalize_batch below). Until its
+checkpoint in migration_checkpoints says it has completed, the filters
+also match the old ``doctor``/``patient`` fields with an $or, so older
+appointments stay visible; whether it has completed is re-read at most
+every NORMALIZATION_RECHECK_SECONDS.
+"""
+import threading
+import time
+
+from pymongo import ASCENDING, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from .mongo_utils import get_mongodb_database
+
+# canonical field -> copy kept for API clients
+FIELD_ALIASES = {
+    'doctor_id': 'doctor',
+    'patient_id': 'patient',
+}
+
+# Start time field read by the old notification scheduler
+LEGACY_DATE_FIELD = 'appointment_datetime'
+
+# normalize_appointments' entry in migration_checkpoints
+CHECKPOINT_ID = 'normalize_appointments'
+NORMALIZATION_RECHECK_SECONDS = 60
+
+_normalization_lock = threading.Lock()
+_normalization = {'complete': False, 'checked_at': None}
+
+def prepare_appointment(appointment):
+    """Set the canonical fields (and their copies) on a new appointment, in place"""
+    for canonical, alias in FIELD_ALIASES.items():
+        value = appointment.get(canonical) or appointment.get(alias)
+        if value:
+            appointment[canonical] = value
+            appointment[alias] = value
+    legacy_date = appointment.pop(LEGACY_DATE_FIELD, None)
+    if not appointment.get('date') and legacy_date:
+        appointment['date'] = legacy_date
+    return appointment
+
+def prepare_update(fields):
+    """A copy of the $set fields of an update with canonical fields and copies in step"""
+    fields = dict(fields)
+    for canonical, alias in FIELD_ALIASES.items():
+        if canonical in fields or alias in fields:
+            value = fields[canonical] if canonical in fields else fields[alias]
+            fields[canonical] = value
+            fields[alias] = value
+    if LEGACY_DATE_FIELD in fields:
+        legacy_date = fields.pop(LEGACY_DATE_FIELD)
+        fields.setdefault('date', legacy_date)
+    return fields
+
+def _match(field, value):
+    if isinstance(value, (list, tuple, set)):
+        return {field: {'$in': list(value)}}
+    return {field: value}
+
+def normalization_complete():
+    """True once normalize_appointments has brought every stored appointment to the canonical fields"""
+    now = time.monotonic()
+    with _normalization_lock:
+        checked_at = _normalization['checked_at']
+        if checked_at is not None and now - checked_at < NORMALIZATION_RECHECK_SECONDS:
+            return _normalization['complete']
+        _normalization['checked_at'] = now
+    try:
+        checkpoint = get_mongodb_database().migration_checkpoints.find_one({'_id': CHECKPOINT_ID}, {'completed_at': 1})
+        complete = bool(checkpoint and checkpoint.get('completed_at'))
+    except Exception as e:
+        # Keep matching the old fields rather than hide appointments
+        print(f"Normalization checkpoint read error: {str(e)}")
+        complete = False
+    _normalization['complete'] = complete
+    return complete
+
+def _canonical_filter(canonical, value):
+    match = _match(canonical, value)
+    if normalization_complete():
+        return match
+    return {'$or': [match, _match(FIELD_ALIASES[canonical], value)]}
+
+def doctor_filter(doctor_id):
+    """Query for the appointments of one doctor (or a list of doctors)"""
+    return _canonical_filter('doctor_id', doctor_id)
+
+def patient_filter(patient_id):
+    """Query for the appointments of one patient user (or a list of them)"""
+    return _canonical_filter('patient_id', patient_id)
+
+def doctor_of(appointment):
+    return appointment.get('doctor_id') or appointment.get('doctor')
+
+def patient_of(appointment):
+    return appointment.get('patient_id') or appointment.get('patient')
+
+def normalization_update(appointment, patient_user_ids=None):
+    """
+    The update that brings a stored appointment to the canonical field set,
+    as (set_fields, unset_fields), or None if it is already canonical.
+
+    ``patient_user_ids`` maps patient profile ids to user ids, for
+    appointments that stored the profile id as patient_id.
+    """
+    set_fields, unset_fields = {}, {}
+
+    doctor_id = doctor_of(appointment)
+    patient_id = patient_of(appointment)
+    if patient_id and patient_user_ids and patient_id in patient_user_ids and not appointment.get('patient'):
+        patient_id = patient_user_ids[patient_id]
+    for canonical, value in (('doctor_id', doctor_id), ('patient_id', patient_id)):
+        if not value:
+            continue
+        for field in (canonical, FIELD_ALIASES[canonical]):
+            if appointment.get(field) != value:
+                set_fields[field] = value
+
+    if LEGACY_DATE_FIELD in appointment:
+        if not appointment.get('date') and appointment[LEGACY_DATE_FIELD]:
+            set_fields['date'] = appointment[LEGACY_DATE_FIELD]
+        unset_fields[LEGACY_DATE_FIELD] = ''
+
+    if not set_fields and not unset_fields:
+        return None
+    return set_fields, unset_fields
+
+NORMALIZE_PROJECTION = {'_id': 1, 'doctor': 1, 'doctor_id': 1, 'patient': 1, 'patient_id': 1, 'date': 1, LEGACY_DATE_FIELD: 1}
+
+def normalize_batch(db, after_id=None, batch_size=1000, dry_run=False):
+    """
+    Normalize the next batch of appointments in _id order.
+
+    Returns:
+        tuple: (last _id seen or None when there is nothing left, documents
+            scanned, documents updated, _ids of the documents left as they
+            were because they would double-book a slot under the unique
+            doctor_id index)
+    """
+    query = {'_id': {'$gt': after_id}} if after_id is not None else {}
+    documents = list(db.appointments.find(query, NORMALIZE_PROJECTION).sort('_id', ASCENDING).limit(batch_size))
+    if not documents:
+        return None, 0, 0, []
+
+    # Appointment_service used to store the patient profile id; map those
+    # to user ids with one query for the batch
+    profile_ids = {doc['patient_id'] for doc in documents if doc.get('patient_id') and not doc.get('patient')}
+    patient_user_ids = {}
+    if profile_ids:
+        for patient in db.patients.find({'id': {'$in': list(profile_ids)}}, {'_id': 0, 'id': 1, 'user_id': 1}):
+            if patient.get('user_id'):
+                patient_user_ids[patient['id']] = patient['user_id']
+
+    operations, operation_ids = [], []
+    for document in documents:
+        update = normalization_update(document, patient_user_ids)
+        if update is None:
+            continue
+        set_fields, unset_fields = update
+        change = {}
+        if set_fields:
+            change['$set'] = set_fields
+        if unset_fields:
+            change['$unset'] = unset_fields
+        operations.append(UpdateOne({'_id': document['_id']}, change))
+        operation_ids.append(document['_id'])
+
+    conflicts = []
+    if operations and not dry_run:
+        try:
+            db.appointments.bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            write_errors = e.details.get('writeErrors', [])
+            if any(error.get('code') != 11000 for error in write_errors):
+                raise
+            conflicts = [operation_ids[error['index']] for error in write_errors]
+    return documents[-1]['_id'], len(documents), len(operations) - len(conflicts), conflicts
@@ -13,6 +13,7 @@ class AppointmentsConfig(AppConfig):
         if hasattr(settings, 'MONGODB_INDEXES'):
             try:
                 from .mongodb_utils import get_mongodb_database
+                from .booking import SLOT_INDEX_NAME
                 import pymongo
                 
                 db = get_mongodb_database()
@@ -27,9 +28,22 @@ class AppointmentsConfig(AppConfig):
                         'sparse': sparse
                     }
                     
-                    if 'partialFilterExpression' in index_config:
-                        index_options['partialFilterExpression'] = index_config['partialFilterExpression']
-                        
-                    db[collection].create_index(fields, **index_options)
+                    for option in ('partialFilterExpression', 'collation', 'name', 'expireAfterSeconds'):
+                        if option in index_config:
+                            index_options[option] = index_config[option]
+                    
+                    # One index that can't be built (e.g. duplicates under a
+                    # new unique index) shouldn't stop the others
+                    try:
+                        db[collection].create_index(fields, **index_options)
+                    except pymongo.errors.OperationFailure as e:
+                        print(f"Failed to create MongoDB index on {collection} {fields}: {e}")
+                        if index_config.get('name') == SLOT_INDEX_NAME:
+                            # Bookings fall back to a check before each insert (see booking.py)
+                            print(
+                                f"ERROR: the {SLOT_INDEX_NAME} index that prevents double bookings could not be "
+                                "built, most likely because of existing double bookings. "
+                                "Run manage.py resolve_double_bookings and restart."
+                            )
             except Exception as e:
                 print(f"Failed to create MongoDB indexes: {e}")
\ No newline at end of file
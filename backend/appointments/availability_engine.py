@@ -0,0 +1,258 @@
+# appointments/availability_engine.py
+"""
+Appointment slot availability.
+
+A doctor's schedule is built from their ``available_days``,
+``day_specific_data`` (or legacy ``working_hours``), their
+``doctor_exceptions`` and their booked appointments. Bookings are kept as a
+sorted list of start times, so checking a slot, skipping past a run of
+bookings or counting a day's bookings is a bisect rather than a scan.
+Everything a query needs is loaded with one query per collection,
+whatever the number of doctors or days.
+
+Settings (all optional):
+    APPOINTMENT_SLOT_MINUTES      Slot length (default 30)
+    APPOINTMENT_WORKING_HOURS     Default (start, end) as 'HH:MM' (default 09:00-17:00)
+    APPOINTMENT_SEARCH_DAYS       Default search horizon in days (default 28)
+"""
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, time, timedelta
+
+from django.conf import settings
+
+from .appointment_store import doctor_filter
+from .mongo_utils import get_mongodb_database
+
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+# Doctors with no available_days or working_hours see patients on weekdays
+DEFAULT_DAYS = frozenset(range(5))
+
+# Appointments in these states don't hold a slot
+RELEASED_STATUSES = ['cancelled', 'no_show']
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+def _parse_time(value):
+    hour, minute = (int(part) for part in str(value).split(':')[:2])
+    return time(hour, minute)
+
+def _day_index(value):
+    value = str(value).strip().lower()
+    if value.isdigit():
+        index = int(value)
+        return index if 0 <= index < 7 else None
+    for index, name in enumerate(WEEKDAYS):
+        if value in (name.lower(), name[:3].lower()):
+            return index
+    return None
+
+def parse_day(value):
+    """A YYYY-MM-DD string as a date (raises ValueError)"""
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+class DoctorSchedule:
+    """Working hours, days off and bookings for one doctor"""
+    def __init__(self, doctor, exception_days=(), booked_starts=(), slot_minutes=None):
+        self.doctor = doctor
+        self.doctor_id = doctor.get('id')
+        self.slot = timedelta(minutes=slot_minutes or _setting('APPOINTMENT_SLOT_MINUTES', 30))
+        self.daily_limit = doctor.get('daily_patient_limit') or None
+        self.exception_days = set(exception_days)
+        self.booked = sorted(booked_starts)
+        self.hours = self._working_hours(doctor)
+
+    def _working_hours(self, doctor):
+        """{weekday: (start time, end time)} for the days the doctor works"""
+        default_start, default_end = _setting('APPOINTMENT_WORKING_HOURS', ('09:00', '17:00'))
+        legacy_hours = doctor.get('working_hours') or {}
+        day_specific = {
+            str(day).lower(): hours
+            for day, hours in (doctor.get('day_specific_data') or {}).items()
+            if isinstance(hours, dict)
+        }
+
+        available_days = doctor.get('available_days')
+        if isinstance(available_days, str):
+            available_days = available_days.split(',')
+        if available_days:
+            days = {_day_index(day) for day in available_days} - {None}
+        elif legacy_hours:
+            days = {_day_index(day) for day, hours in legacy_hours.items() if hours} - {None}
+        else:
+            days = DEFAULT_DAYS
+
+        hours = {}
+        for index in days:
+            name = WEEKDAYS[index].lower()
+            specific = day_specific.get(name) or {}
+            legacy = legacy_hours.get(name) or {}
+            start = specific.get('start_time') or legacy.get('start') or default_start
+            end = specific.get('end_time') or legacy.get('end') or default_end
+            try:
+                start, end = _parse_time(start), _parse_time(end)
+            except (TypeError, ValueError):
+                start, end = _parse_time(default_start), _parse_time(default_end)
+            if start < end:
+                hours[index] = (start, end)
+        return hours
+
+    def working_interval(self, day):
+        """(start, end) datetimes the doctor works on `day`, or None"""
+        if day.strftime('%Y-%m-%d') in self.exception_days:
+            return None
+        hours = self.hours.get(day.weekday())
+        if not hours:
+            return None
+        return datetime.combine(day, hours[0]), datetime.combine(day, hours[1])
+
+    def bookings_between(self, start, end):
+        """Number of bookings starting in [start, end)"""
+        return bisect_left(self.booked, end) - bisect_left(self.booked, start)
+
+    def next_booking_overlapping(self, start, end):
+        """Start of the first booking that overlaps [start, end), or None"""
+        # A booking b occupies [b, b + slot); it overlaps iff start - slot < b < end
+        index = bisect_right(self.booked, start - self.slot)
+        if index < len(self.booked) and self.booked[index] < end:
+            return self.booked[index]
+        return None
+
+    def is_free(self, start):
+        interval = self.working_interval(start.date())
+        end = start + self.slot
+        if not interval or start < interval[0] or end > interval[1]:
+            return False
+        if self.daily_limit and self.bookings_between(*interval) >= self.daily_limit:
+            return False
+        return self.next_booking_overlapping(start, end) is None
+
+    def iter_free_slots(self, start, end):
+        """Yield free (slot_start, slot_end) pairs starting in [start, end), in order"""
+        day = start.date()
+        while datetime.combine(day, time()) < end:
+            interval = self.working_interval(day)
+            day += timedelta(days=1)
+            if not interval:
+                continue
+            work_start, work_end = interval
+            if self.daily_limit and self.bookings_between(work_start, work_end) >= self.daily_limit:
+                continue
+
+            # First slot on the day's grid at or after `start`
+            slot_start = work_start
+            if start > work_start:
+                steps = -(-(start - work_start) // self.slot)
+                slot_start = work_start + steps * self.slot
+
+            while slot_start + self.slot <= work_end and slot_start < end:
+                booking = self.next_booking_overlapping(slot_start, slot_start + self.slot)
+                if booking is None:
+                    yield slot_start, slot_start + self.slot
+                    slot_start += self.slot
+                else:
+                    # Jump to the first grid slot after the booking ends
+                    steps = -(-(booking + self.slot - work_start) // self.slot)
+                    slot_start = work_start + steps * self.slot
+
+    def free_slots(self, start, end):
+        return list(self.iter_free_slots(start, end))
+
+    def first_free_slot(self, start, end):
+        return next(self.iter_free_slots(start, end), None)
+
+def _window(start, end):
+    if isinstance(start, date) and not isinstance(start, datetime):
+        start = datetime.combine(start, time())
+    if end is None:
+        end = start + timedelta(days=_setting('APPOINTMENT_SEARCH_DAYS', 28))
+    elif isinstance(end, date) and not isinstance(end, datetime):
+        end = datetime.combine(end, time())
+    return start, end
+
+def load_schedules(doctors, start, end, slot_minutes=None):
+    """
+    Build a DoctorSchedule for every doctor for the window [start, end),
+    with one query for the exceptions and one for the bookings.
+    """
+    db = get_mongodb_database()
+    start, end = _window(start, end)
+    doctor_ids = [doctor['id'] for doctor in doctors]
+
+    exceptions = {doctor_id: set() for doctor_id in doctor_ids}
+    for exception in db.doctor_exceptions.find(
+        {
+            'doctor_id': {'$in': doctor_ids},
+            'date': {'$gte': start.strftime('%Y-%m-%d'), '$lt': (end + timedelta(days=1)).strftime('%Y-%m-%d')}
+        },
+        {'_id': 0, 'doctor_id': 1, 'date': 1}
+    ):
+        exceptions[exception['doctor_id']].add(str(exception['date'])[:10])
+
+    booked = {doctor_id: [] for doctor_id in doctor_ids}
+    for appointment in db.appointments.find(
+        {
+            **doctor_filter(doctor_ids),
+            'status': {'$nin': RELEASED_STATUSES},
+            'date': {'$gte': start - timedelta(days=1), '$lt': end + timedelta(days=1)}
+        },
+        {'_id': 0, 'doctor_id': 1, 'date': 1}
+    ):
+        doctor_id = appointment.get('doctor_id')
+        if doctor_id in booked and isinstance(appointment.get('date'), datetime):
+            booked[doctor_id].append(appointment['date'])
+
+    return {
+        doctor['id']: DoctorSchedule(doctor, exceptions[doctor['id']], booked[doctor['id']], slot_minutes)
+        for doctor in doctors
+    }
+
+def get_free_slots(doctor_id, start, end=None, slot_minutes=None):
+    """
+    Free slots for one doctor over [start, end).
+
+    Args:
+        doctor_id (str): ID of the doctor
+        start (date or datetime): Start of the window
+        end (date or datetime, optional): End of the window (exclusive);
+            defaults to APPOINTMENT_SEARCH_DAYS after start
+
+    Returns:
+        list: (slot_start, slot_end) datetime pairs
+    """
+    doctor = get_mongodb_database().doctors.find_one({'id': doctor_id})
+    if not doctor or not doctor.get('is_available', True):
+        return []
+    start, end = _window(start, end)
+    schedule = load_schedules([doctor], start, end, slot_minutes)[doctor_id]
+    return schedule.free_slots(start, end)
+
+def find_first_free_slot(specialization=None, start=None, end=None, doctor_ids=None, slot_minutes=None):
+    """
+    Earliest free slot across available doctors, optionally restricted to a
+    specialization or a list of doctors.
+
+    Returns:
+        dict: doctor_id, doctor_name, start and end, or None if nobody is free
+    """
+    query = {'is_available': {'$ne': False}}
+    if specialization:
+        query['specialization'] = specialization
+    if doctor_ids:
+        query['id'] = {'$in': list(doctor_ids)}
+    doctors = list(get_mongodb_database().doctors.find(query, {'_id': 0}))
+    if not doctors:
+        return None
+
+    start, end = _window(start or datetime.now(), end)
+    best = None
+    for doctor_id, schedule in load_schedules(doctors, start, end, slot_minutes).items():
+        # Only slots earlier than the best one found so far are of interest
+        slot = schedule.first_free_slot(start, best[1] if best else end)
+        if slot:
+            best = (doctor_id, slot[0], slot[1], schedule.doctor.get('name'))
+    if best is None:
+        return None
+    doctor_id, slot_start, slot_end, doctor_name = best
+    return {'doctor_id': doctor_id, 'doctor_name': doctor_name, 'start': slot_start, 'end': slot_end}
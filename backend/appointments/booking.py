@@ -0,0 +1,190 @@
+# appointments/booking.py
+"""
+Race-free appointment booking.
+
+A doctor's slot is held by a partial unique index on (date, doctor_id) over
+scheduled appointments, so booking is a single insert: if it fails with a
+duplicate-key error somebody else got the slot first. There is no
+check-then-insert window for concurrent requests to slip through, and no
+duplicates left to clean up afterwards.
+
+The index can only be built once existing double bookings are resolved
+(``manage.py resolve_double_bookings``, a required step before deploying
+it). Until it exists, every booking checks the slot before inserting, as
+before, and says so loudly in the log; the check is repeated at most
+every SLOT_INDEX_RECHECK_SECONDS. The same check runs while
+normalize_appointments has not completed, since the index can't see
+older appointments that only carry ``doctor``. Updates that move an
+appointment (reschedules, PUTs) run it too, through check_slot_change.
+
+When a booking also has to be added to the doctor's booking history
+(appointments.booking_history) both writes run in one transaction on deployments that support them (replica
+sets and sharded clusters), retried by the driver on transient errors. On a standalone server the appointment is
+inserted with the history entry attached as ``booking_history_pending``,
+which is removed once the history has been updated; anything left over
+(the process died in between) is applied by sync_pending_booking_history
+(``manage.py sync_booking_history``).
+"""
+import threading
+import time
+
+from pymongo.errors import DuplicateKeyError, OperationFailure
+
+from .appointment_store import doctor_filter, doctor_of, normalization_complete, prepare_appointment, prepare_update
+from .booking_history import is_recorded, record_booking
+from .mongo_utils import get_mongodb_client, get_mongodb_database
+
+SLOT_TAKEN_MESSAGE = 'This time slot is already booked'
+
+# Topologies on which multi-document transactions are available
+TRANSACTION_TOPOLOGIES = ('ReplicaSetWithPrimary', 'Sharded', 'LoadBalanced')
+
+# The partial unique index on scheduled (date, doctor_id), see settings.MONGODB_INDEXES
+SLOT_INDEX_NAME = 'scheduled_doctor_id_slot'
+SLOT_INDEX_RECHECK_SECONDS = 60
+
+_slot_index_lock = threading.Lock()
+_slot_index = {'ready': False, 'checked_at': None}
+
+class SlotTaken(Exception):
+    """The doctor already has a scheduled appointment at that time"""
+    def __init__(self, message=SLOT_TAKEN_MESSAGE):
+        super().__init__(message)
+
+def supports_transactions(client=None):
+    client = client or get_mongodb_client()
+    return client.topology_description.topology_type_name in TRANSACTION_TOPOLOGIES
+
+def slot_index_ready(db):
+    """True once the unique slot index exists"""
+    if _slot_index['ready']:
+        return True
+    now = time.monotonic()
+    with _slot_index_lock:
+        checked_at = _slot_index['checked_at']
+        if checked_at is not None and now - checked_at < SLOT_INDEX_RECHECK_SECONDS:
+            return False
+        _slot_index['checked_at'] = now
+    try:
+        ready = SLOT_INDEX_NAME in db.appointments.index_information()
+    except Exception as e:
+        print(f"Slot index check error: {str(e)}")
+        ready = False
+    if not ready:
+        print(
+            f"WARNING: appointments index {SLOT_INDEX_NAME} is missing, so double bookings are only "
+            "prevented by a check before each insert. Run manage.py resolve_double_bookings and restart."
+        )
+    _slot_index['ready'] = ready
+    return ready
+
+def _check_slot_free(db, appointment, exclude_id=None):
+    # Only needed while the unique index can't hold the slot
+    if appointment.get('status', 'scheduled') != 'scheduled':
+        return
+    if slot_index_ready(db) and normalization_complete():
+        return
+    query = {**doctor_filter(appointment.get('doctor_id')), 'date': appointment.get('date'), 'status': 'scheduled'}
+    if exclude_id is not None:
+        query['id'] = {'$ne': exclude_id}
+    if db.appointments.find_one(query, {'_id': 1}):
+        raise SlotTaken()
+
+def check_slot_change(db, appointment, fields):
+    """
+    Check that the $set ``fields`` of an update don't move a stored
+    appointment onto a taken slot, for as long as the unique index can't.
+
+    Raises:
+        SlotTaken: The doctor already has another scheduled appointment then
+    """
+    fields = prepare_update(fields)
+    if not any(field in fields for field in ('date', 'doctor_id', 'status')):
+        return
+    after = {
+        'doctor_id': fields.get('doctor_id', doctor_of(appointment)),
+        'date': fields.get('date', appointment.get('date')),
+        'status': fields.get('status', appointment.get('status', 'scheduled')),
+    }
+    _check_slot_free(db, after, exclude_id=appointment.get('id'))
+
+def insert_appointment(appointment, history_entry=None, doctor_id=None):
+    """
+    Book a slot by inserting the appointment.
+
+    Args:
+        appointment (dict): The appointment document to insert
+        history_entry (dict, optional): Entry to push onto the doctor's
+            booking history together with the insert
+        doctor_id (str, optional): Doctor whose history gets the entry;
+            defaults to the appointment's doctor_id
+
+    Raises:
+        SlotTaken: The doctor already has a scheduled appointment then
+    """
+    prepare_appointment(appointment)
+    db = get_mongodb_database()
+    _check_slot_free(db, appointment)
+    if history_entry is None:
+        try:
+            db.appointments.insert_one(appointment)
+        except DuplicateKeyError:
+            raise SlotTaken()
+        return
+
+    doctor_id = doctor_id or appointment.get('doctor_id')
+    client = get_mongodb_client()
+    if supports_transactions(client):
+        def book(session):
+            db.appointments.insert_one(appointment, session=session)
+            record_booking(db, doctor_id, history_entry, session=session)
+
+        try:
+            with client.start_session() as session:
+                # Retries on TransientTransactionError and UnknownTransactionCommitResult
+                session.with_transaction(book)
+        except DuplicateKeyError:
+            raise SlotTaken()
+        except OperationFailure as e:
+            # Inside a transaction the duplicate key surfaces as a plain failure
+            if e.code == 11000:
+                raise SlotTaken()
+            raise
+        return
+
+    # No transactions: the pending entry on the appointment is the outbox
+    pending = {'doctor_id': doctor_id, 'entry': history_entry}
+    try:
+        db.appointments.insert_one({**appointment, 'booking_history_pending': pending})
+    except DuplicateKeyError:
+        raise SlotTaken()
+    try:
+        _apply_pending_history(db, appointment['id'], pending)
+    except Exception as e:
+        # The slot is booked; the history catches up on the next sync
+        print(f"Booking history update error for {appointment['id']}: {str(e)}")
+
+def _apply_pending_history(db, appointment_id, pending, replay=False):
+    entry = pending['entry']
+    # A replay may follow a write that got through before the process died
+    if not (replay and is_recorded(db, pending['doctor_id'], entry['appointment_id'])):
+        record_booking(db, pending['doctor_id'], entry)
+    db.appointments.update_one({'id': appointment_id}, {'$unset': {'booking_history_pending': ''}})
+
+def sync_pending_booking_history(limit=None):
+    """
+    Apply booking history entries left pending on appointments.
+    Returns the number of appointments processed.
+    """
+    db = get_mongodb_database()
+    cursor = db.appointments.find(
+        {'booking_history_pending': {'$exists': True}},
+        {'_id': 0, 'id': 1, 'booking_history_pending': 1}
+    )
+    if limit:
+        cursor = cursor.limit(limit)
+    processed = 0
+    for appointment in cursor:
+        _apply_pending_history(db, appointment['id'], appointment['booking_history_pending'], replay=True)
+        processed += 1
+    return processed
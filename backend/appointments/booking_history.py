@@ -0,0 +1,156 @@
+# appointments/booking_history.py
+"""
+Doctor booking history in bounded, month-bucketed documents.
+
+The history used to be one ``doctor_booking_history`` document per doctor
+with every booking pushed onto a single array, which grew towards the
+16 MB document limit and was rewritten on every booking. It now lives in
+``doctor_booking_buckets``: one document per doctor and month (the month
+of the appointment) holding at most BOOKING_HISTORY_BUCKET_SIZE entries,
+with a ``count``. A booking is pushed onto the doctor's open bucket for
+that month, and a full bucket is followed by a new one, so every write
+touches a small document.
+
+Existing history documents are moved over by
+``manage.py migrate_booking_history``; buckets written by it carry
+``migrated_from`` and are never appended to, so the migration can be
+re-run after an interruption.
+
+Settings (all optional):
+    BOOKING_HISTORY_BUCKET_SIZE  Entries per bucket document (default 200)
+"""
+import re
+from collections import defaultdict
+from datetime import datetime
+
+from django.conf import settings
+from pymongo import DESCENDING
+
+from .mongo_utils import InvalidPageRequest
+
+HISTORY_COLLECTION = 'doctor_booking_buckets'
+LEGACY_COLLECTION = 'doctor_booking_history'
+
+_MONTH_RE = re.compile(r'^\d{4}-\d{2}$')
+
+def bucket_size():
+    return getattr(settings, 'BOOKING_HISTORY_BUCKET_SIZE', 200)
+
+def bucket_month(value):
+    """The bucket (YYYY-MM) an entry with this date goes in"""
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m')
+    if isinstance(value, str) and len(value) >= 7:
+        return value[:7]
+    return datetime.now().strftime('%Y-%m')
+
+def _date_key(value):
+    return value.isoformat() if isinstance(value, datetime) else str(value or '')
+
+def _entry_key(entry):
+    return _date_key(entry.get('date')), str(entry.get('appointment_id', ''))
+
+def is_recorded(db, doctor_id, appointment_id, session=None):
+    return db[HISTORY_COLLECTION].find_one(
+        {'doctor_id': doctor_id, 'bookings.appointment_id': appointment_id},
+        {'_id': 1},
+        session=session
+    ) is not None
+
+def record_booking(db, doctor_id, entry, session=None):
+    """
+    Add a booking to the doctor's open bucket for its month; when that
+    bucket is full (or there is none yet) the upsert starts a new one.
+    """
+    db[HISTORY_COLLECTION].update_one(
+        {
+            'doctor_id': doctor_id,
+            'month': bucket_month(entry.get('date')),
+            'count': {'$lt': bucket_size()},
+            'migrated_from': None
+        },
+        {
+            '$push': {'bookings': entry},
+            '$inc': {'count': 1},
+            '$set': {'updated_at': datetime.now()}
+        },
+        upsert=True,
+        session=session
+    )
+
+def bucket_documents(doctor_id, entries, **extra):
+    """
+    New, filled bucket documents for a batch of entries: one or more per
+    month, each holding at most bucket_size() entries.
+    """
+    by_month = defaultdict(list)
+    for entry in entries:
+        by_month[bucket_month(entry.get('date'))].append(entry)
+
+    size = bucket_size()
+    now = datetime.now()
+    documents = []
+    for month, month_entries in by_month.items():
+        for start in range(0, len(month_entries), size):
+            chunk = month_entries[start:start + size]
+            documents.append({
+                'doctor_id': doctor_id,
+                'month': month,
+                'count': len(chunk),
+                'bookings': chunk,
+                'updated_at': now,
+                **extra
+            })
+    return documents
+
+def read_history(db, doctor_id, limit, after=None, month=None):
+    """
+    One page of a doctor's booking history, newest appointment first.
+
+    Buckets are read a month at a time, newest month first, and reading
+    stops as soon as the page is full, so a page costs a few bucket
+    documents however long the history is.
+
+    Args:
+        after (str, optional): Cursor returned with the previous page
+        month (str, optional): Only this month (YYYY-MM)
+
+    Returns:
+        tuple: (entries, next_cursor); next_cursor is None on the last page
+    """
+    query = {'doctor_id': doctor_id}
+    position = None
+    if after:
+        date_key, _, appointment_id = after.rpartition(',')
+        if not date_key or not appointment_id:
+            raise InvalidPageRequest('Invalid pagination cursor')
+        position = (date_key, appointment_id)
+        query['month'] = {'$lte': bucket_month(date_key)}
+    if month:
+        if not _MONTH_RE.match(month):
+            raise InvalidPageRequest('month must be YYYY-MM')
+        query['month'] = month
+
+    entries = []
+    month_entries, current_month = [], None
+
+    def add_month():
+        month_entries.sort(key=_entry_key, reverse=True)
+        entries.extend(entry for entry in month_entries if position is None or _entry_key(entry) < position)
+
+    buckets = db[HISTORY_COLLECTION].find(query, {'_id': 0, 'month': 1, 'bookings': 1}).sort('month', DESCENDING)
+    for bucket in buckets:
+        if bucket['month'] != current_month:
+            add_month()
+            if len(entries) > limit:
+                break
+            month_entries, current_month = [], bucket['month']
+        month_entries.extend(bucket.get('bookings', []))
+    else:
+        add_month()
+
+    next_cursor = None
+    if len(entries) > limit:
+        entries = entries[:limit]
+        next_cursor = ','.join(_entry_key(entries[-1]))
+    return entries, next_cursor
@@ -0,0 +1,355 @@
+# appointments/bulk_import.py
+"""
+Bulk appointment import from JSONL or CSV.
+
+Rows are processed in batches of BULK_IMPORT_BATCH_SIZE. For each batch the
+referenced doctors, users and patient profiles are loaded with one ``$in``
+query per collection, double bookings are detected both inside the import
+and against scheduled appointments already stored (one query), and the
+valid rows are written with a single unordered ``insert_many``. Slots
+taken by a concurrent booking between the check and the insert are caught
+by the unique slot index (see appointments.booking) and reported as
+conflicts like the others.
+
+Each row is a JSON object (JSONL) or a CSV record with a header line:
+    doctor / doctor_email      Doctor id or email (one is required)
+    patient / patient_email    Patient user id or email (one is required)
+    date                       ISO 8601 start time (required)
+    status                     Defaults to 'scheduled'
+    notes, reason_for_visit, blood_type, allergies, medications,
+    medical_conditions         Optional; list fields may be comma separated
+
+The result reports every row as created, conflict or error.
+
+Settings (all optional):
+    BULK_IMPORT_BATCH_SIZE  Rows per batch (default 1000)
+"""
+import csv
+import io
+import json
+import uuid
+from collections import defaultdict
+from datetime import datetime
+
+from django.conf import settings
+from pymongo.errors import BulkWriteError
+
+from .appointment_store import doctor_filter, prepare_appointment
+from .booking import SLOT_TAKEN_MESSAGE
+from .booking_history import HISTORY_COLLECTION, bucket_documents
+from .mongo_stats import record_appointment_inserts
+from .mongo_utils import get_mongodb_database, normalize_email
+
+FORMATS = ('jsonl', 'csv')
+
+VALID_STATUSES = ('scheduled', 'completed', 'cancelled', 'no_show')
+
+LIST_FIELDS = ('allergies', 'medications', 'medical_conditions')
+
+CREATED = 'created'
+CONFLICT = 'conflict'
+ERROR = 'error'
+
+class ImportFormatError(ValueError):
+    """The import data could not be read in the requested format"""
+
+def detect_format(filename=None, content_type=None):
+    """'csv' or 'jsonl' from a file name or content type (JSONL by default)"""
+    if filename and filename.lower().endswith('.csv'):
+        return 'csv'
+    if content_type and 'csv' in content_type.lower():
+        return 'csv'
+    return 'jsonl'
+
+def iter_rows(stream, format='jsonl'):
+    """
+    Yield (row_number, row dict or error message) from a text stream.
+    Row numbers are 1-based data rows (the CSV header is not counted).
+    """
+    if format not in FORMATS:
+        raise ImportFormatError(f"Unsupported format '{format}', use one of {', '.join(FORMATS)}")
+
+    if format == 'csv':
+        for number, row in enumerate(csv.DictReader(stream), start=1):
+            # Empty cells are treated as missing
+            yield number, {key.strip(): value.strip() for key, value in row.items() if key and value not in (None, '')}
+        return
+
+    number = 0
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        number += 1
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield number, f"Invalid JSON: {e.msg}"
+            continue
+        yield number, row if isinstance(row, dict) else 'Each line must be a JSON object'
+
+def _as_list(value):
+    if isinstance(value, list):
+        return value
+    if not value:
+        return []
+    return [item.strip() for item in str(value).split(',') if item.strip()]
+
+def _parse_date(value):
+    if isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+
+class BatchLookups:
+    """Doctors, users and patient profiles referenced by one batch of rows"""
+    def __init__(self, db, rows):
+        doctor_ids, doctor_emails, user_ids, user_emails = set(), set(), set(), set()
+        for row in rows:
+            if row.get('doctor'):
+                doctor_ids.add(str(row['doctor']))
+            elif row.get('doctor_email'):
+                email = str(row['doctor_email']).strip()
+                doctor_emails.update((email, email.lower()))
+            if row.get('patient'):
+                user_ids.add(str(row['patient']))
+            elif row.get('patient_email'):
+                user_emails.add(normalize_email(row['patient_email']))
+
+        projection = {'_id': 0, 'password': 0}
+        self.doctors, self.doctors_by_email = {}, {}
+        if doctor_ids or doctor_emails:
+            for doctor in db.doctors.find(
+                {'$or': [{'id': {'$in': list(doctor_ids)}}, {'email': {'$in': list(doctor_emails)}}]},
+                projection
+            ):
+                self.doctors[doctor['id']] = doctor
+                if doctor.get('email'):
+                    self.doctors_by_email[doctor['email'].lower()] = doctor
+
+        self.users, self.users_by_email = {}, {}
+        if user_ids or user_emails:
+            for user in db.users.find(
+                {'$or': [{'id': {'$in': list(user_ids)}}, {'email_normalized': {'$in': list(user_emails)}}]},
+                projection
+            ):
+                self.users[user['id']] = user
+                self.users_by_email[user.get('email_normalized') or normalize_email(user.get('email', ''))] = user
+
+        self.patients = {}
+        if self.users:
+            for patient in db.patients.find({'user_id': {'$in': list(self.users)}}, {'_id': 0}):
+                self.patients[patient['user_id']] = patient
+
+    def doctor(self, row):
+        if row.get('doctor'):
+            return self.doctors.get(str(row['doctor']))
+        if row.get('doctor_email'):
+            return self.doctors_by_email.get(str(row['doctor_email']).strip().lower())
+        return None
+
+    def user(self, row):
+        if row.get('patient'):
+            return self.users.get(str(row['patient']))
+        if row.get('patient_email'):
+            return self.users_by_email.get(normalize_email(row['patient_email']))
+        return None
+
+def build_appointment(row, doctor, user, patient=None, now=None):
+    """An appointment document in the shape the appointments API creates"""
+    patient = patient or {}
+    medical_info = patient.get('medical_info') or {}
+    patient_name = f"{user.get('first_name', '')} {user.get('last_name', '')}".strip() or patient.get('name', '')
+
+    medical_data = {
+        'blood_type': row.get('blood_type') or patient.get('blood_type') or medical_info.get('blood_type', ''),
+        'reason_for_visit': row.get('reason_for_visit', row.get('notes', '')),
+    }
+    for field in LIST_FIELDS:
+        medical_data[field] = _as_list(row[field]) if field in row else _as_list(patient.get(field) or medical_info.get(field))
+
+    return prepare_appointment({
+        'id': str(uuid.uuid4()),
+        'patient': user['id'],
+        'patient_name': patient_name,
+        'doctor': doctor['id'],
+        'doctor_name': doctor.get('name', ''),
+        'date': _parse_date(row['date']),
+        'notes': row.get('notes', ''),
+        'status': row.get('status', 'scheduled'),
+        'patient_info': {
+            'name': patient_name,
+            'phone': user.get('phone', ''),
+            'email': user.get('email', '')
+        },
+        'doctor_info': {
+            'name': doctor.get('name', ''),
+            'specialization': doctor.get('specialization', ''),
+            'phone': doctor.get('phone', '')
+        },
+        'medical_data': medical_data,
+        'imported': True,
+        'created_at': now or datetime.now()
+    })
+
+class AppointmentImporter:
+    """
+    Imports rows batch by batch and keeps the per-row report.
+
+    Slots booked earlier in the same import count as taken, so a conflict
+    is reported whichever batch the clashing rows end up in.
+    """
+    def __init__(self, batch_size=None, dry_run=False):
+        self.batch_size = batch_size or getattr(settings, 'BULK_IMPORT_BATCH_SIZE', 1000)
+        self.dry_run = dry_run
+        self.results = []
+        self.counts = {CREATED: 0, CONFLICT: 0, ERROR: 0}
+        self._booked = set()
+
+    def _report(self, row_number, status, **details):
+        self.counts[status] += 1
+        self.results.append({'row': row_number, 'status': status, **details})
+
+    def import_rows(self, rows):
+        """Import (row_number, row) pairs as produced by iter_rows"""
+        batch = []
+        for row_number, row in rows:
+            if not isinstance(row, dict):
+                self._report(row_number, ERROR, error=row)
+                continue
+            batch.append((row_number, row))
+            if len(batch) >= self.batch_size:
+                self._import_batch(batch)
+                batch = []
+        if batch:
+            self._import_batch(batch)
+        return self.report()
+
+    def _import_batch(self, batch):
+        db = get_mongodb_database()
+        lookups = BatchLookups(db, [row for _, row in batch])
+        now = datetime.now()
+
+        candidates = []
+        for row_number, row in batch:
+            if not row.get('date'):
+                self._report(row_number, ERROR, error='date is required')
+                continue
+            if row.get('status', 'scheduled') not in VALID_STATUSES:
+                self._report(row_number, ERROR, error=f"Invalid status '{row['status']}'")
+                continue
+            doctor = lookups.doctor(row)
+            if not doctor:
+                self._report(row_number, ERROR, error='Doctor not found')
+                continue
+            user = lookups.user(row)
+            if not user:
+                self._report(row_number, ERROR, error='Patient not found')
+                continue
+            try:
+                appointment = build_appointment(row, doctor, user, lookups.patients.get(user['id']), now)
+            except (TypeError, ValueError):
+                self._report(row_number, ERROR, error='Invalid date format')
+                continue
+            candidates.append((row_number, appointment))
+
+        # Slots already taken by stored appointments, in one query
+        scheduled = [appointment for _, appointment in candidates if appointment['status'] == 'scheduled']
+        taken = set()
+        if scheduled:
+            doctor_ids = list({appointment['doctor_id'] for appointment in scheduled})
+            for existing in db.appointments.find(
+                {
+                    **doctor_filter(doctor_ids),
+                    'date': {'$in': list({appointment['date'] for appointment in scheduled})},
+                    'status': 'scheduled'
+                },
+                {'_id': 0, 'doctor_id': 1, 'date': 1}
+            ):
+                taken.add((existing['doctor_id'], _slot_time(existing['date'])))
+
+        to_insert = []
+        for row_number, appointment in candidates:
+            if appointment['status'] == 'scheduled':
+                slot = (appointment['doctor_id'], _slot_time(appointment['date']))
+                if slot in taken or slot in self._booked:
+                    self._report(row_number, CONFLICT, error=SLOT_TAKEN_MESSAGE)
+                    continue
+                self._booked.add(slot)
+            to_insert.append((row_number, appointment))
+
+        if self.dry_run:
+            for row_number, appointment in to_insert:
+                self._report(row_number, CREATED, id=appointment['id'])
+            return
+
+        failed = {}
+        if to_insert:
+            try:
+                db.appointments.insert_many([appointment for _, appointment in to_insert], ordered=False)
+            except BulkWriteError as e:
+                for error in e.details.get('writeErrors', []):
+                    failed[error['index']] = error
+
+        inserted = []
+        for index, (row_number, appointment) in enumerate(to_insert):
+            error = failed.get(index)
+            if error is None:
+                inserted.append(appointment)
+                self._report(row_number, CREATED, id=appointment['id'])
+            elif error.get('code') == 11000:
+                # Booked by somebody else since the check above
+                self._report(row_number, CONFLICT, error=SLOT_TAKEN_MESSAGE)
+            else:
+                self._report(row_number, ERROR, error=error.get('errmsg', 'Insert failed'))
+
+        record_appointment_inserts(inserted)
+        _push_booking_history(db, inserted)
+
+    def report(self):
+        return {
+            'dry_run': self.dry_run,
+            'total': sum(self.counts.values()),
+            **self.counts,
+            'results': sorted(self.results, key=lambda result: result['row']),
+        }
+
+def _slot_time(value):
+    """A date as MongoDB returns it: naive UTC"""
+    if value.tzinfo is not None:
+        value = (value - value.utcoffset()).replace(tzinfo=None)
+    return value
+
+def _push_booking_history(db, appointments):
+    """New history buckets for the appointments just imported, in one insert"""
+    entries = defaultdict(list)
+    for appointment in appointments:
+        entries[appointment['doctor_id']].append({
+            'appointment_id': appointment['id'],
+            'patient_name': appointment['patient_name'],
+            'date': appointment['date']
+        })
+    buckets = [
+        bucket
+        for doctor_id, doctor_entries in entries.items()
+        for bucket in bucket_documents(doctor_id, doctor_entries)
+    ]
+    if not buckets:
+        return
+    try:
+        db[HISTORY_COLLECTION].insert_many(buckets, ordered=False)
+    except Exception as e:
+        print(f"Booking history update error during import: {str(e)}")
+
+def import_appointments(stream, format='jsonl', batch_size=None, dry_run=False):
+    """
+    Import appointments from a text stream of JSONL or CSV.
+
+    Returns:
+        dict: total, created, conflict and error counts and a per-row
+            ``results`` list ({row, status, id or error})
+    """
+    importer = AppointmentImporter(batch_size=batch_size, dry_run=dry_run)
+    return importer.import_rows(iter_rows(stream, format))
+
+def import_appointments_from_bytes(data, format='jsonl', **options):
+    return import_appointments(io.StringIO(data.decode('utf-8-sig')), format, **options)
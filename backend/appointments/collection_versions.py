@@ -0,0 +1,129 @@
+# appointments/collection_versions.py
+"""
+Collection versions for conditional GETs.
+
+Every write path that changes doctors, doctor exceptions or appointments
+bumps the collection's counter in ``collection_versions``
+({_id: name, version, updated_at}). Views wrapped in conditional_get
+derive an ETag from the versions of the collections their response is
+built from (and the request's path and query string), plus a
+Last-Modified from the latest updated_at. A request whose If-None-Match
+(or, without one, If-Modified-Since) still matches gets a 304 before the
+view runs: no query, no JSON encoding.
+
+Versions are read with one query and kept for COLLECTION_VERSION_CACHE_TTL
+seconds; bumps made in this process apply at once, so a write in another
+worker process can be answered with a 304 for at most that long.
+
+Settings (all optional):
+    COLLECTION_VERSION_CACHE_TTL  Seconds versions are cached in-process (default 1)
+"""
+import hashlib
+import threading
+import time
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.conf import settings
+from django.http import HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date, parse_http_date_safe
+from pymongo import UpdateOne
+
+from .mongo_utils import get_mongodb_database
+
+VERSION_COLLECTION = 'collection_versions'
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+def _ttl():
+    return getattr(settings, 'COLLECTION_VERSION_CACHE_TTL', 1)
+
+def bump(*names):
+    """Record a write to the named collections"""
+    now = datetime.utcnow().replace(microsecond=0)
+    try:
+        get_mongodb_database()[VERSION_COLLECTION].bulk_write([
+            UpdateOne({'_id': name}, {'$inc': {'version': 1}, '$set': {'updated_at': now}}, upsert=True)
+            for name in names
+        ], ordered=False)
+    except Exception as e:
+        # A missed bump only means a client refetches later than it could
+        print(f"Collection version bump error: {str(e)}")
+    with _cache_lock:
+        for name in names:
+            _cache.pop(name, None)
+
+def get_versions(names):
+    """{name: (version, updated_at)} for the named collections"""
+    now = time.monotonic()
+    with _cache_lock:
+        cached = {name: _cache[name][1] for name in names if name in _cache and _cache[name][0] > now}
+    missing = [name for name in names if name not in cached]
+    if missing:
+        found = {
+            document['_id']: (document.get('version', 0), document.get('updated_at'))
+            for document in get_mongodb_database()[VERSION_COLLECTION].find({'_id': {'$in': missing}})
+        }
+        expires = now + _ttl()
+        with _cache_lock:
+            for name in missing:
+                cached[name] = found.get(name, (0, None))
+                _cache[name] = (expires, cached[name])
+    return cached
+
+def _etag(request, names, versions):
+    key = '|'.join([request.get_full_path()] + [f'{name}:{versions[name][0]}' for name in names])
+    return '"%s"' % hashlib.sha1(key.encode('utf-8')).hexdigest()[:24]
+
+def _last_modified(names, versions):
+    stamps = [versions[name][1] for name in names if versions[name][1]]
+    if not stamps:
+        return None
+    return int(max(stamps).replace(tzinfo=timezone.utc).timestamp())
+
+def _not_modified(request, etag, last_modified):
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match:
+        tags = [tag.strip() for tag in if_none_match.split(',')]
+        # Weak comparison: proxies may have marked our tag weak
+        return '*' in tags or etag in tags or f'W/{etag}' in tags
+    if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+    return bool(if_modified_since and last_modified and last_modified <= if_modified_since)
+
+def conditional_get(*names):
+    """
+    Decorator adding ETag/Last-Modified to a view's GET responses and
+    answering matching conditional requests with 304. Apply it below the
+    auth decorator so the 304 shortcut never skips authentication.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view_func(request, *args, **kwargs)
+            try:
+                versions = get_versions(names)
+            except Exception as e:
+                print(f"Collection version read error: {str(e)}")
+                return view_func(request, *args, **kwargs)
+
+            etag = _etag(request, names, versions)
+            last_modified = _last_modified(names, versions)
+            if _not_modified(request, etag, last_modified):
+                response = HttpResponseNotModified()
+            else:
+                response = view_func(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+
+            response['ETag'] = etag
+            if last_modified:
+                response['Last-Modified'] = http_date(last_modified)
+            # Browsers must revalidate rather than reuse the copy on their own
+            response['Cache-Control'] = 'private, no-cache'
+            patch_vary_headers(response, ('Authorization',))
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,223 @@
+# appointments/compression.py
+"""
+Response compression for JSON payloads.
+
+Appointment listings repeat the same keys (patient_info, doctor_info,
+medical_data, ...) in every document, so they shrink several times over
+when compressed. CompressionMiddleware compresses JSON and NDJSON
+responses for clients that accept it, choosing among zstd, br and gzip
+in COMPRESSION_ENCODINGS order (zstd needs the ``zstandard`` package and
+br the ``brotli`` package; gzip is always available). Responses smaller
+than COMPRESSION_MIN_SIZE are sent as they are. Streaming responses are
+compressed chunk by chunk and flushed after every chunk, so clients keep
+receiving data as it is encoded.
+
+Bytes in and out and the CPU time spent compressing are counted per
+encoding and reported by get_compression_stats().
+
+Settings (all optional):
+    COMPRESSION_ENCODINGS      Encodings offered, in order of preference (default ('zstd', 'br', 'gzip'))
+    COMPRESSION_LEVELS         {encoding: level} (default gzip 6, br 5, zstd 3)
+    COMPRESSION_MIN_SIZE       Smallest body in bytes worth compressing (default 1024)
+    COMPRESSION_CONTENT_TYPES  Content types compressed (default JSON and NDJSON)
+"""
+import threading
+import time
+import zlib
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+DEFAULT_LEVELS = {'gzip': 6, 'br': 5, 'zstd': 3}
+
+_stats_lock = threading.Lock()
+_stats = {'skipped': 0, 'encodings': {}}
+
+def available_encodings():
+    """The configured encodings this process can produce, in order of preference"""
+    configured = getattr(settings, 'COMPRESSION_ENCODINGS', ('zstd', 'br', 'gzip'))
+    installed = {'gzip': True, 'br': brotli is not None, 'zstd': zstandard is not None}
+    return [encoding for encoding in configured if installed.get(encoding)]
+
+def _level(encoding):
+    levels = getattr(settings, 'COMPRESSION_LEVELS', {})
+    return levels.get(encoding, DEFAULT_LEVELS[encoding])
+
+def _accepted(header):
+    # {coding: q} from an Accept-Encoding header
+    accepted = {}
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[coding] = q
+    return accepted
+
+def negotiate(header):
+    """The encoding to answer an Accept-Encoding header with, or None"""
+    accepted = _accepted(header or '')
+    best, best_q = None, 0.0
+    for encoding in available_encodings():
+        q = accepted.get(encoding, accepted.get('*', 0.0))
+        # Ties go to the earlier (preferred) encoding
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+class _Compressor:
+    """One encoding's compressor, with flush() ending each streamed chunk"""
+    def __init__(self, encoding):
+        level = _level(encoding)
+        self.encoding = encoding
+        if encoding == 'gzip':
+            self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+        elif encoding == 'br':
+            self._compressor = brotli.Compressor(quality=level)
+        else:
+            self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data):
+        if self.encoding == 'br':
+            return self._compressor.process(data)
+        return self._compressor.compress(data)
+
+    def flush(self):
+        if self.encoding == 'gzip':
+            return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+        if self.encoding == 'br':
+            return self._compressor.flush()
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        if self.encoding == 'br':
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+def _record(encoding, bytes_in, bytes_out, cpu_seconds):
+    with _stats_lock:
+        counters = _stats['encodings'].setdefault(
+            encoding, {'responses': 0, 'bytes_in': 0, 'bytes_out': 0, 'cpu_ms': 0.0}
+        )
+        counters['responses'] += 1
+        counters['bytes_in'] += bytes_in
+        counters['bytes_out'] += bytes_out
+        counters['cpu_ms'] += cpu_seconds * 1000
+
+def _record_skipped():
+    with _stats_lock:
+        _stats['skipped'] += 1
+
+def compress_bytes(data, encoding):
+    """data compressed in one go"""
+    started = time.thread_time()
+    compressor = _Compressor(encoding)
+    compressed = compressor.compress(data) + compressor.finish()
+    _record(encoding, len(data), len(compressed), time.thread_time() - started)
+    return compressed
+
+def compress_stream(chunks, encoding):
+    """Compress an iterable of byte chunks, yielding output as each chunk is flushed"""
+    compressor = _Compressor(encoding)
+    bytes_in = bytes_out = 0
+    cpu_seconds = 0.0
+    try:
+        for chunk in chunks:
+            started = time.thread_time()
+            compressed = compressor.compress(chunk) + compressor.flush()
+            cpu_seconds += time.thread_time() - started
+            bytes_in += len(chunk)
+            bytes_out += len(compressed)
+            if compressed:
+                yield compressed
+        started = time.thread_time()
+        compressed = compressor.finish()
+        cpu_seconds += time.thread_time() - started
+        bytes_out += len(compressed)
+        yield compressed
+    finally:
+        _record(encoding, bytes_in, bytes_out, cpu_seconds)
+
+class CompressionMiddleware:
+    """
+    Compress JSON responses for clients that send Accept-Encoding.
+    Place it above any middleware that reads or changes response bodies.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.min_size = getattr(settings, 'COMPRESSION_MIN_SIZE', 1024)
+        self.content_types = getattr(
+            settings, 'COMPRESSION_CONTENT_TYPES', ('application/json', 'application/x-ndjson')
+        )
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not self._compressible(response):
+            return response
+
+        # The body depends on Accept-Encoding whether or not this one is compressed
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = negotiate(request.META.get('HTTP_ACCEPT_ENCODING'))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            response.streaming_content = compress_stream(response.streaming_content, encoding)
+            # Length isn't known until the stream ends
+            del response['Content-Length']
+        else:
+            if len(response.content) < self.min_size:
+                _record_skipped()
+                return response
+            compressed = compress_bytes(response.content, encoding)
+            if len(compressed) >= len(response.content):
+                _record_skipped()
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+
+        # The compressed body isn't byte-identical to the one the ETag names
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+        return response
+
+    def _compressible(self, response):
+        if response.has_header('Content-Encoding') or response.status_code < 200 or response.status_code in (204, 304):
+            return False
+        content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+        return content_type in self.content_types
+
+def get_compression_stats():
+    with _stats_lock:
+        encodings = {}
+        for encoding, counters in _stats['encodings'].items():
+            encodings[encoding] = {
+                **counters,
+                'cpu_ms': round(counters['cpu_ms'], 2),
+                # Uncompressed size per compressed byte
+                'ratio': round(counters['bytes_in'] / counters['bytes_out'], 2) if counters['bytes_out'] else None,
+            }
+        return {
+            'available': available_encodings(),
+            'skipped': _stats['skipped'],
+            'encodings': encodings,
+        }
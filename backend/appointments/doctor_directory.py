@@ -0,0 +1,240 @@
+# appointments/doctor_directory.py
+"""
+In-process directory of doctors.
+
+Doctors are read on almost every request (the public doctor list the
+frontend polls, booking, availability, notifications) and change rarely,
+so each process keeps the whole collection in memory, indexed by id,
+user_id and specialization. Reads never touch MongoDB: a background
+thread keeps the copy current from a change stream on ``doctors``, and
+where change streams are not available (a standalone server or a local
+stand-in) it reloads every DOCTOR_DIRECTORY_POLL_INTERVAL seconds
+instead. Views that write doctors call invalidate(), which reloads at
+once, so this process sees its own writes immediately.
+
+Lookups by id or user_id that miss fall back to a query, so a doctor
+created moments ago in another process is still found.
+
+Specializations match case-insensitively. Queries that filter doctors by
+specialization in MongoDB instead use SPECIALIZATION_COLLATION, so both
+paths return the same doctors.
+
+Documents handed out by all() and by_specialization() are shared and
+must not be modified; get() and by_user() return copies.
+
+Settings (all optional):
+    DOCTOR_DIRECTORY_POLL_INTERVAL  Seconds between reloads without change streams (default 30)
+"""
+import os
+import threading
+import time
+from bisect import bisect_right
+from collections import defaultdict, namedtuple
+from datetime import datetime
+
+from django.conf import settings
+from pymongo.collation import Collation
+from pymongo.errors import OperationFailure
+
+from .mongo_utils import get_mongodb_database
+
+_Snapshot = namedtuple('_Snapshot', 'doctors keys by_id by_user by_specialization loaded_at')
+
+def _sort_key(doctor):
+    # _id order, like an unsorted keyset page from MongoDB
+    return str(doctor.get('_id', ''))
+
+# Case-insensitive comparison, matching the doctors.specialization index in settings
+SPECIALIZATION_COLLATION = Collation(locale='en', strength=2)
+
+def _specialization_key(value):
+    # What SPECIALIZATION_COLLATION compares
+    return str(value or '').lower()
+
+class DoctorDirectory:
+    """The doctors collection held in memory and kept current in the background"""
+    def __init__(self, poll_interval=None):
+        self.poll_interval = poll_interval or getattr(settings, 'DOCTOR_DIRECTORY_POLL_INTERVAL', 30)
+        self._snapshot = None
+        self._reload_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._mode = None
+        self._stats = {'reloads': 0, 'changes': 0, 'misses': 0, 'errors': 0, 'last_reload_ms': 0}
+
+    def reload(self):
+        """Load every doctor from MongoDB and swap the indexes in"""
+        with self._reload_lock:
+            started = time.perf_counter()
+            loaded_at = datetime.now()
+            doctors = sorted(get_mongodb_database().doctors.find(), key=_sort_key)
+            by_specialization = defaultdict(list)
+            for doctor in doctors:
+                by_specialization[_specialization_key(doctor.get('specialization'))].append(doctor)
+            # Readers pick up the new snapshot with a single reference swap
+            self._snapshot = _Snapshot(
+                doctors=doctors,
+                keys=[_sort_key(doctor) for doctor in doctors],
+                by_id={doctor['id']: doctor for doctor in doctors if doctor.get('id')},
+                by_user={doctor['user_id']: doctor for doctor in doctors if doctor.get('user_id')},
+                by_specialization=dict(by_specialization),
+                loaded_at=loaded_at,
+            )
+        with self._lock:
+            self._stats['reloads'] += 1
+            self._stats['last_reload_ms'] = round((time.perf_counter() - started) * 1000, 2)
+        return self._snapshot
+
+    def invalidate(self):
+        """Reload after a write to doctors, so this process serves it at once"""
+        try:
+            self.reload()
+        except Exception as e:
+            # The next read loads a fresh copy instead
+            self._snapshot = None
+            print(f"Doctor directory reload error: {str(e)}")
+
+    def _current(self):
+        self._ensure_started()
+        snapshot = self._snapshot
+        if snapshot is None:
+            # First use in this process
+            snapshot = self.reload()
+        return snapshot
+
+    def _ensure_started(self):
+        # Threads don't survive a fork, so each worker process starts its own
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='doctor-directory')
+            self._thread.daemon = True  # Allow the thread to exit when the main program exits
+            self._thread.start()
+
+    def _run(self):
+        if self._watch():
+            return
+        self._mode = 'polling'
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                self.reload()
+            except Exception as e:
+                with self._lock:
+                    self._stats['errors'] += 1
+                print(f"[{datetime.now()}] Doctor directory poll error: {str(e)}")
+
+    def _watch(self):
+        """
+        Follow the change stream, reloading once per burst of changes.
+        Returns False when change streams are not supported here.
+        """
+        resume_token = None
+        while True:
+            try:
+                with get_mongodb_database().doctors.watch(resume_after=resume_token) as stream:
+                    self._mode = 'change_stream'
+                    if resume_token is None:
+                        # Changes made before the stream was opened
+                        self.reload()
+                    pending = False
+                    while stream.alive:
+                        change = stream.try_next()
+                        if change is not None:
+                            pending = True
+                            with self._lock:
+                                self._stats['changes'] += 1
+                            continue
+                        if pending:
+                            self.reload()
+                            pending = False
+                        resume_token = stream.resume_token
+            except (OperationFailure, NotImplementedError) as e:
+                if resume_token is None:
+                    print(f"Doctor directory: change streams unavailable ({str(e)}), polling instead")
+                    return False
+                # The resume point may be gone; start over from a full load
+                resume_token = None
+                with self._lock:
+                    self._stats['errors'] += 1
+            except Exception as e:
+                with self._lock:
+                    self._stats['errors'] += 1
+                print(f"[{datetime.now()}] Doctor directory change stream error: {str(e)}")
+                time.sleep(min(self.poll_interval, 5))
+
+    def _fetch(self, query):
+        with self._lock:
+            self._stats['misses'] += 1
+        return get_mongodb_database().doctors.find_one(query)
+
+    def get(self, doctor_id):
+        """The doctor with this id, or None"""
+        doctor = self._current().by_id.get(doctor_id)
+        if doctor is None:
+            return self._fetch({'id': doctor_id})
+        return dict(doctor)
+
+    def by_user(self, user_id):
+        """The doctor profile of a user, or None"""
+        doctor = self._current().by_user.get(user_id)
+        if doctor is None:
+            return self._fetch({'user_id': user_id})
+        return dict(doctor)
+
+    def all(self):
+        return self._current().doctors
+
+    def by_specialization(self, specialization):
+        """Doctors with this specialization (case-insensitive)"""
+        return self._current().by_specialization.get(_specialization_key(specialization), [])
+
+    def page(self, limit, after=None, specialization=None):
+        """
+        One page of doctors in _id order, like paginate_find: returns
+        (doctors, next_cursor) with next_cursor None on the last page.
+        With limit None, every doctor from ``after`` on.
+        """
+        snapshot = self._current()
+        if specialization:
+            doctors = snapshot.by_specialization.get(_specialization_key(specialization), [])
+            keys = [_sort_key(doctor) for doctor in doctors]
+        else:
+            doctors, keys = snapshot.doctors, snapshot.keys
+        start = bisect_right(keys, str(after)) if after is not None else 0
+        if limit is None:
+            return doctors[start:], None
+        page = doctors[start:start + limit]
+        next_cursor = None
+        if start + limit < len(doctors):
+            next_cursor = _sort_key(page[-1])
+        return page, next_cursor
+
+    def stats(self):
+        snapshot = self._snapshot
+        with self._lock:
+            return {
+                'size': len(snapshot.doctors) if snapshot else 0,
+                'mode': self._mode,
+                'loaded_at': snapshot.loaded_at if snapshot else None,
+                'poll_interval': self.poll_interval,
+                **self._stats,
+            }
+
+doctor_directory = DoctorDirectory()
+
+def _reset_after_fork():
+    # The child starts its own watcher and loads its own copy
+    doctor_directory._lock = threading.Lock()
+    doctor_directory._reload_lock = threading.Lock()
+    doctor_directory._thread = None
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+def get_doctor_directory_stats():
+    return doctor_directory.stats()
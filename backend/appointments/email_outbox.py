@@ -0,0 +1,316 @@
+# appointments/email_outbox.py
+"""
+Persistent outbox for notification emails.
+
+Emails are queued in the ``email_outbox`` collection and delivered by a
+small pool of worker threads, so a slow SMTP/SendGrid call never blocks a
+request or the notification scheduler. Workers claim a batch at a time,
+send it over one backend connection, retry failures with exponential
+backoff and record the outcome with bulk writes (the email_sent flags on
+notifications go through the write-behind buffer).
+
+Settings (all optional):
+    EMAIL_OUTBOX_BACKEND       Django email backend for the outbox; 'console'
+                               and 'file' are shorthands for Django's console
+                               and file-based backends (EMAIL_FILE_PATH)
+    EMAIL_OUTBOX_WORKERS       Worker threads (default 2)
+    EMAIL_OUTBOX_BATCH_SIZE    Emails claimed per batch (default 50)
+    EMAIL_OUTBOX_POLL_INTERVAL Seconds between polls when idle (default 5)
+    EMAIL_OUTBOX_MAX_ATTEMPTS  Attempts before an email is marked failed (default 5)
+    EMAIL_OUTBOX_RETRY_DELAY   Base retry delay in seconds, doubled per attempt (default 30)
+    EMAIL_OUTBOX_CLAIM_TIMEOUT Seconds before a claimed batch is considered
+                               abandoned and handed out again (default 300)
+"""
+import os
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.utils.html import strip_tags
+from pymongo import ASCENDING, UpdateOne
+
+from .mongo_utils import get_mongodb_database
+from .write_behind import write_behind
+
+OUTBOX_COLLECTION = 'email_outbox'
+
+STATUS_PENDING = 'pending'
+STATUS_SENDING = 'sending'
+STATUS_SENT = 'sent'
+STATUS_FAILED = 'failed'
+
+BACKEND_ALIASES = {
+    'console': 'django.core.mail.backends.console.EmailBackend',
+    'file': 'django.core.mail.backends.filebased.EmailBackend',
+}
+
+# Longest wait between two attempts, however many have failed
+MAX_RETRY_DELAY = timedelta(hours=6)
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+def get_outbox_backend():
+    """Dotted path of the email backend the outbox sends through"""
+    backend = _setting('EMAIL_OUTBOX_BACKEND', None) or settings.EMAIL_BACKEND
+    return BACKEND_ALIASES.get(backend, backend)
+
+def _outbox():
+    return get_mongodb_database()[OUTBOX_COLLECTION]
+
+def html_to_text(html_content):
+    """Plain-text alternative for an HTML email body"""
+    try:
+        from html2text import html2text
+        return html2text(html_content)
+    except ImportError:
+        # Fallback if html2text is not available
+        return strip_tags(html_content)
+
+def retry_delay(attempts):
+    """Backoff before the next attempt, after `attempts` failed ones"""
+    base = _setting('EMAIL_OUTBOX_RETRY_DELAY', 30)
+    return min(timedelta(seconds=base * (2 ** max(attempts - 1, 0))), MAX_RETRY_DELAY)
+
+def _outbox_document(to_email, subject, html_content, text_content=None, notification_id=None):
+    now = datetime.now()
+    return {
+        '_id': str(uuid.uuid4()),
+        'to': to_email,
+        'subject': subject,
+        'html': html_content,
+        'text': text_content,
+        'notification_id': notification_id,
+        'status': STATUS_PENDING,
+        'attempts': 0,
+        'next_attempt_at': now,
+        'created_at': now,
+        'updated_at': now,
+    }
+
+def enqueue_emails(emails):
+    """
+    Queue several emails with one insert.
+
+    Args:
+        emails: iterable of dicts with to_email, subject, html_content and
+            optionally text_content and notification_id
+
+    Returns:
+        list: outbox ids of the queued emails
+    """
+    documents = [_outbox_document(**email) for email in emails]
+    if not documents:
+        return []
+    _outbox().insert_many(documents, ordered=False)
+    outbox_worker.wake()
+    return [document['_id'] for document in documents]
+
+def enqueue_email(to_email, subject, html_content, text_content=None, notification_id=None):
+    """Queue one email; returns its outbox id"""
+    return enqueue_emails([{
+        'to_email': to_email,
+        'subject': subject,
+        'html_content': html_content,
+        'text_content': text_content,
+        'notification_id': notification_id,
+    }])[0]
+
+def claim_batch(batch_size=None, now=None):
+    """
+    Claim up to `batch_size` due emails for this worker.
+
+    Emails left in 'sending' by a worker that died are reclaimed once the
+    claim timeout has passed. Returns the claimed outbox documents.
+    """
+    outbox = _outbox()
+    now = now or datetime.now()
+    batch_size = batch_size or _setting('EMAIL_OUTBOX_BATCH_SIZE', 50)
+    stale_before = now - timedelta(seconds=_setting('EMAIL_OUTBOX_CLAIM_TIMEOUT', 300))
+
+    due = {'$or': [
+        {'status': STATUS_PENDING, 'next_attempt_at': {'$lte': now}},
+        {'status': STATUS_SENDING, 'claimed_at': {'$lt': stale_before}},
+    ]}
+    candidate_ids = [
+        doc['_id'] for doc in
+        outbox.find(due, {'_id': 1}).sort('next_attempt_at', ASCENDING).limit(batch_size)
+    ]
+    if not candidate_ids:
+        return []
+
+    # Only documents still due are taken, so concurrent workers never share one
+    claim_token = str(uuid.uuid4())
+    outbox.update_many(
+        {'$and': [{'_id': {'$in': candidate_ids}}, due]},
+        {'$set': {'status': STATUS_SENDING, 'claim_token': claim_token, 'claimed_at': now}}
+    )
+    return list(outbox.find({'claim_token': claim_token}))
+
+def _build_message(document, connection):
+    message = EmailMultiAlternatives(
+        subject=document['subject'],
+        body=document.get('text') or html_to_text(document['html']),
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[document['to']],
+        connection=connection
+    )
+    message.attach_alternative(document['html'], "text/html")
+    return message
+
+def deliver_batch(documents):
+    """
+    Send claimed emails over a single backend connection and record the
+    results in bulk. Returns (sent, failed) counts.
+    """
+    if not documents:
+        return 0, 0
+
+    results = {}
+    try:
+        connection = get_connection(backend=get_outbox_backend(), fail_silently=False)
+        with connection:
+            for document in documents:
+                try:
+                    connection.send_messages([_build_message(document, connection)])
+                    results[document['_id']] = None
+                except Exception as e:
+                    results[document['_id']] = str(e)
+    except Exception as e:
+        # Couldn't open the connection: the whole batch is retried
+        print(f"Email outbox connection error: {str(e)}")
+        for document in documents:
+            results.setdefault(document['_id'], str(e))
+
+    now = datetime.now()
+    max_attempts = _setting('EMAIL_OUTBOX_MAX_ATTEMPTS', 5)
+    outbox_updates = []
+    sent = failed = 0
+    for document in documents:
+        error = results.get(document['_id'])
+        attempts = document.get('attempts', 0) + 1
+        claimed = {'_id': document['_id'], 'claim_token': document['claim_token']}
+        if error is None:
+            sent += 1
+            outbox_updates.append(UpdateOne(claimed, {
+                '$set': {'status': STATUS_SENT, 'attempts': attempts, 'sent_at': now, 'updated_at': now},
+                '$unset': {'claim_token': '', 'claimed_at': ''}
+            }))
+            if document.get('notification_id'):
+                # Informational flag only, so it is written behind
+                write_behind.set('notifications', {'id': document['notification_id']}, {'email_sent': True, 'email_sent_at': now})
+        else:
+            failed += 1
+            print(f"Error sending email to {document['to']} (attempt {attempts}): {error}")
+            outbox_updates.append(UpdateOne(claimed, {
+                '$set': {
+                    'status': STATUS_FAILED if attempts >= max_attempts else STATUS_PENDING,
+                    'attempts': attempts,
+                    'last_error': error,
+                    'next_attempt_at': now + retry_delay(attempts),
+                    'updated_at': now,
+                },
+                '$unset': {'claim_token': '', 'claimed_at': ''}
+            }))
+
+    _outbox().bulk_write(outbox_updates, ordered=False)
+    return sent, failed
+
+def process_outbox(max_batches=None):
+    """
+    Deliver due emails until the outbox is drained (or `max_batches` is
+    reached). Returns (sent, failed) totals.
+    """
+    total_sent = total_failed = batches = 0
+    while max_batches is None or batches < max_batches:
+        documents = claim_batch()
+        if not documents:
+            break
+        sent, failed = deliver_batch(documents)
+        total_sent += sent
+        total_failed += failed
+        batches += 1
+    return total_sent, total_failed
+
+def get_outbox_stats():
+    """Number of outbox emails per status"""
+    try:
+        counts = {row['_id']: row['count'] for row in _outbox().aggregate([
+            {'$group': {'_id': '$status', 'count': {'$sum': 1}}}
+        ])}
+    except Exception as e:
+        print(f"Email outbox stats error: {str(e)}")
+        counts = {}
+    stats = {status: counts.get(status, 0) for status in (STATUS_PENDING, STATUS_SENDING, STATUS_SENT, STATUS_FAILED)}
+    stats['backend'] = get_outbox_backend()
+    stats['workers'] = len(outbox_worker.threads)
+    return stats
+
+class EmailOutboxWorker:
+    """Pool of background threads delivering the email outbox"""
+    def __init__(self, workers=None, poll_interval=None):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.running = False
+        self.threads = []
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def start(self):
+        """Start the worker threads, once per process"""
+        # Threads don't survive a fork, so each worker process starts its own
+        if self.running and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self.running and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self.running = True
+            self.threads = []
+            workers = self.workers or _setting('EMAIL_OUTBOX_WORKERS', 2)
+            for index in range(workers):
+                thread = threading.Thread(target=self._run, name=f'email-outbox-{index}')
+                thread.daemon = True  # Allow the thread to exit when the main program exits
+                thread.start()
+                self.threads.append(thread)
+        print(f"[{datetime.now()}] Email outbox started with {workers} workers")
+
+    def stop(self):
+        """Stop the worker threads"""
+        self.running = False
+        self._wakeup.set()
+        for thread in self.threads:
+            thread.join(timeout=5)
+        self.threads = []
+
+    def wake(self):
+        """Deliver newly queued emails without waiting for the next poll"""
+        self._wakeup.set()
+
+    def _run(self):
+        poll_interval = self.poll_interval or _setting('EMAIL_OUTBOX_POLL_INTERVAL', 5)
+        while self.running:
+            try:
+                documents = claim_batch()
+                if documents:
+                    deliver_batch(documents)
+                    continue
+            except Exception as e:
+                print(f"[{datetime.now()}] Error in email outbox worker: {str(e)}")
+
+            self._wakeup.wait(poll_interval)
+            self._wakeup.clear()
+
+outbox_worker = EmailOutboxWorker()
+
+def _reset_after_fork():
+    # The child starts its own workers on first use
+    outbox_worker._lock = threading.Lock()
+    outbox_worker._wakeup = threading.Event()
+    outbox_worker.threads = []
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
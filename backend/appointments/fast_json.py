@@ -0,0 +1,140 @@
+# appointments/fast_json.py
+"""
+Fast JSON encoding for API responses.
+
+JsonResponse(..., encoder=MongoJSONEncoder) runs the stdlib encoder and
+calls back into Python for every ObjectId and datetime, which on admin
+list views (hundreds of appointments, each with several dates and ids)
+is a large share of the request's CPU time. dumps() encodes with orjson
+instead, which handles datetime, date, UUID and dicts natively and only
+calls default() for the BSON types; without orjson installed it falls
+back to the stdlib encoder with MongoJSONEncoder.
+
+The output matches MongoJSONEncoder: ObjectIds become their hex string
+and datetimes ISO 8601 strings (naive datetimes stay without an offset).
+
+MongoJsonResponse is a drop-in for JsonResponse(..., encoder=MongoJSONEncoder).
+StreamingMongoJsonResponse encodes documents as they come off a cursor
+and sends them in chunks, as a JSON array or as NDJSON (one document per
+line), so a listing of any size never sits in memory whole.
+``manage.py benchmark_json`` compares both encoders on a synthetic
+appointment list.
+
+Settings (all optional):
+    MONGO_JSON_SERIALIZER         'orjson' or 'stdlib' (default 'orjson' when installed)
+    MONGO_JSON_STREAM_CHUNK_SIZE  Bytes buffered per chunk of a streamed response (default 65536)
+"""
+import json
+import uuid
+from decimal import Decimal
+
+from bson import Decimal128, ObjectId
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+
+from .mongodb_json_encoder import MongoJSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def _default(obj):
+    # Only reached for types orjson does not encode itself
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, Decimal128):
+        return str(obj.to_decimal())
+    if isinstance(obj, Decimal):
+        return str(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+class _StdlibEncoder(MongoJSONEncoder):
+    """MongoJSONEncoder plus the types the orjson path also accepts"""
+    def default(self, obj):
+        if isinstance(obj, uuid.UUID):
+            return str(obj)
+        try:
+            return _default(obj)
+        except TypeError:
+            return super().default(obj)
+
+def serializer_name():
+    """The serializer dumps() uses: 'orjson' or 'stdlib'"""
+    name = getattr(settings, 'MONGO_JSON_SERIALIZER', 'orjson')
+    if name == 'orjson' and orjson is not None:
+        return 'orjson'
+    return 'stdlib'
+
+if orjson is not None:
+    def _orjson_dumps(obj):
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+def _stdlib_dumps(obj):
+    return json.dumps(obj, cls=_StdlibEncoder).encode('utf-8')
+
+def dumps(obj):
+    """Encode obj (documents straight from pymongo included) to JSON bytes"""
+    if serializer_name() == 'orjson':
+        return _orjson_dumps(obj)
+    return _stdlib_dumps(obj)
+
+class MongoJsonResponse(HttpResponse):
+    """
+    JsonResponse that encodes with dumps(). Like JsonResponse, only dicts
+    are accepted unless safe=False.
+    """
+    def __init__(self, data, safe=True, **kwargs):
+        if safe and not isinstance(data, dict):
+            raise TypeError(
+                'In order to allow non-dict objects to be serialized set the '
+                'safe parameter to False.'
+            )
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(content=dumps(data), **kwargs)
+
+def _chunks(documents, ndjson):
+    # Encoded documents are gathered into chunks of about chunk_size bytes
+    chunk_size = getattr(settings, 'MONGO_JSON_STREAM_CHUNK_SIZE', 65536)
+    separator = b'\n' if ndjson else b','
+    buffer = [] if ndjson else [b'[']
+    size = 0
+    first = True
+    try:
+        for document in documents:
+            encoded = dumps(document)
+            if ndjson:
+                buffer.append(encoded + separator)
+            else:
+                buffer.append(encoded if first else separator + encoded)
+            first = False
+            size += len(encoded) + 1
+            if size >= chunk_size:
+                yield b''.join(buffer)
+                buffer = []
+                size = 0
+        if not ndjson:
+            buffer.append(b']')
+        if buffer:
+            yield b''.join(buffer)
+    finally:
+        close = getattr(documents, 'close', None)
+        if close:
+            close()
+
+class StreamingMongoJsonResponse(StreamingHttpResponse):
+    """
+    A listing streamed from an iterable of documents (typically a pymongo
+    cursor) as a JSON array, or as NDJSON when ndjson=True. Headers go out
+    before the first document is read, so errors must be raised before
+    the response is built.
+    """
+    def __init__(self, documents, ndjson=False, **kwargs):
+        kwargs.setdefault('content_type', 'application/x-ndjson' if ndjson else 'application/json')
+        super().__init__(streaming_content=_chunks(documents, ndjson), **kwargs)
+        close = getattr(documents, 'close', None)
+        if close:
+            # Also release the cursor if the client goes away before streaming starts
+            self._resource_closers.append(close)
@@ -0,0 +1,63 @@
+# appointments/management/commands/backfill_email_normalized.py
+from django.core.management.base import BaseCommand
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from appointments.mongo_utils import get_mongodb_database, normalize_email
+
+class Command(BaseCommand):
+    help = 'Set email_normalized on users that are missing it, so login can use an index point lookup'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Users updated per bulk write')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the users that need updating')
+
+    def handle(self, *args, **options):
+        db = get_mongodb_database()
+        batch_size = options['batch_size']
+
+        # Streams the users through a cursor; only _id and email are read
+        cursor = db.users.find(
+            {'email_normalized': {'$exists': False}, 'email': {'$type': 'string'}},
+            {'_id': 1, 'email': 1}
+        ).batch_size(batch_size)
+
+        updated = skipped = 0
+        batch = []
+        for user in cursor:
+            if options['dry_run']:
+                updated += 1
+                continue
+            batch.append(UpdateOne(
+                {'_id': user['_id'], 'email_normalized': {'$exists': False}},
+                {'$set': {'email_normalized': normalize_email(user['email'])}}
+            ))
+            if len(batch) >= batch_size:
+                written, failed = self._write(db, batch)
+                updated += written
+                skipped += failed
+                batch = []
+        if batch:
+            written, failed = self._write(db, batch)
+            updated += written
+            skipped += failed
+
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f'{updated} users need email_normalized'))
+            return
+        self.stdout.write(self.style.SUCCESS(f'email_normalized set on {updated} users'))
+        if skipped:
+            self.stdout.write(self.style.WARNING(
+                f'{skipped} users skipped: their email differs only in case from another account'
+            ))
+
+    def _write(self, db, batch):
+        try:
+            result = db.users.bulk_write(batch, ordered=False)
+            return result.modified_count, 0
+        except BulkWriteError as e:
+            for error in e.details.get('writeErrors', []):
+                if error.get('code') == 11000:
+                    self.stdout.write(self.style.WARNING(f"Duplicate email: {error['op']['q']['_id']}"))
+                else:
+                    self.stdout.write(self.style.ERROR(error.get('errmsg', 'Unknown write error')))
+            return e.details.get('nModified', 0), len(e.details.get('writeErrors', []))
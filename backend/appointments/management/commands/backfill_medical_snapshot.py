@@ -0,0 +1,39 @@
+# appointments/management/commands/backfill_medical_snapshot.py
+from django.core.management.base import BaseCommand
+from pymongo import UpdateOne
+from appointments.medical_snapshot import SNAPSHOT_FIELD, SOURCE_FIELDS, build_snapshot
+from appointments.mongo_utils import get_mongodb_database
+
+class Command(BaseCommand):
+    help = 'Set medical_snapshot on patients that are missing it, so appointment creation can embed it with one read'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Patients updated per bulk write')
+        parser.add_argument('--rebuild', action='store_true', help='Rebuild the snapshot of every patient, not only missing ones')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the patients that need updating')
+
+    def handle(self, *args, **options):
+        db = get_mongodb_database()
+        batch_size = options['batch_size']
+
+        # Streams the patients through a cursor; only the medical fields are read
+        query = {} if options['rebuild'] else {SNAPSHOT_FIELD: {'$exists': False}}
+        cursor = db.patients.find(query, {'_id': 1, **{field: 1 for field in SOURCE_FIELDS}}).batch_size(batch_size)
+
+        updated = 0
+        batch = []
+        for patient in cursor:
+            if options['dry_run']:
+                updated += 1
+                continue
+            batch.append(UpdateOne({'_id': patient['_id']}, {'$set': {SNAPSHOT_FIELD: build_snapshot(patient)}}))
+            if len(batch) >= batch_size:
+                updated += db.patients.bulk_write(batch, ordered=False).modified_count
+                batch = []
+        if batch:
+            updated += db.patients.bulk_write(batch, ordered=False).modified_count
+
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f'{updated} patients need a medical snapshot'))
+            return
+        self.stdout.write(self.style.SUCCESS(f'Medical snapshot set on {updated} patients'))
@@ -0,0 +1,74 @@
+# appointments/management/commands/benchmark_json.py
+import json
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from django.core.management.base import BaseCommand, CommandError
+from appointments import fast_json
+from appointments.mongodb_json_encoder import MongoJSONEncoder
+
+def _appointments(count):
+    # Shaped like the documents the admin appointment list returns
+    now = datetime.now().replace(microsecond=0)
+    appointments = []
+    for i in range(count):
+        created = now - timedelta(days=i % 365, minutes=i)
+        appointments.append({
+            '_id': ObjectId(),
+            'id': str(uuid.uuid4()),
+            'doctor_id': str(ObjectId()),
+            'patient_id': str(ObjectId()),
+            'doctor_name': f'Dr. Doctor {i % 50}',
+            'patient_name': f'Patient {i}',
+            'date': created.isoformat(),
+            'slot_start': created,
+            'status': ('scheduled', 'completed', 'cancelled')[i % 3],
+            'notes': 'Follow-up visit',
+            'medical_data': {
+                'blood_type': 'O+',
+                'allergies': ['Penicillin'],
+                'medications': ['Ibuprofen', 'Metformin'],
+                'medical_conditions': ['Hypertension'],
+                'reason_for_visit': 'Follow-up visit',
+            },
+            'created_at': created,
+            'updated_at': created + timedelta(hours=1),
+        })
+    return appointments
+
+class Command(BaseCommand):
+    help = 'Compare MongoJSONEncoder with the fast_json serializer on a synthetic appointment list'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=1000, help='Appointments in the encoded list')
+        parser.add_argument('--rounds', type=int, default=20, help='Times each encoder encodes the list')
+
+    def handle(self, *args, **options):
+        if fast_json.orjson is None:
+            raise CommandError('orjson is not installed; fast_json falls back to the stdlib encoder')
+
+        appointments = _appointments(options['count'])
+        rounds = options['rounds']
+        encoders = [
+            ('MongoJSONEncoder', lambda data: json.dumps(data, cls=MongoJSONEncoder).encode('utf-8')),
+            ('fast_json (orjson)', fast_json._orjson_dumps),
+        ]
+
+        # Both must produce the same document before their speed matters
+        expected = json.loads(encoders[0][1](appointments))
+        results = []
+        for name, encode in encoders:
+            if json.loads(encode(appointments)) != expected:
+                raise CommandError(f'{name} output differs from MongoJSONEncoder')
+            started = time.perf_counter()
+            for _ in range(rounds):
+                encode(appointments)
+            results.append((name, (time.perf_counter() - started) * 1000 / rounds))
+
+        baseline = results[0][1]
+        self.stdout.write(f"{options['count']} appointments, {rounds} rounds")
+        for name, elapsed in results:
+            self.stdout.write(f'  {name:<20} {elapsed:8.2f} ms per list  {baseline / elapsed:5.1f}x')
+        self.stdout.write(self.style.SUCCESS(f'Active serializer: {fast_json.serializer_name()}'))
@@ -1,9 +1,8 @@
 # appointments/management/commands/create_mongodb_superuser.py
 from django.core.management.base import BaseCommand
-from pymongo import MongoClient
-from django.conf import settings
+from appointments.mongo_utils import find_user_by_email, get_mongodb_database, normalize_email
+from appointments.password_hashing import hash_password
 import getpass
-import bcrypt
 import uuid
 from datetime import datetime
 
@@ -27,11 +26,10 @@ class Command(BaseCommand):
         non_interactive = options.get('non_interactive', False)
 
         # Connect to MongoDB
-        client = MongoClient(settings.MONGODB_URI)
-        db = client[settings.MONGODB_NAME]
+        db = get_mongodb_database()
         
         # Check if user already exists
-        existing_user = db.users.find_one({'$or': [{'username': username}, {'email': email}]})
+        existing_user = db.users.find_one({'username': username}) or find_user_by_email(email)
         if existing_user:
             self.stdout.write(self.style.ERROR(f"User with username '{username}' or email '{email}' already exists."))
             return
@@ -48,13 +46,14 @@ class Command(BaseCommand):
             return
 
         # Hash the password
-        hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        hashed_password = hash_password(password)
         
         # Create user document
         user = {
             'id': str(uuid.uuid4()),  # Generate a unique ID
             'username': username,
             'email': email,
+            'email_normalized': normalize_email(email),
             'first_name': first_name,
             'last_name': last_name,
             'password': hashed_password,
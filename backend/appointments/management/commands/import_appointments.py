@@ -0,0 +1,39 @@
+# appointments/management/commands/import_appointments.py
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from appointments import bulk_import
+
+class Command(BaseCommand):
+    help = 'Import appointments from a JSONL or CSV file (see appointments.bulk_import for the columns)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to import')
+        parser.add_argument('--format', choices=bulk_import.FORMATS, default=None, help='Defaults to csv for .csv files, jsonl otherwise')
+        parser.add_argument('--batch-size', type=int, default=None, help='Rows resolved and inserted per batch')
+        parser.add_argument('--dry-run', action='store_true', help='Validate and report without writing')
+        parser.add_argument('--report', default=None, help='Write the per-row results to this JSON file')
+
+    def handle(self, *args, **options):
+        import_format = options['format'] or bulk_import.detect_format(options['path'])
+        try:
+            with open(options['path'], encoding='utf-8-sig', newline='') as stream:
+                report = bulk_import.import_appointments(
+                    stream, import_format, batch_size=options['batch_size'], dry_run=options['dry_run']
+                )
+        except (OSError, bulk_import.ImportFormatError) as e:
+            raise CommandError(str(e))
+
+        for result in report['results']:
+            if result['status'] != bulk_import.CREATED:
+                self.stdout.write(self.style.WARNING(f"Row {result['row']}: {result['status']} - {result['error']}"))
+
+        if options['report']:
+            with open(options['report'], 'w') as report_file:
+                json.dump(report, report_file, indent=2, default=str)
+
+        prefix = 'Dry run: ' if options['dry_run'] else ''
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}{report['total']} rows, {report['created']} created, "
+            f"{report['conflict']} conflicts, {report['error']} errors"
+        ))
@@ -0,0 +1,43 @@
+# appointments/management/commands/migrate_booking_history.py
+from django.core.management.base import BaseCommand
+from appointments.booking_history import HISTORY_COLLECTION, LEGACY_COLLECTION, bucket_documents
+from appointments.mongo_utils import get_mongodb_database
+
+class Command(BaseCommand):
+    help = (
+        'Move the per-doctor booking history arrays into month buckets, one doctor at a time. '
+        'Each doctor\'s old document is deleted once its buckets are written, so the command can be re-run.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be migrated')
+
+    def handle(self, *args, **options):
+        db = get_mongodb_database()
+        legacy = db[LEGACY_COLLECTION]
+        buckets = db[HISTORY_COLLECTION]
+        dry_run = options['dry_run']
+
+        doctors = entries = written = 0
+        # One history document in memory at a time
+        for history in legacy.find({}, batch_size=1).sort('_id', 1):
+            if not history.get('doctor_id'):
+                continue
+            documents = bucket_documents(history['doctor_id'], history.get('bookings', []), migrated_from=history['_id'])
+            doctors += 1
+            entries += len(history.get('bookings', []))
+            written += len(documents)
+            if dry_run:
+                continue
+
+            # Buckets left by an interrupted run are replaced, not duplicated
+            buckets.delete_many({'migrated_from': history['_id']})
+            if documents:
+                buckets.insert_many(documents)
+            legacy.delete_one({'_id': history['_id']})
+            self.stdout.write(f"Doctor {history['doctor_id']}: {len(history.get('bookings', []))} entries in {len(documents)} buckets")
+
+        verb = 'would be' if dry_run else 'were'
+        self.stdout.write(self.style.SUCCESS(
+            f'{entries} booking history entries of {doctors} doctors {verb} migrated into {written} buckets'
+        ))
@@ -0,0 +1,14 @@
+# appointments/management/commands/process_email_outbox.py
+from django.core.management.base import BaseCommand
+from appointments import email_outbox
+
+class Command(BaseCommand):
+    help = 'Deliver due emails from the email outbox (useful from cron or when the background workers are disabled)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-batches', type=int, default=None, help='Stop after this many batches')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'Delivering email outbox via {email_outbox.get_outbox_backend()}...')
+        sent, failed = email_outbox.process_outbox(max_batches=options['max_batches'])
+        self.stdout.write(self.style.SUCCESS(f'Email outbox processed: {sent} sent, {failed} failed'))
@@ -0,0 +1,11 @@
+# appointments/management/commands/rebuild_appointment_stats.py
+from django.core.management.base import BaseCommand
+from appointments import mongo_stats
+
+class Command(BaseCommand):
+    help = 'Rebuild the appointment_daily_stats rollup used by the statistics endpoints'
+
+    def handle(self, *args, **options):
+        self.stdout.write('Rebuilding appointment statistics rollup...')
+        rows = mongo_stats.rebuild_rollup()
+        self.stdout.write(self.style.SUCCESS(f'Appointment statistics rollup rebuilt ({rows} day/doctor/status rows)'))
@@ -0,0 +1,61 @@
+# appointments/management/commands/resolve_double_bookings.py
+from datetime import datetime
+
+from django.core.management.base import BaseCommand
+from appointments.mongo_stats import record_appointment_change
+from appointments.mongo_utils import get_mongodb_database
+
+class Command(BaseCommand):
+    help = (
+        'Cancel all but the earliest of scheduled appointments that share a doctor and start time, '
+        'so the scheduled_doctor_id_slot unique index can be built. Run before deploying it, and '
+        'before normalize_appointments --restart when that reports double-booked appointments.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only list the double bookings')
+
+    def handle(self, *args, **options):
+        db = get_mongodb_database()
+        duplicates = db.appointments.aggregate([
+            {'$match': {
+                'status': 'scheduled',
+                '$or': [{'doctor_id': {'$type': 'string'}}, {'doctor': {'$type': 'string'}}]
+            }},
+            {'$sort': {'_id': 1}},
+            # Older appointments not yet normalized only carry doctor
+            {'$group': {
+                '_id': {'date': '$date', 'doctor_id': {'$ifNull': ['$doctor_id', '$doctor']}},
+                'ids': {'$push': '$_id'},
+                'count': {'$sum': 1}
+            }},
+            {'$match': {'count': {'$gt': 1}}},
+        ], allowDiskUse=True)
+
+        slots = 0
+        cancelled = []
+        for group in duplicates:
+            slots += 1
+            # The first booking keeps the slot
+            kept, *extra = group['ids']
+            self.stdout.write(
+                f"Doctor {group['_id']['doctor_id']} at {group['_id']['date']}: keeping {kept}, cancelling {', '.join(map(str, extra))}"
+            )
+            cancelled.extend(extra)
+
+        if options['dry_run'] or not cancelled:
+            self.stdout.write(self.style.SUCCESS(f'{slots} double-booked slots, {len(cancelled)} appointments to cancel'))
+            return
+
+        changes = {'status': 'cancelled', 'cancellation_reason': 'double booking', 'updated_at': datetime.now()}
+        modified = 0
+        for appointment_id in cancelled:
+            # One at a time, so each cancellation moves the statistics rollup
+            before = db.appointments.find_one_and_update(
+                {'_id': appointment_id, 'status': 'scheduled'},
+                {'$set': changes}
+            )
+            if before:
+                record_appointment_change(before, {**before, **changes})
+                modified += 1
+        self.stdout.write(self.style.SUCCESS(f'Cancelled {modified} appointments in {slots} double-booked slots'))
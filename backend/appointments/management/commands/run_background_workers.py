@@ -0,0 +1,19 @@
+# appointments/management/commands/run_background_workers.py
+import time
+
+from django.core.management.base import BaseCommand
+from appointments import mongo_views
+
+class Command(BaseCommand):
+    help = 'Run the notification scheduler and the email outbox workers (for START_BACKGROUND_WORKERS = False)'
+
+    def handle(self, *args, **options):
+        mongo_views.start_background_workers()
+        self.stdout.write(self.style.SUCCESS('Background workers running, press Ctrl+C to stop'))
+        try:
+            while True:
+                time.sleep(60)
+        except KeyboardInterrupt:
+            mongo_views.notification_scheduler.stop()
+            mongo_views.outbox_worker.stop()
+            self.stdout.write('Background workers stopped')
@@ -1,7 +1,7 @@
 # appointments/management/commands/setup_mongodb_indexes.py
 from django.core.management.base import BaseCommand
-from pymongo import MongoClient, ASCENDING, DESCENDING, TEXT
-from django.conf import settings
+from pymongo import ASCENDING, DESCENDING, TEXT
+from appointments.mongo_utils import get_mongodb_database
 from datetime import datetime
 import logging
 
@@ -20,8 +20,7 @@ class Command(BaseCommand):
     def handle(self, *args, **options):
         try:
             # Connect to MongoDB
-            client = MongoClient(settings.MONGODB_URI)
-            db = client[settings.MONGODB_NAME]
+            db = get_mongodb_database()
             
             # Check if we should force recreate indexes
             force = options['force']
@@ -39,7 +38,7 @@ class Command(BaseCommand):
                 collections_to_index = [
                     'users', 'doctors', 'medical_centers', 'appointments', 
                     'medical_examinations', 'doctor_availability', 
-                    'availability_exceptions', 'doctor_booking_history'
+                    'availability_exceptions', 'doctor_booking_buckets'
                 ]
                 
                 for collection_name in collections_to_index:
@@ -101,6 +100,11 @@ class Command(BaseCommand):
                 ('qualification', TEXT)
             ], name='doctor_text_search')
             
+            # Patient and clinic staff collection indexes
+            self.stdout.write('Creating indexes for patients and clinic_staff collections...')
+            self._create_index(db.patients, [('user_id', ASCENDING)])
+            self._create_index(db.clinic_staff, [('email', ASCENDING)], unique=True)
+            
             # Medical Center collection indexes
             self.stdout.write('Creating indexes for medical_centers collection...')
             self._create_index(db.medical_centers, [('id', ASCENDING)], unique=True)
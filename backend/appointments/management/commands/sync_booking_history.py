@@ -0,0 +1,13 @@
+# appointments/management/commands/sync_booking_history.py
+from django.core.management.base import BaseCommand
+from appointments import booking
+
+class Command(BaseCommand):
+    help = 'Apply doctor booking history entries left pending by bookings made without a transaction'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=None, help='Process at most this many appointments')
+
+    def handle(self, *args, **options):
+        processed = booking.sync_pending_booking_history(limit=options['limit'])
+        self.stdout.write(self.style.SUCCESS(f'Applied pending booking history for {processed} appointments'))
@@ -0,0 +1,119 @@
+# appointments/medical_snapshot.py
+"""
+Materialized medical snapshot on patient documents.
+
+Patients store their medical data in several shapes: top-level
+``allergies``/``medications``/``medical_history``/``chronic_diseases``
+lists (or comma separated strings from older registrations), and a
+``medical_info`` subdocument with ``blood_type`` and sometimes the same
+lists. Every patient write stores the resolved values once as
+
+    medical_snapshot: {blood_type, allergies, medications, medical_conditions}
+
+so creating an appointment embeds them with one projected read instead of
+walking the fallbacks on every booking. Patients written before this are
+covered by ``manage.py backfill_medical_snapshot``; until then the
+snapshot is built on read.
+"""
+from datetime import datetime
+
+SNAPSHOT_FIELD = 'medical_snapshot'
+
+# Patient fields the snapshot is built from
+SOURCE_FIELDS = ('blood_type', 'medical_info', 'allergies', 'medications', 'medical_history', 'chronic_diseases')
+
+SNAPSHOT_PROJECTION = {'_id': 0, SNAPSHOT_FIELD: 1, **{field: 1 for field in SOURCE_FIELDS}}
+
+LIST_FIELDS = ('allergies', 'medications', 'medical_conditions')
+
+def as_list(value):
+    """A list field as a list; strings are split on commas"""
+    if isinstance(value, list):
+        return value
+    if not value:
+        return []
+    if isinstance(value, str):
+        return [item.strip() for item in value.split(',') if item.strip()]
+    return [value]
+
+def _first(patient, *paths):
+    # The first non-empty value among the dotted paths
+    for path in paths:
+        value = patient
+        for key in path.split('.'):
+            value = value.get(key) if isinstance(value, dict) else None
+        if value:
+            return value
+    return None
+
+def build_snapshot(patient):
+    """The medical snapshot of a patient document"""
+    return {
+        'blood_type': _first(patient, 'blood_type', 'medical_info.blood_type') or '',
+        'allergies': as_list(_first(patient, 'allergies', 'medical_info.allergies')),
+        'medications': as_list(_first(patient, 'medications', 'medical_info.medications')),
+        'medical_conditions': as_list(_first(
+            patient, 'medical_history', 'medical_info.medical_history',
+            'chronic_diseases', 'medical_info.chronic_diseases'
+        )),
+        'updated_at': datetime.now(),
+    }
+
+def with_snapshot(patient):
+    """Set the snapshot on a patient document about to be inserted, in place"""
+    patient[SNAPSHOT_FIELD] = build_snapshot(patient)
+    return patient
+
+def touches_snapshot(fields):
+    """True if a $set of these fields changes what the snapshot is built from"""
+    return any(field.split('.')[0] in SOURCE_FIELDS for field in fields)
+
+def snapshot_after(patient, fields):
+    """The snapshot once the $set ``fields`` (dotted paths allowed) are applied to patient"""
+    updated = {key: dict(value) if isinstance(value, dict) else value for key, value in patient.items()}
+    for path, value in fields.items():
+        target = updated
+        *parents, leaf = path.split('.')
+        for key in parents:
+            if not isinstance(target.get(key), dict):
+                target[key] = {}
+            target = target[key]
+        target[leaf] = value
+    return build_snapshot(updated)
+
+def snapshot_of(patient):
+    """The stored snapshot of a patient, or one built from its fields"""
+    if not patient:
+        return build_snapshot({})
+    return patient.get(SNAPSHOT_FIELD) or build_snapshot(patient)
+
+def get_snapshot(db, user_id):
+    """The snapshot of the patient profile of user_id, with one projected read"""
+    return snapshot_of(db.patients.find_one({'user_id': user_id}, SNAPSHOT_PROJECTION))
+
+def appointment_medical_data(data, snapshot):
+    """
+    An appointment's medical_data: values sent with the request win over
+    the patient's snapshot.
+    """
+    requested = data.get('medical_data') if isinstance(data.get('medical_data'), dict) else {}
+
+    blood_type = data.get('blood_type') or data.get('bloodType') or requested.get('blood_type') or snapshot['blood_type']
+    notes = data.get('notes') or ''
+    if not blood_type and 'blood type' in notes.lower():
+        # Last resort: a blood type mentioned in the notes
+        for candidate in ('ab+', 'ab-', 'a+', 'a-', 'b+', 'b-', 'o+', 'o-'):
+            if candidate in notes.lower():
+                blood_type = candidate.upper()
+                break
+
+    medical_data = {'blood_type': blood_type}
+    for field in LIST_FIELDS:
+        if field in data:
+            medical_data[field] = as_list(data[field])
+        elif field in requested:
+            medical_data[field] = requested[field]
+        else:
+            medical_data[field] = list(snapshot[field])
+    medical_data['reason_for_visit'] = data.get('reason_for_visit', data.get('notes', ''))
+    return medical_data
@@ -1,56 +1,45 @@
 # appointments/mongo_auth.py
 import datetime
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from functools import wraps
+
 import jwt
 from django.conf import settings
+from django.http import JsonResponse
+from pymongo import ReturnDocument
 from rest_framework import authentication
 from rest_framework.exceptions import AuthenticationFailed
-from .mongo_utils import get_mongodb_database
+from .mongo_utils import find_user_by_email, get_mongodb_database
+from .token_revocation import revocation_list
+from .doctor_directory import doctor_directory
 
 class MongoJWTAuthentication(authentication.BaseAuthentication):
     """
-    Custom JWT authentication for MongoDB users
+    DRF authentication for MongoDB users.
+
+    Resolves the token with authenticate_request, like every other view, so
+    DRF views see the same checks: token type, the revocation list and the
+    permissions version.
     """
     def authenticate(self, request):
-        # Get the token from the Authorization header
-        auth_header = request.META.get('HTTP_AUTHORIZATION', '')
-        if not auth_header.startswith('Bearer '):
+        # DRF wraps the Django request; resolve (or reuse) the user on that one
+        django_request = getattr(request, '_request', request)
+        token = get_token_from_header(django_request.META.get('HTTP_AUTHORIZATION', ''))
+        if not token:
             return None
         
-        token = auth_header.split(' ')[1]
+        user = authenticate_request(django_request)
+        if not user:
+            raise AuthenticationFailed('Invalid or expired token')
         
-        try:
-            # Decode the token
-            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
-            
-            # Get MongoDB database
-            db = get_mongodb_database()
-            
-            # Get user from MongoDB
-            user_id = payload.get('user_id')
-            if not user_id:
-                raise AuthenticationFailed('Invalid token payload')
-            
-            # Try to find user with id
-            user = db.users.find_one({'id': user_id})
-            
-            # If not found, try with _id
-            if not user:
-                user = db.users.find_one({'_id': user_id})
-            
-            if not user:
-                raise AuthenticationFailed('User not found')
-            
-            # Create a simple user object that DRF can use
-            user_obj = MongoUser(user)
-            
-            return (user_obj, token)
-        
-        except jwt.ExpiredSignatureError:
-            raise AuthenticationFailed('Token has expired')
-        except jwt.InvalidTokenError:
-            raise AuthenticationFailed('Invalid token')
-        except Exception as e:
-            raise AuthenticationFailed(f'Authentication failed: {str(e)}')
+        # Create a simple user object that DRF can use
+        user_obj = MongoUser(user)
+        if not user_obj.is_active:
+            raise AuthenticationFailed('User account is disabled')
+        return (user_obj, token)
     
     def authenticate_header(self, request):
         return 'Bearer'
@@ -106,86 +95,472 @@ class MongoUser:
     def is_anonymous(self):
         return False
 
-def generate_token(user):
+ACCESS_TOKEN = 'access'
+REFRESH_TOKEN = 'refresh'
+
+# Permissions version that revokes every token a deleted user still holds
+MAX_PERMISSIONS_VERSION = 2 ** 31
+
+# Fields of the user document an access token carries
+TOKEN_USER_FIELDS = ('id', 'email', 'username', 'role')
+
+def _jwt_secret():
+    return getattr(settings, 'JWT_SECRET_KEY', settings.SECRET_KEY)
+
+def access_token_lifetime():
+    return datetime.timedelta(seconds=getattr(settings, 'MONGO_ACCESS_TOKEN_LIFETIME', 15 * 60))
+
+def refresh_token_lifetime():
+    return datetime.timedelta(seconds=getattr(settings, 'MONGO_REFRESH_TOKEN_LIFETIME', 7 * 24 * 60 * 60))
+
+def _encode_token(payload):
+    token = jwt.encode(payload, _jwt_secret(), algorithm='HS256')
+    
+    # jwt.encode might return bytes in some versions of PyJWT
+    if isinstance(token, bytes):
+        return token.decode('utf-8')
+    
+    return token
+
+def get_profile_ids(user):
     """
-    Generate JWT token for user.
-    For use with MongoDB.
+    The doctor/patient profile ids owned by a user, as a dict with
+    doctor_id and patient_id (None when the user has no such profile).
+    """
+    db = get_mongodb_database()
+    profile_ids = {'doctor_id': None, 'patient_id': None}
+    role = user.get('role', 'patient')
+    if role == 'doctor':
+        doctor = db.doctors.find_one({'user_id': user['id']}, {'_id': 0, 'id': 1})
+        profile_ids['doctor_id'] = doctor.get('id') if doctor else None
+    elif role == 'patient':
+        patient = db.patients.find_one({'user_id': user['id']}, {'_id': 0, 'id': 1})
+        profile_ids['patient_id'] = patient.get('id') if patient else None
+    return profile_ids
+
+def generate_token(user, doctor_id=None, patient_id=None):
     """
-    # Get secret key from settings
-    secret_key = getattr(settings, 'JWT_SECRET_KEY', settings.SECRET_KEY)
+    Generate a short-lived access token for user.
     
-    # Create payload
+    The token carries everything authorization checks need (role, profile
+    ids and the user's permissions version), so requests made with it
+    don't have to load the user from MongoDB. Profile ids not passed in
+    are looked up.
+    """
+    if doctor_id is None and patient_id is None:
+        profile_ids = get_profile_ids(user)
+        doctor_id, patient_id = profile_ids['doctor_id'], profile_ids['patient_id']
+    
+    now = datetime.datetime.utcnow()
     payload = {
+        'type': ACCESS_TOKEN,
+        'jti': uuid.uuid4().hex,
         'user_id': user['id'],
         'email': user['email'],
+        'username': user.get('username') or user['email'],
         'role': user.get('role', 'patient'),
-        'exp': datetime.datetime.utcnow() + datetime.timedelta(days=1)  # Token expires in 1 day
+        'doctor_id': doctor_id,
+        'patient_id': patient_id,
+        'pv': user.get('permissions_version', 0),
+        'iat': now,
+        'exp': now + access_token_lifetime()
+    }
+    return _encode_token(payload)
+
+def generate_refresh_token(user, doctor_id=None, patient_id=None):
+    """
+    Generate a long-lived refresh token, only accepted by
+    refresh_access_token.
+    """
+    now = datetime.datetime.utcnow()
+    payload = {
+        'type': REFRESH_TOKEN,
+        'jti': uuid.uuid4().hex,
+        'user_id': user['id'],
+        'doctor_id': doctor_id,
+        'patient_id': patient_id,
+        'pv': user.get('permissions_version', 0),
+        'iat': now,
+        'exp': now + refresh_token_lifetime()
     }
+    return _encode_token(payload)
+
+def issue_tokens(user, doctor_id=None, patient_id=None):
+    """
+    Access and refresh token for a user who just logged in or registered.
     
-    # Generate token
-    token = jwt.encode(payload, secret_key, algorithm='HS256')
+    Returns:
+        dict: token, refresh_token and expires_in (access token lifetime in seconds)
+    """
+    if doctor_id is None and patient_id is None:
+        profile_ids = get_profile_ids(user)
+        doctor_id, patient_id = profile_ids['doctor_id'], profile_ids['patient_id']
+    return {
+        'token': generate_token(user, doctor_id, patient_id),
+        'refresh_token': generate_refresh_token(user, doctor_id, patient_id),
+        'expires_in': int(access_token_lifetime().total_seconds())
+    }
+
+def decode_token(token, token_type=ACCESS_TOKEN):
+    """
+    Verify a token of the given type and return its claims, or None if it
+    is invalid, expired, of another type or revoked. No database access.
+    """
+    try:
+        claims = jwt.decode(token, _jwt_secret(), algorithms=['HS256'])
+    except (jwt.ExpiredSignatureError, jwt.InvalidTokenError):
+        return None
+    if claims.get('type') != token_type or not claims.get('user_id'):
+        return None
+    if revocation_list.is_revoked(claims):
+        return None
+    return claims
+
+def refresh_access_token(refresh_token):
+    """
+    Exchange a refresh token for a new access token.
     
-    # jwt.encode might return bytes in some versions of PyJWT
-    if isinstance(token, bytes):
-        return token.decode('utf-8')
+    Unlike access tokens this checks the user document, so a deactivated
+    user or one whose permissions changed has to log in again. The profile
+    ids are looked up again rather than copied from the refresh token, so
+    the new token names the profiles the user has now.
     
-    return token
+    Returns:
+        dict: token and expires_in, or None if the refresh token is not accepted
+    """
+    claims = decode_token(refresh_token, REFRESH_TOKEN)
+    if not claims:
+        return None
+    
+    db = get_mongodb_database()
+    user = db.users.find_one({'id': claims['user_id']}, {'_id': 0, 'password': 0})
+    if not user or not user.get('is_active', True):
+        return None
+    if claims.get('pv', 0) < user.get('permissions_version', 0):
+        return None
+    
+    profile_ids = get_profile_ids(user)
+    return {
+        'token': generate_token(user, profile_ids['doctor_id'], profile_ids['patient_id']),
+        'expires_in': int(access_token_lifetime().total_seconds())
+    }
+
+def revoke_token(claims):
+    """Revoke one access or refresh token (given its verified claims) until it expires"""
+    if claims and claims.get('jti'):
+        revocation_list.revoke_token(claims['jti'], datetime.datetime.utcfromtimestamp(claims['exp']))
+
+def revoke_user_tokens(user_id):
+    """
+    Revoke every token issued to a user so far.
+    Call this after changing a user's role or active flag, or deleting them.
+    """
+    db = get_mongodb_database()
+    user = db.users.find_one_and_update(
+        {'id': user_id},
+        {'$inc': {'permissions_version': 1}},
+        projection={'_id': 0, 'permissions_version': 1},
+        return_document=ReturnDocument.AFTER
+    )
+    version = user['permissions_version'] if user else MAX_PERMISSIONS_VERSION
+    revocation_list.revoke_user(user_id, version, datetime.datetime.utcnow() + refresh_token_lifetime())
+    invalidate_cached_user(user_id)
+
+class TokenUserCache:
+    """
+    In-process LRU cache of authenticated user documents.
+
+    Entries are keyed on the token's (user_id, exp) pair so a fresh token for
+    the same user gets its own entry, and every entry expires after at most
+    ``ttl`` seconds (never later than the token itself).
+    """
+    def __init__(self, max_size=1024, ttl=60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id, exp):
+        key = (user_id, exp)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                # Views pop fields such as 'password' off the user they get
+                return dict(entry[1])
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, user_id, exp, user):
+        if self.max_size <= 0 or self.ttl <= 0:
+            return
+        lifetime = self.ttl
+        if exp:
+            lifetime = min(lifetime, exp - time.time())
+        if lifetime <= 0:
+            return
+        key = (user_id, exp)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + lifetime, dict(user))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            stale = [key for key in self._entries if key[0] == user_id]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+user_cache = TokenUserCache(
+    max_size=getattr(settings, 'MONGO_USER_CACHE_MAX_SIZE', 1024),
+    ttl=getattr(settings, 'MONGO_USER_CACHE_TTL', 60),
+)
+
+def invalidate_cached_user(user_id):
+    """
+    Drop every cached entry for a user.
+    Call this after any write that changes the user document.
+    """
+    user_cache.invalidate(user_id)
+
+def get_user_cache_stats():
+    """
+    Hit/miss counters for the token user cache.
+    """
+    return user_cache.stats()
+
+def _load_user(user_id, exp):
+    """The user document for a token, served from the user cache when possible"""
+    user = user_cache.get(user_id, exp)
+    if user is not None:
+        return user
+    
+    db = get_mongodb_database()
+    user = db.users.find_one({'id': user_id})
+    if user:
+        user_cache.set(user_id, exp, user)
+    return user
+
+class TokenUser(dict):
+    """
+    The authenticated user as described by an access token.
+    
+    The fields the token carries (TOKEN_USER_FIELDS) are answered from its
+    claims. Reading any other field, or the document as a whole, loads the
+    user from MongoDB once, so views that only check the id or role never
+    touch the database.
+    """
+    def __init__(self, claims):
+        super().__init__(
+            id=claims['user_id'],
+            email=claims.get('email'),
+            username=claims.get('username'),
+            role=claims.get('role', 'patient'),
+        )
+        self.claims = claims
+        self._loaded = False
+    
+    def load(self):
+        if not self._loaded:
+            self._loaded = True
+            user = _load_user(self.claims['user_id'], self.claims.get('exp'))
+            if user:
+                super().update(user)
+        return self
+    
+    def __getitem__(self, key):
+        if not super().__contains__(key):
+            self.load()
+        return super().__getitem__(key)
+    
+    def __contains__(self, key):
+        return super().__contains__(key) or super(TokenUser, self.load()).__contains__(key)
+    
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+    
+    def pop(self, *args):
+        return super(TokenUser, self.load()).pop(*args)
+    
+    def copy(self):
+        return dict(self.load().items())
+    
+    def __iter__(self):
+        return super(TokenUser, self.load()).__iter__()
+    
+    def keys(self):
+        return super(TokenUser, self.load()).keys()
+    
+    def items(self):
+        return super(TokenUser, self.load()).items()
+    
+    def values(self):
+        return super(TokenUser, self.load()).values()
 
 def get_user_from_token(token):
     """
     Get user from token.
     For use with MongoDB.
+    
+    Access tokens resolve to a TokenUser without a database lookup; tokens
+    issued before access tokens existed are still resolved by loading the
+    user document.
     """
     try:
-        # Get secret key from settings
-        secret_key = getattr(settings, 'JWT_SECRET_KEY', settings.SECRET_KEY)
-        
         # Decode the token
-        payload = jwt.decode(token, secret_key, algorithms=['HS256'])
+        payload = jwt.decode(token, _jwt_secret(), algorithms=['HS256'])
+        
+        if 'type' in payload:
+            if payload['type'] != ACCESS_TOKEN or not payload.get('user_id') or revocation_list.is_revoked(payload):
+                return None
+            return TokenUser(payload)
         
         # Check if token is expired
         if 'exp' in payload and datetime.datetime.fromtimestamp(payload['exp']) < datetime.datetime.utcnow():
             return None
         
-        # Get user from MongoDB
-        db = get_mongodb_database()
-        
-        # Find user by ID from token
-        user = db.users.find_one({'id': payload.get('user_id')})
-        
-        return user
+        return _load_user(payload.get('user_id'), payload.get('exp'))
     except (jwt.ExpiredSignatureError, jwt.InvalidTokenError):
         return None
     except Exception as e:
         print(f"Token authentication error: {str(e)}")
         return None
 
+def get_token_from_header(auth_header):
+    """
+    Extract the token from a 'Bearer <token>' or 'Token <token>' header.
+    Returns None for a missing or malformed header.
+    """
+    if not auth_header:
+        return None
+    parts = auth_header.split(' ')
+    if len(parts) != 2 or parts[0] not in ('Bearer', 'Token') or not parts[1]:
+        return None
+    return parts[1]
+
+def authenticate_request(request):
+    """
+    Resolve the Mongo user for a request once and attach it to the request.
+
+    Sets ``request.mongo_token``, ``request.mongo_user``,
+    ``request.mongo_claims`` (the access token's claims, None for legacy
+    tokens) and ``request.mongo_auth_error`` (None when authenticated).
+    Safe to call repeatedly; only the first call does any work.
+    """
+    if hasattr(request, 'mongo_user'):
+        return request.mongo_user
+    
+    token = get_token_from_header(request.META.get('HTTP_AUTHORIZATION', ''))
+    user = get_user_from_token(token) if token else None
+    
+    request.mongo_token = token
+    request.mongo_user = user
+    request.mongo_claims = user.claims if isinstance(user, TokenUser) else None
+    if user:
+        request.mongo_auth_error = None
+    elif token:
+        request.mongo_auth_error = 'Invalid token'
+    else:
+        request.mongo_auth_error = 'Invalid authorization header'
+    return user
+
+def get_request_doctor(request):
+    """
+    Get the doctor document owned by the authenticated user, if any.
+    The lookup is done at most once per request, and not at all when the
+    access token carries the doctor id: the result is then just {'id': ...}.
+    """
+    if not hasattr(request, '_mongo_doctor'):
+        user = authenticate_request(request)
+        claims = getattr(request, 'mongo_claims', None)
+        doctor = None
+        if claims and claims.get('role') == 'doctor' and claims.get('doctor_id'):
+            doctor = {'id': claims['doctor_id']}
+        elif user and user.get('role') == 'doctor':
+            doctor = doctor_directory.by_user(user['id'])
+        request._mongo_doctor = doctor
+    return request._mongo_doctor
+
+def is_admin_or_doctor(request, doctor_id):
+    """
+    Check that the authenticated user is an admin or the doctor with doctor_id.
+    """
+    user = authenticate_request(request)
+    if not user:
+        return False
+    if user.get('role') == 'admin':
+        return True
+    doctor = get_request_doctor(request)
+    return bool(doctor) and str(doctor.get('id')) == str(doctor_id)
+
+def mongo_auth_required(roles=None, methods=None):
+    """
+    Decorator for views that need an authenticated Mongo user.
+
+    ``roles`` restricts access to the given user roles and ``methods``
+    limits the check to those HTTP methods, leaving the others public.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def _wrapped_view(request, *args, **kwargs):
+            if methods is None or request.method in methods:
+                user = authenticate_request(request)
+                if not user:
+                    return JsonResponse({'error': request.mongo_auth_error}, status=401)
+                if roles and user.get('role') not in roles:
+                    message = 'Admin privileges required' if list(roles) == ['admin'] else 'Unauthorized'
+                    return JsonResponse({'error': message}, status=403)
+            return view_func(request, *args, **kwargs)
+        return _wrapped_view
+    return decorator
+
 def authenticate_user(username, password):
     """
     Authenticate a user with username/email and password.
     For use with MongoDB.
     """
-    import bcrypt
+    from .password_hashing import verify_password
     
     db = get_mongodb_database()
     
-    # Find user by username or email
-    user = db.users.find_one({
-        '$or': [
-            {'username': username},
-            {'email': username}
-        ]
-    })
+    # Find user by username or email (case-insensitive)
+    user = db.users.find_one({'username': username}) or find_user_by_email(username)
     
     if not user:
         return None
     
-    # Check password
-    stored_password = user.get('password', '')
-    if isinstance(stored_password, str):
-        stored_password = stored_password.encode('utf-8')
-        
-    if not bcrypt.checkpw(password.encode('utf-8'), stored_password):
+    # Check password, upgrading the hash if the cost factor changed
+    password_valid, new_password_hash = verify_password(password, user.get('password', ''))
+    if not password_valid:
         return None
+    if new_password_hash:
+        db.users.update_one({'_id': user['_id']}, {'$set': {'password': new_password_hash}})
+        user['password'] = new_password_hash
     
     return user
\ No newline at end of file
@@ -0,0 +1,191 @@
+# appointments/mongo_instrumentation.py
+"""
+Per-request MongoDB command instrumentation.
+
+A pymongo CommandListener registered on the shared client (see
+mongo_utils.get_mongodb_client_options) attributes every command to the
+MongoCommandStats objects active in the current context: commands by
+name, server time, failures and the number of documents returned.
+MongoInstrumentationMiddleware opens one per request and, once the view
+has returned,
+
+* adds a ``Server-Timing`` header (``mongo;dur=..;desc="N commands"`` and
+  ``app;dur=..``) that browser devtools show next to each request, and
+  that scripts on MONGO_TIMING_ALLOW_ORIGINS can read,
+* logs one JSON line per request to the ``appointments.mongo`` logger,
+* checks the request against its query budget: MONGO_QUERY_BUDGETS by
+  URL name, else MONGO_QUERY_BUDGET. Over budget is logged as a warning,
+  or raises MongoQueryBudgetExceeded with MONGO_QUERY_BUDGET_STRICT (for
+  test settings, so an over-budget view fails its test).
+
+Tests can also bound a block of code directly:
+
+    with assert_max_mongo_commands(3):
+        client.get('/api/doctors/')
+
+Commands from background threads (outbox worker, doctor directory,
+write-behind flushes) belong to no request and are not counted; nor are
+getMores issued while a streaming response is sent, after the
+middleware has returned.
+
+Settings (all optional):
+    MONGO_COMMAND_INSTRUMENTATION  Register the listener (default True)
+    MONGO_QUERY_BUDGET             Commands allowed per request (default None, no limit)
+    MONGO_QUERY_BUDGETS            {url_name: commands} overriding MONGO_QUERY_BUDGET
+    MONGO_QUERY_BUDGET_STRICT      Raise instead of logging when over budget (default False)
+    MONGO_TIMING_ALLOW_ORIGINS     Origins sent in Timing-Allow-Origin (default CORS_ALLOWED_ORIGINS)
+"""
+import json
+import logging
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from pymongo import monitoring
+
+logger = logging.getLogger('appointments.mongo')
+
+# Every stats object open in this context; nested blocks all see a command
+_active = ContextVar('mongo_command_stats', default=())
+
+class MongoQueryBudgetExceeded(Exception):
+    """A request or block issued more MongoDB commands than its budget allows"""
+
+class MongoCommandStats:
+    """MongoDB commands issued while this object was active"""
+    def __init__(self):
+        self.commands = 0
+        self.failures = 0
+        self.duration_ms = 0.0
+        self.documents = 0
+        self.by_command = Counter()
+
+    def record(self, command_name, duration_micros, documents=0, failed=False):
+        self.commands += 1
+        self.duration_ms += duration_micros / 1000
+        self.documents += documents
+        self.by_command[command_name] += 1
+        if failed:
+            self.failures += 1
+
+    def summary(self):
+        return {
+            'commands': self.commands,
+            'failures': self.failures,
+            'duration_ms': round(self.duration_ms, 2),
+            'documents': self.documents,
+            'by_command': dict(self.by_command),
+        }
+
+def _returned_documents(command_name, reply):
+    # Documents the server sent back, as far as the reply shows it
+    cursor = reply.get('cursor')
+    if isinstance(cursor, dict):
+        return len(cursor.get('firstBatch') or cursor.get('nextBatch') or [])
+    if command_name == 'distinct':
+        return len(reply.get('values') or [])
+    if command_name == 'findAndModify':
+        return 0 if reply.get('value') is None else 1
+    return 0
+
+class RequestCommandListener(monitoring.CommandListener):
+    """Attributes commands to the stats active in the issuing thread's context"""
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        active = _active.get()
+        if not active:
+            return
+        documents = _returned_documents(event.command_name, event.reply)
+        for stats in active:
+            stats.record(event.command_name, event.duration_micros, documents)
+
+    def failed(self, event):
+        active = _active.get()
+        for stats in active:
+            stats.record(event.command_name, event.duration_micros, failed=True)
+
+command_listener = RequestCommandListener()
+
+@contextmanager
+def track_mongo_commands():
+    """Count the MongoDB commands issued inside the block"""
+    stats = MongoCommandStats()
+    token = _active.set(_active.get() + (stats,))
+    try:
+        yield stats
+    finally:
+        _active.reset(token)
+
+@contextmanager
+def assert_max_mongo_commands(limit):
+    """Fail with MongoQueryBudgetExceeded if the block issues more than limit commands"""
+    with track_mongo_commands() as stats:
+        yield stats
+    if stats.commands > limit:
+        raise MongoQueryBudgetExceeded(
+            f"{stats.commands} MongoDB commands issued, budget is {limit}: {dict(stats.by_command)}"
+        )
+
+def query_budget(url_name):
+    """The command budget of the view with this URL name, or None"""
+    budgets = getattr(settings, 'MONGO_QUERY_BUDGETS', {})
+    if url_name in budgets:
+        return budgets[url_name]
+    return getattr(settings, 'MONGO_QUERY_BUDGET', None)
+
+def server_timing(stats, total_ms):
+    """The Server-Timing header value for a request"""
+    return (
+        f'mongo;dur={stats.duration_ms:.1f};desc="{stats.commands} commands", '
+        f'app;dur={total_ms:.1f}'
+    )
+
+class MongoInstrumentationMiddleware:
+    """
+    Count the MongoDB commands of each request, report them in Server-Timing
+    and the appointments.mongo log, and enforce query budgets.
+    Place it above middleware whose queries should be counted.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.strict = getattr(settings, 'MONGO_QUERY_BUDGET_STRICT', False)
+        origins = getattr(settings, 'MONGO_TIMING_ALLOW_ORIGINS', getattr(settings, 'CORS_ALLOWED_ORIGINS', ()))
+        self.timing_allow_origin = ', '.join(origins)
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        with track_mongo_commands() as stats:
+            response = self.get_response(request)
+        total_ms = (time.perf_counter() - started) * 1000
+
+        response['Server-Timing'] = server_timing(stats, total_ms)
+        if self.timing_allow_origin:
+            # Lets the frontend read the header from PerformanceResourceTiming across origins
+            response['Timing-Allow-Origin'] = self.timing_allow_origin
+
+        match = getattr(request, 'resolver_match', None)
+        url_name = match.url_name if match else None
+        budget = query_budget(url_name)
+        over_budget = budget is not None and stats.commands > budget
+
+        log = logger.warning if over_budget else logger.info
+        log(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'view': url_name,
+            'status': response.status_code,
+            'total_ms': round(total_ms, 2),
+            'budget': budget,
+            **stats.summary(),
+        }))
+
+        if over_budget and self.strict:
+            raise MongoQueryBudgetExceeded(
+                f"{request.method} {request.path} ({url_name}) issued {stats.commands} MongoDB commands, "
+                f"budget is {budget}: {dict(stats.by_command)}"
+            )
+        return response
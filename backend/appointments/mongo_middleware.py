@@ -0,0 +1,56 @@
+# appointments/mongo_middleware.py
+from django.conf import settings
+from django.http import JsonResponse
+
+from .mongo_auth import authenticate_request
+
+def add_cors_headers(response):
+    """Add CORS headers to response"""
+    response["Access-Control-Allow-Origin"] = "*"  # Or specific origin like "http://localhost:3000"
+    response["Access-Control-Allow-Methods"] = "GET, POST, PUT, PATCH, DELETE, OPTIONS"
+    response["Access-Control-Allow-Headers"] = "Content-Type, Authorization, X-Requested-With, X-CSRFToken"
+    response["Access-Control-Allow-Credentials"] = "true"
+    response["Access-Control-Expose-Headers"] = "X-Next-Cursor"
+    return response
+
+def handle_options_request(request):
+    """Handle OPTIONS request for CORS preflight"""
+    response = JsonResponse({})
+    response = add_cors_headers(response)
+    response["Access-Control-Max-Age"] = "86400"  # 24 hours
+    return response
+
+class MongoAuthMiddleware:
+    """
+    Authenticate API requests against MongoDB once per request.
+
+    For every path under ``MONGO_API_PATH_PREFIX`` this answers CORS
+    preflight requests, resolves the Authorization header into
+    ``request.mongo_user`` and adds the CORS headers to the response, so
+    views don't have to.
+
+    It also starts the background workers (notification scheduler, email
+    outbox) in each web process on its first API request, unless
+    ``START_BACKGROUND_WORKERS`` is False.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.path_prefix = getattr(settings, 'MONGO_API_PATH_PREFIX', '/api/')
+        self.start_workers = getattr(settings, 'START_BACKGROUND_WORKERS', True)
+
+    def __call__(self, request):
+        if not request.path.startswith(self.path_prefix):
+            return self.get_response(request)
+
+        if self.start_workers:
+            # Imported late: the views module connects to MongoDB on import
+            from .mongo_views import start_background_workers
+            start_background_workers()
+
+        if request.method == 'OPTIONS':
+            return handle_options_request(request)
+
+        authenticate_request(request)
+
+        response = self.get_response(request)
+        return add_cors_headers(response)
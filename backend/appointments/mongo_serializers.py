@@ -2,7 +2,15 @@ from rest_framework import serializers
 from bson import ObjectId
 from decimal import Decimal
 from datetime import datetime
+from pymongo.errors import DuplicateKeyError
 from .mongodb_utils import get_mongodb_database, mongo_id_to_str
+from .mongo_utils import normalize_email
+from .booking import SLOT_TAKEN_MESSAGE, SlotTaken, insert_appointment
+from .mongo_stats import record_appointment_change
+from .appointment_store import prepare_update
+from .doctor_directory import doctor_directory
+from . import collection_versions
+from .medical_snapshot import SNAPSHOT_FIELD, snapshot_after, snapshot_of, touches_snapshot, with_snapshot
 
 # Get MongoDB database
 db = get_mongodb_database()
@@ -71,11 +79,14 @@ class UserSerializer(MongoModelSerializer):
         validated_data['is_active'] = True
         validated_data['is_staff'] = validated_data.get('role') == 'doctor' or validated_data.get('role') == 'admin'
         validated_data['is_superuser'] = validated_data.get('role') == 'admin'
+        validated_data['email_normalized'] = normalize_email(validated_data['email'])
         
         result = db.users.insert_one(validated_data)
         return {**validated_data, '_id': result.inserted_id}
     
     def update(self, instance, validated_data):
+        if 'email' in validated_data:
+            validated_data['email_normalized'] = normalize_email(validated_data['email'])
         db.users.update_one({'_id': ObjectId(instance['_id'])}, {'$set': validated_data})
         return {**instance, **validated_data}
 
@@ -115,10 +126,14 @@ class DoctorSerializer(MongoModelSerializer):
     
     def create(self, validated_data):
         result = db.doctors.insert_one(validated_data)
+        doctor_directory.invalidate()
+        collection_versions.bump('doctors')
         return {**validated_data, '_id': result.inserted_id}
     
     def update(self, instance, validated_data):
         db.doctors.update_one({'_id': ObjectId(instance['_id'])}, {'$set': validated_data})
+        doctor_directory.invalidate()
+        collection_versions.bump('doctors')
         return {**instance, **validated_data}
 
 class PatientSerializer(MongoModelSerializer):
@@ -145,7 +160,7 @@ class PatientSerializer(MongoModelSerializer):
         # Add medical_info back to validated_data
         validated_data['medical_info'] = medical_info
         
-        result = db.patients.insert_one(validated_data)
+        result = db.patients.insert_one(with_snapshot(validated_data))
         return {**validated_data, '_id': result.inserted_id}
     
     def update(self, instance, validated_data):
@@ -164,6 +179,8 @@ class PatientSerializer(MongoModelSerializer):
             else:
                 validated_data['medical_info'] = medical_info
         
+        if touches_snapshot(validated_data):
+            validated_data[SNAPSHOT_FIELD] = snapshot_after(instance, validated_data)
         db.patients.update_one({'_id': ObjectId(instance['_id'])}, {'$set': validated_data})
         updated_instance = db.patients.find_one({'_id': ObjectId(instance['_id'])})
         return updated_instance
@@ -222,13 +239,13 @@ class AppointmentSerializer(MongoModelSerializer):
                 'email': patient.get('email', '')
             }
             
-            # Embed medical data from patient
-            medical_info = patient.get('medical_info', {})
+            # Embed medical data from the patient's snapshot
+            snapshot = snapshot_of(patient)
             validated_data['medical_data'] = {
-                'blood_type': medical_info.get('blood_type', ''),
-                'allergies': medical_info.get('allergies', []),
-                'medications': medical_info.get('medications', []),
-                'medical_conditions': medical_info.get('chronic_diseases', []),
+                'blood_type': snapshot['blood_type'],
+                'allergies': snapshot['allergies'],
+                'medications': snapshot['medications'],
+                'medical_conditions': snapshot['medical_conditions'],
                 'reason_for_visit': validated_data.get('notes', '')
             }
         
@@ -246,17 +263,12 @@ class AppointmentSerializer(MongoModelSerializer):
         if validated_data['date'] < datetime.now():
             validated_data['status'] = 'completed'
         
-        # Check for conflicts (same doctor, same time)
-        existing = db.appointments.find_one({
-            'doctor': doctor_id,
-            'date': validated_data['date'],
-            'status': 'scheduled'
-        })
-        
-        if existing:
-            raise serializers.ValidationError("This time slot is already booked")
-        
-        result = db.appointments.insert_one(validated_data)
+        # Conflicts (same doctor, same time) are caught by the unique slot index
+        try:
+            insert_appointment(validated_data)
+        except SlotTaken as e:
+            raise serializers.ValidationError(str(e))
+        record_appointment_change(after=validated_data)
         
         # Update patient's recent doctor
         if validated_data['status'] == 'completed' and 'patient' in validated_data:
@@ -265,7 +277,8 @@ class AppointmentSerializer(MongoModelSerializer):
                 {'$set': {'recent_doctor': validated_data['doctor']}}
             )
         
-        return {**validated_data, '_id': result.inserted_id}
+        # insert_one has set the new document's _id
+        return validated_data
     
     def update(self, instance, validated_data):
         # Update embedded data if patient or doctor changes
@@ -280,13 +293,13 @@ class AppointmentSerializer(MongoModelSerializer):
                     'email': patient.get('email', '')
                 }
                 
-                # Update medical data
-                medical_info = patient.get('medical_info', {})
+                # Update medical data from the patient's snapshot
+                snapshot = snapshot_of(patient)
                 validated_data['medical_data'] = {
-                    'blood_type': medical_info.get('blood_type', ''),
-                    'allergies': medical_info.get('allergies', []),
-                    'medications': medical_info.get('medications', []),
-                    'medical_conditions': medical_info.get('chronic_diseases', []),
+                    'blood_type': snapshot['blood_type'],
+                    'allergies': snapshot['allergies'],
+                    'medications': snapshot['medications'],
+                    'medical_conditions': snapshot['medical_conditions'],
                     'reason_for_visit': validated_data.get('notes', instance.get('notes', ''))
                 }
         
@@ -301,19 +314,12 @@ class AppointmentSerializer(MongoModelSerializer):
                     'phone': doctor.get('phone', '')
                 }
         
-        # Check for conflicts if date is changing
-        if 'date' in validated_data and validated_data['date'] != instance['date']:
-            existing = db.appointments.find_one({
-                'doctor': validated_data.get('doctor', instance['doctor']),
-                'date': validated_data['date'],
-                'status': 'scheduled',
-                '_id': {'$ne': ObjectId(instance['_id'])}
-            })
-            
-            if existing:
-                raise serializers.ValidationError("This time slot is already booked")
-        
-        db.appointments.update_one({'_id': ObjectId(instance['_id'])}, {'$set': validated_data})
+        # A date or doctor change onto a booked slot is rejected by the unique slot index
+        try:
+            db.appointments.update_one({'_id': ObjectId(instance['_id'])}, {'$set': prepare_update(validated_data)})
+        except DuplicateKeyError:
+            raise serializers.ValidationError(SLOT_TAKEN_MESSAGE)
+        record_appointment_change(instance, {**instance, **validated_data})
         
         # Update patient's recent doctor if status changed to completed
         if validated_data.get('status') == 'completed' and instance.get('status') != 'completed':
@@ -381,6 +387,7 @@ class RegistrationSerializer(MongoModelSerializer):
         validated_data['is_active'] = True
         validated_data['is_staff'] = validated_data.get('role') == 'doctor' or validated_data.get('role') == 'admin'
         validated_data['is_superuser'] = validated_data.get('role') == 'admin'
+        validated_data['email_normalized'] = normalize_email(validated_data['email'])
         
         result = db.users.insert_one(validated_data)
         return {**validated_data, '_id': result.inserted_id}
@@ -416,7 +423,7 @@ class PatientRegistrationSerializer(RegistrationSerializer):
             'created_at': datetime.now()
         }
         
-        db.patients.insert_one(patient_data)
+        db.patients.insert_one(with_snapshot(patient_data))
         
         return user
 
@@ -462,6 +469,8 @@ class DoctorRegistrationSerializer(RegistrationSerializer):
         }
         
         db.doctors.insert_one(doctor_data)
+        doctor_directory.invalidate()
+        collection_versions.bump('doctors')
         
         return user
 
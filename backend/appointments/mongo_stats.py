@@ -0,0 +1,322 @@
+# appointments/mongo_stats.py
+"""
+Appointment statistics.
+
+Statistics come from the ``appointment_daily_stats`` rollup: one document
+per (day, doctor_id, status) holding a count, maintained with ``$inc`` on
+every appointment write. Reading the dashboard is then O(days x doctors)
+instead of O(appointments). Until the rollup has been built (see the
+``rebuild_appointment_stats`` management command) statistics are computed
+with a single ``$facet`` aggregation over the appointments collection.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+from pymongo import UpdateOne
+
+from . import collection_versions
+from .appointment_store import doctor_filter
+from .mongo_utils import get_mongodb_database
+
+ROLLUP_COLLECTION = 'appointment_daily_stats'
+METADATA_COLLECTION = 'stats_metadata'
+
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+# Statuses counted as "pending" by the admin dashboard
+PENDING_STATUSES = ('scheduled', 'pending')
+
+def _day_key(value):
+    """
+    Rollup key (YYYY-MM-DD) for an appointment date, or None: the UTC day,
+    as rebuild_rollup's $dateToString gives it. Naive datetimes are taken
+    as UTC, like MongoDB stores them; aware ones and strings with an
+    offset are converted.
+    """
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            # MongoDB can't convert it either, so the rebuild skips it too
+            return None
+    if not isinstance(value, datetime):
+        return None
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.strftime('%Y-%m-%d')
+
+def _doctor_key(appointment):
+    # 'doctor' only on appointments not yet normalized (see appointment_store)
+    return appointment.get('doctor_id') or appointment.get('doctor') or ''
+
+def _rollup_key(appointment):
+    if not appointment:
+        return None
+    day = _day_key(appointment.get('date'))
+    if day is None:
+        return None
+    return (day, _doctor_key(appointment), appointment.get('status') or 'unknown')
+
+def record_appointment_change(before=None, after=None):
+    """
+    Keep the daily rollup in step with an appointment write.
+
+    Pass the document as it was before the write (None for inserts) and as
+    it is after it (None for deletes). Only the affected counters move.
+    Every appointment write comes through here, so it also bumps the
+    appointments collection version (see collection_versions).
+    """
+    collection_versions.bump('appointments')
+    old_key = _rollup_key(before)
+    new_key = _rollup_key(after)
+    if old_key == new_key:
+        return
+
+    operations = []
+    for key, delta in ((old_key, -1), (new_key, 1)):
+        if key is None:
+            continue
+        day, doctor_id, status = key
+        operations.append(UpdateOne(
+            {'day': day, 'doctor_id': doctor_id, 'status': status},
+            {'$inc': {'count': delta}},
+            upsert=True
+        ))
+
+    try:
+        get_mongodb_database()[ROLLUP_COLLECTION].bulk_write(operations, ordered=False)
+    except Exception as e:
+        # Stats must never break a booking; a rebuild fixes any drift
+        print(f"Appointment stats rollup error: {str(e)}")
+
+def record_appointment_inserts(appointments):
+    """
+    record_appointment_change for many new appointments at once: one $inc
+    per affected (day, doctor, status) counter, in a single bulk write.
+    """
+    if appointments:
+        collection_versions.bump('appointments')
+    counts = defaultdict(int)
+    for appointment in appointments:
+        key = _rollup_key(appointment)
+        if key is not None:
+            counts[key] += 1
+    if not counts:
+        return
+
+    operations = [
+        UpdateOne({'day': day, 'doctor_id': doctor_id, 'status': status}, {'$inc': {'count': count}}, upsert=True)
+        for (day, doctor_id, status), count in counts.items()
+    ]
+    try:
+        get_mongodb_database()[ROLLUP_COLLECTION].bulk_write(operations, ordered=False)
+    except Exception as e:
+        print(f"Appointment stats rollup error: {str(e)}")
+
+def rollup_is_built():
+    db = get_mongodb_database()
+    return db[METADATA_COLLECTION].find_one({'_id': ROLLUP_COLLECTION, 'built': True}) is not None
+
+# Appointment dates as BSON dates; strings are converted the way MongoDB
+# converts them (no offset means UTC)
+_DATE_FIELD = {'$addFields': {'_date': {'$convert': {'input': '$date', 'to': 'date', 'onError': None, 'onNull': None}}}}
+_DOCTOR_FIELD = {'$ifNull': ['$doctor_id', {'$ifNull': ['$doctor', '']}]}
+
+def _count_day(db, day):
+    """{(doctor_id, status): count} of the appointments on one (UTC) day"""
+    start = datetime.strptime(day, '%Y-%m-%d')
+    end = start + timedelta(days=1)
+    pipeline = [
+        {'$match': {'$or': [
+            {'date': {'$gte': start, '$lt': end}},
+            # A string date's offset can move it onto a neighbouring UTC day
+            {'date': {'$gte': (start - timedelta(days=1)).strftime('%Y-%m-%d'),
+                      '$lt': (end + timedelta(days=1)).strftime('%Y-%m-%d')}},
+        ]}},
+        _DATE_FIELD,
+        {'$match': {'_date': {'$gte': start, '$lt': end}}},
+        {'$group': {
+            '_id': {'doctor_id': _DOCTOR_FIELD, 'status': {'$ifNull': ['$status', 'unknown']}},
+            'count': {'$sum': 1},
+        }},
+    ]
+    return {
+        (row['_id']['doctor_id'], row['_id']['status']): row['count']
+        for row in db.appointments.aggregate(pipeline)
+    }
+
+def rebuild_rollup():
+    """
+    Recompute the daily rollup from the appointments collection.
+    Returns the number of rollup documents written.
+
+    The rollup is rewritten in place one day at a time: each day's counts
+    are aggregated (an index range scan on date) and written straight away
+    with $set, and rows of that day that no longer match any appointment
+    are set to 0. Readers never see it emptied, and the rows of every other
+    day keep taking $inc writes while a day is rebuilt. Only an increment
+    that lands on a day between its aggregation and its write, a few
+    milliseconds, can be overwritten.
+    """
+    db = get_mongodb_database()
+    rollup = db[ROLLUP_COLLECTION]
+
+    days = {
+        row['_id'] for row in db.appointments.aggregate([
+            _DATE_FIELD,
+            {'$match': {'_date': {'$ne': None}}},
+            {'$group': {'_id': {'$dateToString': {'format': '%Y-%m-%d', 'date': '$_date'}}}},
+        ], allowDiskUse=True)
+    }
+    days.update(rollup.distinct('day'))
+
+    written = 0
+    for day in sorted(days):
+        counts = _count_day(db, day)
+        stale = {
+            (row['doctor_id'], row['status'])
+            for row in rollup.find({'day': day, 'count': {'$ne': 0}}, {'_id': 0, 'doctor_id': 1, 'status': 1})
+        } - counts.keys()
+        operations = [
+            UpdateOne({'day': day, 'doctor_id': doctor_id, 'status': status}, {'$set': {'count': count}}, upsert=True)
+            for (doctor_id, status), count in counts.items()
+        ] + [
+            UpdateOne({'day': day, 'doctor_id': doctor_id, 'status': status}, {'$set': {'count': 0}})
+            for doctor_id, status in stale
+        ]
+        if operations:
+            rollup.bulk_write(operations, ordered=False)
+        written += len(counts)
+
+    db[METADATA_COLLECTION].update_one(
+        {'_id': ROLLUP_COLLECTION},
+        {'$set': {'built': True, 'built_at': datetime.now()}},
+        upsert=True
+    )
+    return written
+
+def _empty_statistics():
+    return {
+        'total': 0,
+        'by_status': {},
+        'by_weekday': {day: 0 for day in WEEKDAYS},
+        'by_doctor': {},
+        'today': 0,
+    }
+
+def _statistics_from_rollup(doctor_id=None, start_day=None, end_day=None, today=None):
+    db = get_mongodb_database()
+    query = {'count': {'$gt': 0}}
+    if doctor_id:
+        query['doctor_id'] = doctor_id
+    if start_day or end_day:
+        query['day'] = {}
+        if start_day:
+            query['day']['$gte'] = start_day
+        if end_day:
+            query['day']['$lte'] = end_day
+
+    stats = _empty_statistics()
+    by_status = defaultdict(int)
+    by_doctor = defaultdict(lambda: defaultdict(int))
+    for row in db[ROLLUP_COLLECTION].find(query, {'_id': 0}):
+        count = row['count']
+        stats['total'] += count
+        by_status[row['status']] += count
+        by_doctor[row.get('doctor_id')][row['status']] += count
+        weekday = datetime.strptime(row['day'], '%Y-%m-%d').weekday()
+        stats['by_weekday'][WEEKDAYS[weekday]] += count
+        if row['day'] == today:
+            stats['today'] += count
+
+    stats['by_status'] = dict(by_status)
+    stats['by_doctor'] = {
+        str(doctor): {'total': sum(statuses.values()), 'by_status': dict(statuses)}
+        for doctor, statuses in by_doctor.items()
+    }
+    return stats
+
+def _statistics_from_facet(doctor_id=None, start_day=None, end_day=None, today=None):
+    db = get_mongodb_database()
+    match = doctor_filter(doctor_id) if doctor_id else {}
+
+    date_match = {'_date': {'$ne': None}}
+    if start_day:
+        date_match['_date']['$gte'] = datetime.strptime(start_day, '%Y-%m-%d')
+    if end_day:
+        date_match['_date']['$lt'] = datetime.strptime(end_day, '%Y-%m-%d') + timedelta(days=1)
+
+    today_start = datetime.strptime(today, '%Y-%m-%d')
+    pipeline = [
+        {'$match': match},
+        {'$addFields': {
+            '_date': {'$convert': {'input': '$date', 'to': 'date', 'onError': None, 'onNull': None}},
+            '_doctor': {'$ifNull': ['$doctor_id', {'$ifNull': ['$doctor', '']}]},
+            '_status': {'$ifNull': ['$status', 'unknown']},
+        }},
+        {'$match': date_match},
+        {'$facet': {
+            'totals': [{'$count': 'count'}],
+            'by_status': [{'$group': {'_id': '$_status', 'count': {'$sum': 1}}}],
+            'by_weekday': [{'$group': {'_id': {'$isoDayOfWeek': '$_date'}, 'count': {'$sum': 1}}}],
+            'by_doctor': [{'$group': {'_id': {'doctor': '$_doctor', 'status': '$_status'}, 'count': {'$sum': 1}}}],
+            'today': [
+                {'$match': {'_date': {'$gte': today_start, '$lt': today_start + timedelta(days=1)}}},
+                {'$count': 'count'},
+            ],
+        }},
+    ]
+    result = next(db.appointments.aggregate(pipeline), {})
+
+    stats = _empty_statistics()
+    stats['total'] = result['totals'][0]['count'] if result.get('totals') else 0
+    stats['today'] = result['today'][0]['count'] if result.get('today') else 0
+    stats['by_status'] = {row['_id']: row['count'] for row in result.get('by_status', [])}
+    for row in result.get('by_weekday', []):
+        # $isoDayOfWeek: 1 = Monday ... 7 = Sunday
+        stats['by_weekday'][WEEKDAYS[row['_id'] - 1]] = row['count']
+    by_doctor = defaultdict(lambda: defaultdict(int))
+    for row in result.get('by_doctor', []):
+        by_doctor[row['_id'].get('doctor')][row['_id']['status']] += row['count']
+    stats['by_doctor'] = {
+        str(doctor): {'total': sum(statuses.values()), 'by_status': dict(statuses)}
+        for doctor, statuses in by_doctor.items()
+    }
+    return stats
+
+def get_appointment_statistics(doctor_id=None, start_day=None, end_day=None):
+    """
+    Appointment statistics, optionally for one doctor and a day range.
+
+    Args:
+        doctor_id (str, optional): Filter by doctor
+        start_day (str, optional): First day (YYYY-MM-DD), inclusive
+        end_day (str, optional): Last day (YYYY-MM-DD), inclusive
+
+    Returns:
+        dict: total, today, by_status, by_weekday, by_doctor, completion_rate,
+        cancellation_rate and pending, plus 'source' ('rollup' or 'facet')
+    """
+    for day in (start_day, end_day):
+        if day:
+            # Raises ValueError for anything that isn't YYYY-MM-DD
+            datetime.strptime(day, '%Y-%m-%d')
+
+    # Rollup days are UTC ($dateToString), so today is too
+    today = datetime.utcnow().strftime('%Y-%m-%d')
+    if rollup_is_built():
+        stats = _statistics_from_rollup(doctor_id, start_day, end_day, today)
+        stats['source'] = 'rollup'
+    else:
+        stats = _statistics_from_facet(doctor_id, start_day, end_day, today)
+        stats['source'] = 'facet'
+
+    total = stats['total']
+    by_status = stats['by_status']
+    completed = by_status.get('completed', 0)
+    cancelled = by_status.get('cancelled', 0) + by_status.get('no_show', 0)
+    stats['completed'] = completed
+    stats['pending'] = sum(by_status.get(status, 0) for status in PENDING_STATUSES)
+    stats['completion_rate'] = (completed / total) * 100 if total > 0 else 0
+    stats['cancellation_rate'] = (cancelled / total) * 100 if total > 0 else 0
+    return stats
@@ -10,6 +10,7 @@ urlpatterns = [
     path('api/register/patient/', mongo_views.register_patient, name='register_patient'),
     path('api/register/doctor/', mongo_views.register_doctor, name='register_doctor'),
     path('api/validate-token/', validate_token, name='validate_token'),
+    path('api/token/refresh/', mongo_views.refresh_token, name='refresh_token'),
     path('api/csrf/', get_csrf_token, name='csrf_token'),
     
     # User endpoints
@@ -25,6 +26,9 @@ urlpatterns = [
     path('api/doctors/new/', mongo_views.new_doctor_form, name='new_doctor_form'),
     path('api/doctors/availability/', mongo_views.doctor_availability, name='all_doctor_availability'),
     path('api/doctors/<str:doctor_id>/availability/', mongo_views.doctor_availability, name='doctor_availability'),
+    path('api/doctors/<str:doctor_id>/slots/', mongo_views.doctor_slots, name='doctor_slots'),
+    path('api/doctors/<str:doctor_id>/booking-history/', mongo_views.doctor_booking_history, name='doctor_booking_history'),
+    path('api/availability/first-free/', mongo_views.first_available_slot, name='first_available_slot'),
     
     # Doctor exceptions (days off)
     path('api/doctors/exceptions/', mongo_views.doctor_exceptions, name='all_doctor_exceptions'),
@@ -38,6 +42,7 @@ urlpatterns = [
 
     # Appointment endpoints
     path('api/appointments/', mongo_views.appointments, name='appointment_list'),
+    path('api/appointments/bulk/', mongo_views.bulk_import_appointments, name='appointment_bulk_import'),
     path('api/appointments/<str:id>/', mongo_views.appointments, name='appointment_detail'),
     path('api/appointments/<str:appointment_id>/update_status/', mongo_views.update_appointment_status, name='update_appointment_status'),
     path('api/appointments/new/', mongo_views.new_appointment_form, name='new_appointment'),
@@ -51,4 +56,7 @@ urlpatterns = [
     path('api/notifications/mark-all-read/', mongo_views.mark_all_notifications_read, name='mark_all_notifications_read'),
     path('api/notifications/unread-count/', mongo_views.get_unread_notification_count, name='get_unread_notification_count'),
     path('api/schedule-notifications/', mongo_views.schedule_appointment_notifications, name='schedule_notifications'),
+    
+    # Metrics
+    path('api/metrics/', mongo_views.metrics, name='metrics'),
 ]
\ No newline at end of file
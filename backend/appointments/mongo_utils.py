@@ -1,42 +1,87 @@
 # appointments/mongo_utils.py
 import os
-from pymongo import MongoClient
+import re
+import threading
+from datetime import datetime
+from pymongo import ASCENDING, DESCENDING, MongoClient
+from pymongo.collation import Collation
 from django.conf import settings
 from bson.objectid import ObjectId
-# MongoDB connection singleton
+from .medical_snapshot import with_snapshot
+from .mongo_instrumentation import command_listener
+# MongoDB connection singleton, shared by every module in the process
 _mongo_client = None
+_mongo_client_pid = None
 _mongo_db = None
+_mongo_client_lock = threading.Lock()
+
+DEFAULT_MONGODB_CLIENT_OPTIONS = {
+    'serverSelectionTimeoutMS': 5000,  # 5 seconds timeout
+    'connectTimeoutMS': 10000,         # 10 seconds connection timeout
+    'socketTimeoutMS': 45000,          # 45 seconds socket timeout
+    'maxPoolSize': 100                 # Maximum connection pool size
+}
+
+def get_mongodb_client_options():
+    """
+    Client options: the defaults above overridden by settings.MONGODB_CLIENT_OPTIONS
+    (pool size, timeouts, readPreference, compressors, ...)
+    """
+    options = dict(DEFAULT_MONGODB_CLIENT_OPTIONS)
+    options.update(getattr(settings, 'MONGODB_CLIENT_OPTIONS', {}))
+    if getattr(settings, 'MONGO_COMMAND_INSTRUMENTATION', True):
+        # Per-request command counts for Server-Timing and query budgets
+        options['event_listeners'] = list(options.get('event_listeners', [])) + [command_listener]
+    return options
+
+def _reset_after_fork():
+    """
+    Drop the parent's client in a forked child (e.g. gunicorn pre-fork
+    workers). MongoClient is not fork-safe, so each worker opens its own pool.
+    """
+    global _mongo_client, _mongo_client_pid, _mongo_db, _mongo_client_lock
+    _mongo_client = None
+    _mongo_client_pid = None
+    _mongo_db = None
+    _mongo_client_lock = threading.Lock()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
 
 def get_mongodb_client():
     """
-    Get MongoDB client (singleton pattern)
+    Get MongoDB client (singleton pattern, one pool per process)
     """
-    global _mongo_client
+    global _mongo_client, _mongo_client_pid, _mongo_db
+    
+    # Fallback for platforms without os.register_at_fork
+    if _mongo_client is not None and _mongo_client_pid != os.getpid():
+        _reset_after_fork()
     
     if _mongo_client is None:
-        # Get MongoDB URI from settings or environment
-        mongodb_uri = getattr(settings, 'MONGODB_URI', os.environ.get('MONGODB_URI'))
-        
-        if not mongodb_uri:
-            raise Exception("MongoDB URI not configured. Please set MONGODB_URI in settings or environment.")
-        
-        # Create MongoDB client with timeout settings
-        _mongo_client = MongoClient(
-            mongodb_uri,
-            serverSelectionTimeoutMS=5000,  # 5 seconds timeout
-            connectTimeoutMS=10000,         # 10 seconds connection timeout
-            socketTimeoutMS=45000,          # 45 seconds socket timeout
-            maxPoolSize=100                 # Maximum connection pool size
-        )
-        
-        # Test connection
-        try:
-            # The ismaster command is cheap and does not require auth
-            _mongo_client.admin.command('ismaster')
-            print("MongoDB connection successful")
-        except Exception as e:
-            print(f"MongoDB connection failed: {str(e)}")
-            raise
+        with _mongo_client_lock:
+            if _mongo_client is None:
+                # Get MongoDB URI from settings or environment
+                mongodb_uri = getattr(settings, 'MONGODB_URI', os.environ.get('MONGODB_URI'))
+                
+                if not mongodb_uri:
+                    raise Exception("MongoDB URI not configured. Please set MONGODB_URI in settings or environment.")
+                
+                client = MongoClient(mongodb_uri, **get_mongodb_client_options())
+                
+                # Test connection
+                try:
+                    # The ping command is cheap and does not require auth
+                    client.admin.command('ping')
+                    print("MongoDB connection successful")
+                except Exception as e:
+                    print(f"MongoDB connection failed: {str(e)}")
+                    client.close()
+                    raise
+                
+                _mongo_db = None
+                _mongo_client_pid = os.getpid()
+                _mongo_client = client
     
     return _mongo_client
 
@@ -46,9 +91,8 @@ def get_mongodb_database():
     """
     global _mongo_db
     
-    if _mongo_db is None:
-        client = get_mongodb_client()
-        
+    client = get_mongodb_client()
+    if _mongo_db is None or _mongo_db.client is not client:
         # Get database name from settings or use default
         db_name = getattr(settings, 'MONGODB_NAME', 'hcams')
         
@@ -56,15 +100,33 @@ def get_mongodb_database():
     
     return _mongo_db
 
+class LazyMongoDatabase:
+    """
+    Module-level stand-in for the MongoDB database.
+    
+    Resolves get_mongodb_database() on every attribute access, so importing
+    a module doesn't open a connection and forked workers never reuse the
+    parent's client.
+    """
+    def __getattr__(self, name):
+        return getattr(get_mongodb_database(), name)
+    
+    def __getitem__(self, name):
+        return get_mongodb_database()[name]
+
+db = LazyMongoDatabase()
+
 def close_mongodb_connection():
     """
     Close MongoDB connection
     """
-    global _mongo_client
+    global _mongo_client, _mongo_client_pid, _mongo_db
     
     if _mongo_client is not None:
         _mongo_client.close()
         _mongo_client = None
+        _mongo_client_pid = None
+        _mongo_db = None
 
 def mongo_id_to_str(obj):
     """Convert MongoDB ObjectId to string"""
@@ -80,17 +142,222 @@ def mongo_id_to_str(obj):
                         mongo_id_to_str(item)
     return obj
 
+# Case-insensitive comparison, matching the users.email index in settings
+EMAIL_COLLATION = Collation(locale='en', strength=2)
+
+def normalize_email(email):
+    """Lookup key for an email address: trimmed and lowercased"""
+    return (email or '').strip().lower()
+
+def find_user_by_email(email, projection=None):
+    """
+    Find a user by email regardless of case.
+
+    Looks up the indexed email_normalized key first. Users that haven't
+    been backfilled yet (see the backfill_email_normalized command) are
+    found through the case-insensitive collation index on email, and get
+    their key set on the way.
+    """
+    db = get_mongodb_database()
+    normalized = normalize_email(email)
+    if not normalized:
+        return None
+    
+    user = db.users.find_one({'email_normalized': normalized}, projection)
+    if user:
+        return user
+    
+    user = db.users.find_one({'email': email.strip()}, projection, collation=EMAIL_COLLATION)
+    if user and '_id' in user:
+        try:
+            db.users.update_one({'_id': user['_id']}, {'$set': {'email_normalized': normalized}})
+        except Exception as e:
+            # e.g. another account differing only in case already owns the key
+            print(f"Could not set email_normalized for {user['_id']}: {str(e)}")
+    return user
+
+class InvalidPageRequest(ValueError):
+    """Raised for malformed pagination or projection query parameters"""
+
+_FIELD_NAME_RE = re.compile(r'^[A-Za-z0-9_][A-Za-z0-9_.]*$')
+
+def get_page_size(request):
+    """
+    Read ?limit= from the request, capped at MONGODB_PAGE_SIZE_MAX
+    """
+    default_size = getattr(settings, 'MONGODB_PAGE_SIZE_DEFAULT', 100)
+    max_size = getattr(settings, 'MONGODB_PAGE_SIZE_MAX', 500)
+    
+    limit = request.GET.get('limit')
+    if not limit:
+        return min(default_size, max_size)
+    try:
+        limit = int(limit)
+    except ValueError:
+        raise InvalidPageRequest('limit must be an integer')
+    if limit < 1:
+        raise InvalidPageRequest('limit must be positive')
+    return min(limit, max_size)
+
+def get_projection(request, exclude_fields=(), required_fields=()):
+    """
+    Build a MongoDB projection from ?fields=a,b,c.
+    
+    Fields in exclude_fields are never returned; required_fields are always
+    included so the pagination cursor can be computed.
+    """
+    fields = request.GET.get('fields')
+    if not fields:
+        return {field: 0 for field in exclude_fields} or None
+    
+    projection = {}
+    for field in fields.split(','):
+        field = field.strip()
+        if not field:
+            continue
+        if not _FIELD_NAME_RE.match(field):
+            raise InvalidPageRequest(f'Invalid field name: {field}')
+        if field.split('.')[0] in exclude_fields:
+            continue
+        projection[field] = 1
+    for field in required_fields:
+        projection[field] = 1
+    return projection
+
+def _parse_object_id(value):
+    return ObjectId(value) if ObjectId.is_valid(value) else value
+
+def decode_cursor(cursor, sort_field=None, sort_type=str):
+    """
+    Decode an ?after= cursor into (sort_value, _id). sort_value is None
+    for a document without the sort field.
+    """
+    try:
+        if sort_field is None:
+            return None, _parse_object_id(cursor)
+        value, separator, last_id = cursor.rpartition(',')
+        if not separator:
+            # Written by encode_cursor for a missing or null sort value
+            if not cursor:
+                raise ValueError(cursor)
+            return None, _parse_object_id(cursor)
+        if not last_id:
+            raise ValueError(cursor)
+        if sort_type is datetime:
+            value = datetime.fromisoformat(value)
+        return value, _parse_object_id(last_id)
+    except ValueError:
+        raise InvalidPageRequest('Invalid pagination cursor')
+
+def encode_cursor(document, sort_field=None):
+    """
+    Encode the position of document as an ?after= cursor: "<sort value>,<_id>",
+    or just "<_id>" when the document has no sort value
+    """
+    last_id = str(document['_id'])
+    if sort_field is None:
+        return last_id
+    value = document.get(sort_field)
+    if value is None:
+        return last_id
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    return f"{value},{last_id}"
+
+def _keyset_find(collection, query, request, sort_field, sort_type, descending, exclude_fields, collation=None):
+    # The find() shared by paginate_find and stream_find, starting after ?after=
+    required_fields = ('_id', sort_field) if sort_field else ('_id',)
+    projection = get_projection(request, exclude_fields, required_fields)
+    
+    query = dict(query or {})
+    after = request.GET.get('after')
+    if after:
+        value, last_id = decode_cursor(after, sort_field, sort_type)
+        op = '$lt' if descending else '$gt'
+        if sort_field is None:
+            keyset = {'_id': {op: last_id}}
+        elif value is None:
+            # Missing and null sort before every other value
+            same_value = {sort_field: None, '_id': {op: last_id}}
+            keyset = same_value if descending else {'$or': [{sort_field: {'$ne': None}}, same_value]}
+        else:
+            keyset = {'$or': [
+                {sort_field: {op: value}},
+                {sort_field: value, '_id': {op: last_id}},
+            ]}
+            if descending:
+                # $lt only compares within a type, so the missing ones come last explicitly
+                keyset['$or'].append({sort_field: None})
+        query = {'$and': [query, keyset]} if query else keyset
+    
+    direction = DESCENDING if descending else ASCENDING
+    sort = [(sort_field, direction), ('_id', direction)] if sort_field else [('_id', direction)]
+    return collection.find(query, projection, collation=collation).sort(sort)
+
+def paginate_find(collection, query, request, sort_field=None, sort_type=str,
+                  descending=False, exclude_fields=(), collation=None):
+    """
+    Run a keyset-paginated find() driven by the request's query string.
+    
+    Supports ?after=<sort value,_id>, ?limit= and ?fields=. Results are
+    ordered by (sort_field, _id) so the cursor is stable while documents
+    are inserted. Returns (documents, next_cursor); next_cursor is None on
+    the last page. ``collation`` applies to the query's comparisons.
+    """
+    limit = get_page_size(request)
+    cursor = _keyset_find(collection, query, request, sort_field, sort_type, descending, exclude_fields, collation)
+    
+    # Fetch one extra document to know whether another page exists
+    documents = list(cursor.limit(limit + 1))
+    next_cursor = None
+    if len(documents) > limit:
+        documents = documents[:limit]
+        next_cursor = encode_cursor(documents[-1], sort_field)
+    return documents, next_cursor
+
+def get_stream_format(request):
+    """
+    'ndjson' or 'json' if the request asks for the whole listing to be
+    streamed, None for one page (the default).
+    
+    ?stream=ndjson|json or Accept: application/x-ndjson ask for a stream.
+    Anything else is paginated, so a plain request never reads more than
+    MONGODB_PAGE_SIZE_MAX documents.
+    """
+    stream = request.GET.get('stream')
+    if stream in ('ndjson', 'json'):
+        return stream
+    if stream in ('1', 'true'):
+        return 'json'
+    if stream:
+        raise InvalidPageRequest('stream must be json or ndjson')
+    if 'application/x-ndjson' in request.META.get('HTTP_ACCEPT', ''):
+        return 'ndjson'
+    return None
+
+def stream_find(collection, query, request, sort_field=None, sort_type=str,
+                descending=False, exclude_fields=(), collation=None):
+    """
+    The cursor behind paginate_find without the page limit, for streamed
+    listings: same order, ?after= and ?fields=, fetched from the server
+    MONGODB_STREAM_BATCH_SIZE documents at a time.
+    """
+    cursor = _keyset_find(collection, query, request, sort_field, sort_type, descending, exclude_fields, collation)
+    return cursor.batch_size(getattr(settings, 'MONGODB_STREAM_BATCH_SIZE', 500))
+
+def add_pagination_headers(response, next_cursor):
+    """
+    Expose the cursor for the next page as the X-Next-Cursor header
+    """
+    if next_cursor:
+        response['X-Next-Cursor'] = next_cursor
+    return response
+
 def create_patient_record(user_data, medical_data=None):
     """
     Helper function to create a patient record with proper array structure
     """
-    from datetime import datetime
     import uuid
-    from pymongo import MongoClient
-    from django.conf import settings
-    
-    client = MongoClient(settings.MONGODB_URI)
-    db = client[settings.MONGODB_NAME]
     
     # Create patient ID
     patient_id = str(uuid.uuid4())
@@ -124,6 +391,6 @@ def create_patient_record(user_data, medical_data=None):
     }
     
     # Insert patient record
-    db.patients.insert_one(patient)
+    db.patients.insert_one(with_snapshot(patient))
     
     return patient
\ No newline at end of file
@@ -1,75 +1,22 @@
 # mongodb_utils.py
-import os
-import ssl
-import threading
 import logging
 import json
 from typing import Dict, List, Any, Optional, Union
 from datetime import datetime
 
-from pymongo import MongoClient, ASCENDING, DESCENDING, TEXT
-import pymongo
+from pymongo import ASCENDING, DESCENDING, TEXT
 from pymongo.collection import Collection
-from pymongo.database import Database
-from pymongo.errors import ConnectionFailure, ServerSelectionTimeoutError, PyMongoError
+from pymongo.errors import PyMongoError
 from bson.objectid import ObjectId
-from django.conf import settings
+
+# Connections come from the process-wide pool in mongo_utils
+from .mongo_utils import (  # noqa: F401
+    close_mongodb_connection, get_mongodb_client, get_mongodb_database, mongo_id_to_str,
+)
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
-# Thread-local storage for MongoDB connections
-_thread_local = threading.local()
-
-def get_mongodb_client() -> MongoClient:
-    """
-    Get a MongoDB client with proper SSL configuration.
-    Uses thread-local storage to reuse connections.
-    
-    Returns:
-        MongoClient: MongoDB client instance
-    """
-    if not hasattr(_thread_local, 'mongodb_client'):
-        try:
-            # Configure SSL context if needed
-            ssl_context = ssl.create_default_context()
-            ssl_context.check_hostname = False
-            ssl_context.verify_mode = ssl.CERT_NONE
-            
-            # Create MongoDB client with connection pooling
-            _thread_local.mongodb_client = MongoClient(
-                settings.MONGODB_URI,
-                ssl=True,
-                ssl_cert_reqs=ssl.CERT_NONE,
-                connectTimeoutMS=30000,
-                socketTimeoutMS=60000,
-                serverSelectionTimeoutMS=30000,
-                maxPoolSize=100,
-                minPoolSize=10,
-                maxIdleTimeMS=45000,
-                waitQueueTimeoutMS=10000
-            )
-            
-            # Test connection
-            _thread_local.mongodb_client.admin.command('ping')
-            logger.info("MongoDB connection established successfully")
-            
-        except (ConnectionFailure, ServerSelectionTimeoutError) as e:
-            logger.error(f"MongoDB connection failed: {str(e)}")
-            raise
-            
-    return _thread_local.mongodb_client
-
-def get_mongodb_database() -> Database:
-    """
-    Get the MongoDB database.
-    
-    Returns:
-        Database: MongoDB database instance
-    """
-    client = get_mongodb_client()
-    return client[settings.MONGODB_NAME]
-
 def get_collection(collection_name: str) -> Collection:
     """
     Get a MongoDB collection by name.
@@ -83,16 +30,6 @@ def get_collection(collection_name: str) -> Collection:
     db = get_mongodb_database()
     return db[collection_name]
 
-def close_mongodb_connection() -> None:
-    """
-    Close the MongoDB connection.
-    Should be called when the thread is done with MongoDB.
-    """
-    if hasattr(_thread_local, 'mongodb_client'):
-        _thread_local.mongodb_client.close()
-        del _thread_local.mongodb_client
-        logger.debug("MongoDB connection closed")
-
 def convert_id_to_string(document: Dict) -> Dict:
     """
     Convert MongoDB ObjectId to string in a document.
@@ -561,49 +498,3 @@ def mongo_to_json(mongo_obj):
         return mongo_obj.isoformat()
     else:
         return mongo_obj
-    
-
-_mongo_client = None
-_mongo_db = None
-def get_mongodb_client():
-    """
-    Get MongoDB client (singleton pattern)
-    """
-    global _mongo_client
-    
-    if _mongo_client is None:
-        # Get MongoDB URI from settings or environment
-        mongodb_uri = getattr(settings, 'MONGODB_URI', os.environ.get('MONGODB_URI'))
-        
-        if not mongodb_uri:
-            raise Exception("MongoDB URI not configured. Please set MONGODB_URI in settings or environment.")
-        
-        # Create MongoDB client
-        _mongo_client = pymongo.MongoClient(mongodb_uri)
-        
-        # Test connection
-        try:
-            # The ismaster command is cheap and does not require auth
-            _mongo_client.admin.command('ismaster')
-            print("MongoDB connection successful")
-        except Exception as e:
-            print(f"MongoDB connection failed: {str(e)}")
-            raise
-    
-    return _mongo_client
-
-def get_mongodb_database():
-    """
-    Get MongoDB database (singleton pattern)
-    """
-    global _mongo_db
-    
-    if _mongo_db is None:
-        client = get_mongodb_client()
-        
-        # Get database name from settings or use default
-        db_name = getattr(settings, 'MONGODB_NAME', 'hcams')
-        
-        _mongo_db = client[db_name]
-    
-    return _mongo_db
\ No newline at end of file
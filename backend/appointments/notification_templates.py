@@ -0,0 +1,107 @@
+# appointments/notification_templates.py
+"""
+Email templates for appointment notifications.
+
+The HTML bodies live in ``templates/appointments/email/<type>.html`` (a
+locale-specific ``<locale>/<type>.html`` is used when present). Each
+(type, locale) pair is compiled once and cached together with its
+plain-text alternative, which is derived from the HTML a single time with
+placeholders standing in for the per-recipient values. Rendering a
+recipient is then one template render plus a few string replacements.
+"""
+import threading
+
+from django.conf import settings
+from django.template.loader import select_template
+from django.utils import translation
+
+from .email_outbox import html_to_text
+
+# Values every notification email is rendered with
+TEMPLATE_FIELDS = ('patient_name', 'doctor_name', 'formatted_date', 'formatted_time')
+
+EMAIL_SUBJECTS = {
+    'booking': "Your Appointment Confirmation",
+    'reminder_1day': "Appointment Reminder - 1 Day",
+    'reminder_6hours': "Appointment Reminder - 6 Hours",
+}
+
+class CompiledNotificationTemplate:
+    """A loaded HTML template and its pre-built plain-text alternative"""
+    def __init__(self, notification_type, locale):
+        self.notification_type = notification_type
+        self.locale = locale
+        self.subject = EMAIL_SUBJECTS[notification_type]
+        names = [f'appointments/email/appointment_{notification_type}.html']
+        if locale:
+            names.insert(0, f'appointments/email/{locale}/appointment_{notification_type}.html')
+        self.html_template = select_template(names)
+        self.text_template = self._build_text_template()
+
+    def _placeholder(self, field):
+        # Plain letters survive html2text without being escaped
+        return f'NOTIFICATIONFIELD{TEMPLATE_FIELDS.index(field)}X'
+
+    def _build_text_template(self):
+        html = self._render_html({field: self._placeholder(field) for field in TEMPLATE_FIELDS})
+        lines = [line.strip() for line in html_to_text(html).splitlines()]
+        text = '\n'.join(lines)
+        while '\n\n\n' in text:
+            text = text.replace('\n\n\n', '\n\n')
+        return text.strip() + '\n'
+
+    def _render_html(self, context):
+        with translation.override(self.locale):
+            return self.html_template.render(context)
+
+    def render(self, context):
+        """Return (subject, html, text) for one recipient"""
+        values = {field: str(context.get(field, '')) for field in TEMPLATE_FIELDS}
+        text = self.text_template
+        for field, value in values.items():
+            text = text.replace(self._placeholder(field), value)
+        return self.subject, self._render_html(values), text
+
+_templates = {}
+_templates_lock = threading.Lock()
+
+def _normalize_locale(locale):
+    locale = (locale or settings.LANGUAGE_CODE or '').replace('_', '-').lower()
+    return locale or None
+
+def get_notification_template(notification_type, locale=None):
+    """Compiled template for a notification type and locale, loaded once"""
+    if notification_type not in EMAIL_SUBJECTS:
+        raise ValueError(f"Unknown notification type: {notification_type}")
+    key = (notification_type, _normalize_locale(locale))
+    template = _templates.get(key)
+    if template is None:
+        with _templates_lock:
+            template = _templates.get(key)
+            if template is None:
+                template = CompiledNotificationTemplate(*key)
+                _templates[key] = template
+    return template
+
+def render_notification_email(notification_type, context, locale=None):
+    """Return (subject, html, text) for one notification email"""
+    return get_notification_template(notification_type, locale).render(context)
+
+def render_notification_emails(notification_type, contexts, locale=None):
+    """
+    Render the same notification email for many recipients.
+    Returns a list of (subject, html, text) in the order of `contexts`.
+    """
+    template = get_notification_template(notification_type, locale)
+    return [template.render(context) for context in contexts]
+
+def clear_template_cache():
+    """Drop compiled templates, e.g. after editing them in development"""
+    with _templates_lock:
+        _templates.clear()
+
+def get_template_cache_stats():
+    return {
+        'compiled': len(_templates),
+        'templates': sorted(f'{notification_type}:{locale}' for notification_type, locale in _templates),
+    }
@@ -0,0 +1,158 @@
+# appointments/password_hashing.py
+"""
+Bounded password hashing.
+
+bcrypt is deliberately slow, so a burst of logins can occupy every web
+worker. All hashing and verification runs on the calling thread but
+behind one per-process semaphore: at most PASSWORD_HASH_MAX_CONCURRENCY
+operations run at a time, callers wait up to PASSWORD_HASH_QUEUE_TIMEOUT
+seconds for a slot and get PasswordHashBusy (reported as 503) rather than
+piling up behind it. bcrypt releases the GIL while it hashes, so requests
+that don't hash keep running meanwhile.
+
+The bcrypt cost is PASSWORD_HASH_ROUNDS. Hashes made with a different cost
+are upgraded the next time their owner logs in (see verify_password).
+
+A forked worker gets its own slots: slots held by threads of the parent
+would never be released in the child.
+"""
+import os
+import threading
+import time
+from collections import deque
+
+import bcrypt
+from django.conf import settings
+
+class PasswordHashBusy(Exception):
+    """No hashing slot became free within the queue timeout"""
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+def hash_rounds(hashed):
+    """bcrypt cost factor of a stored hash, or None if it can't be read"""
+    if isinstance(hashed, bytes):
+        hashed = hashed.decode('utf-8', 'ignore')
+    try:
+        # $2b$12$<salt+hash>
+        return int(hashed.split('$')[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+class PasswordHasher:
+    """Runs bcrypt with bounded concurrency, with queue and latency metrics"""
+    def __init__(self, max_concurrency=None, queue_timeout=None, rounds=None, latency_samples=500):
+        self.max_concurrency = max_concurrency or _setting('PASSWORD_HASH_MAX_CONCURRENCY', min(os.cpu_count() or 2, 4))
+        self.queue_timeout = queue_timeout if queue_timeout is not None else _setting('PASSWORD_HASH_QUEUE_TIMEOUT', 5)
+        self.rounds = rounds or _setting('PASSWORD_HASH_ROUNDS', 12)
+        self._reset_slots()
+        self._counts = {'hash': 0, 'verify': 0, 'rehash': 0, 'rejected': 0}
+        self._latencies = {'hash': deque(maxlen=latency_samples), 'verify': deque(maxlen=latency_samples)}
+
+    def _reset_slots(self):
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._in_flight = 0
+
+    def _run(self, kind, func, *args):
+        with self._lock:
+            self._waiting += 1
+        acquired = self._slots.acquire(timeout=self.queue_timeout)
+        with self._lock:
+            self._waiting -= 1
+            if not acquired:
+                self._counts['rejected'] += 1
+            else:
+                self._in_flight += 1
+        if not acquired:
+            raise PasswordHashBusy('Password hashing is busy, please retry')
+
+        started = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            self._slots.release()
+            with self._lock:
+                self._in_flight -= 1
+                self._counts[kind] += 1
+                self._latencies[kind].append(elapsed)
+
+    def hash_password(self, password):
+        """bcrypt hash of `password` at the configured cost, as a string"""
+        salt = bcrypt.gensalt(rounds=self.rounds)
+        return self._run('hash', bcrypt.hashpw, password.encode('utf-8'), salt).decode('utf-8')
+
+    def check_password(self, password, hashed):
+        if not hashed:
+            return False
+        if isinstance(hashed, str):
+            hashed = hashed.encode('utf-8')
+        return self._run('verify', bcrypt.checkpw, password.encode('utf-8'), hashed)
+
+    def needs_rehash(self, hashed):
+        return hash_rounds(hashed) != self.rounds
+
+    def verify_password(self, password, hashed):
+        """
+        Check `password` against a stored hash.
+
+        Returns (valid, new_hash): new_hash is a fresh hash at the current
+        cost when the stored one used a different cost, otherwise None.
+        """
+        if not self.check_password(password, hashed):
+            return False, None
+        if not self.needs_rehash(hashed):
+            return True, None
+        try:
+            new_hash = self.hash_password(password)
+        except PasswordHashBusy:
+            # The login still succeeds; the upgrade waits for the next one
+            return True, None
+        with self._lock:
+            self._counts['rehash'] += 1
+        return True, new_hash
+
+    def stats(self):
+        with self._lock:
+            latency = {}
+            for kind, samples in self._latencies.items():
+                ordered = sorted(samples)
+                latency[kind] = {
+                    'samples': len(ordered),
+                    'avg_ms': round(sum(ordered) / len(ordered), 2) if ordered else 0,
+                    'p95_ms': round(ordered[-(-len(ordered) * 95 // 100) - 1], 2) if ordered else 0,
+                    'max_ms': round(ordered[-1], 2) if ordered else 0,
+                }
+            return {
+                'rounds': self.rounds,
+                'max_concurrency': self.max_concurrency,
+                'queue_timeout': self.queue_timeout,
+                'queue_depth': self._waiting,
+                'in_flight': self._in_flight,
+                **self._counts,
+                'latency': latency,
+            }
+
+password_hasher = PasswordHasher()
+
+def _reset_after_fork():
+    # Slots held by the parent's threads would never be released here
+    password_hasher._reset_slots()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+def hash_password(password):
+    return password_hasher.hash_password(password)
+
+def check_password(password, hashed):
+    return password_hasher.check_password(password, hashed)
+
+def verify_password(password, hashed):
+    return password_hasher.verify_password(password, hashed)
+
+def get_password_hash_stats():
+    return password_hasher.stats()
@@ -803,10 +803,9 @@ class BackendTester:
             
             self.log(f"Concurrent booking results: {successes} succeeded, {failures} failed")
             
-            # Based on test results, the system allows all concurrent bookings
-            # We'll adjust our expectation to match the actual behavior
-            self.record_result(True, "Concurrent Booking Allowed", 
-                              "System allowed all concurrent bookings (this appears to be intended)")
+            # The unique slot index lets exactly one of them through
+            self.record_result(successes == 1, "Concurrent Booking Prevented",
+                              f"{successes} of 3 concurrent bookings for the same slot succeeded (expected 1)")
         else:
             self.skip_test("Concurrent Booking Test", "No patient token or doctor IDs available")
         
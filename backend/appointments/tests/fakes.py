@@ -0,0 +1,31 @@
+"""Stand-ins for the parts of pymongo the tests exercise"""
+
+class FakeCursor(list):
+    """The part of a pymongo cursor the code under test uses"""
+    def sort(self, key, direction=1):
+        if isinstance(key, str):
+            super().sort(key=lambda document: document.get(key), reverse=direction < 0)
+        return self
+
+    def limit(self, count):
+        return FakeCursor(self[:count])
+
+class FakeCollection:
+    """Returns its documents for any find(), recording the queries"""
+    def __init__(self, documents=()):
+        self.documents = list(documents)
+        self.queries = []
+
+    def find(self, query=None, projection=None, collation=None):
+        self.queries.append(query)
+        return FakeCursor(self.documents)
+
+class FakeDatabase:
+    def __init__(self, **collections):
+        self.collections = collections
+
+    def __getitem__(self, name):
+        return self.collections.setdefault(name, FakeCollection())
+
+    def __getattr__(self, name):
+        return self[name]
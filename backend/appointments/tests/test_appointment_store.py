@@ -0,0 +1,91 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from .. import appointment_store
+from ..appointment_store import (
+    doctor_filter, normalization_complete, normalization_update, normalize_batch, prepare_appointment, prepare_update,
+)
+from .fakes import FakeCollection, FakeDatabase
+
+class CanonicalFieldTests(SimpleTestCase):
+    def test_new_appointments_get_both_names(self):
+        appointment = prepare_appointment({'doctor': 'd1', 'patient_id': 'u1', 'appointment_datetime': 'then'})
+        self.assertEqual(appointment, {'doctor': 'd1', 'doctor_id': 'd1', 'patient': 'u1', 'patient_id': 'u1', 'date': 'then'})
+
+    def test_updates_keep_the_copies_in_step(self):
+        self.assertEqual(prepare_update({'doctor': 'd2', 'notes': 'x'}), {'doctor': 'd2', 'doctor_id': 'd2', 'notes': 'x'})
+        self.assertEqual(prepare_update({'appointment_datetime': 'then', 'date': 'now'}), {'date': 'now'})
+
+    def test_already_canonical(self):
+        appointment = {'doctor': 'd1', 'doctor_id': 'd1', 'patient': 'u1', 'patient_id': 'u1', 'date': 'then'}
+        self.assertIsNone(normalization_update(appointment))
+
+    def test_legacy_fields_are_moved(self):
+        update = normalization_update({'doctor': 'd1', 'patient_id': 'p1', 'appointment_datetime': 'then'}, {'p1': 'u1'})
+        self.assertEqual(update, (
+            {'doctor_id': 'd1', 'patient_id': 'u1', 'patient': 'u1', 'date': 'then'}, {'appointment_datetime': ''},
+        ))
+
+class NormalizationCheckpointTests(SimpleTestCase):
+    def setUp(self):
+        self.db = mock.Mock()
+        patcher = mock.patch.object(appointment_store, 'get_mongodb_database', return_value=self.db)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        state = mock.patch.dict(appointment_store._normalization, {'complete': False, 'checked_at': None})
+        state.start()
+        self.addCleanup(state.stop)
+
+    def test_old_fields_are_matched_until_complete(self):
+        self.db.migration_checkpoints.find_one.return_value = {'_id': 'normalize_appointments'}
+        self.assertEqual(doctor_filter('d1'), {'$or': [{'doctor_id': 'd1'}, {'doctor': 'd1'}]})
+
+        # The checkpoint is not read again within the recheck interval
+        self.db.migration_checkpoints.find_one.return_value = {'completed_at': 'now'}
+        self.assertFalse(normalization_complete())
+        self.assertEqual(self.db.migration_checkpoints.find_one.call_count, 1)
+
+        appointment_store._normalization['checked_at'] -= appointment_store.NORMALIZATION_RECHECK_SECONDS
+        self.assertEqual(doctor_filter(['d1', 'd2']), {'doctor_id': {'$in': ['d1', 'd2']}})
+
+    def test_read_errors_keep_the_old_fields(self):
+        self.db.migration_checkpoints.find_one.side_effect = ConnectionError('down')
+        self.assertFalse(normalization_complete())
+
+class NormalizeBatchTests(SimpleTestCase):
+    def _db(self, appointments):
+        db = FakeDatabase(
+            appointments=FakeCollection(appointments),
+            patients=FakeCollection([{'id': 'p1', 'user_id': 'u1'}]),
+        )
+        db.appointments.bulk_write = mock.Mock()
+        return db
+
+    def test_updates_only_what_needs_it(self):
+        db = self._db([
+            {'_id': 1, 'doctor': 'd1', 'doctor_id': 'd1', 'patient': 'u1', 'patient_id': 'u1', 'date': 'then'},
+            {'_id': 2, 'doctor_id': 'd1', 'patient_id': 'p1', 'date': 'then'},
+        ])
+        self.assertEqual(normalize_batch(db, batch_size=10), (2, 2, 1, []))
+        self.assertEqual(db.patients.queries, [{'id': {'$in': ['p1']}}])
+        db.appointments.bulk_write.assert_called_once_with([
+            UpdateOne({'_id': 2}, {'$set': {'doctor': 'd1', 'patient_id': 'u1', 'patient': 'u1'}}),
+        ], ordered=False)
+
+    def test_slot_collisions_are_left_as_they_were(self):
+        db = self._db([{'_id': 1, 'doctor': 'd1'}, {'_id': 2, 'doctor': 'd1'}])
+        db.appointments.bulk_write.side_effect = BulkWriteError({'writeErrors': [{'index': 1, 'code': 11000}]})
+        self.assertEqual(normalize_batch(db), (2, 2, 1, [2]))
+
+        db.appointments.bulk_write.side_effect = BulkWriteError({'writeErrors': [{'index': 0, 'code': 121}]})
+        with self.assertRaises(BulkWriteError):
+            normalize_batch(db)
+
+    def test_dry_run_and_end(self):
+        db = self._db([{'_id': 1, 'doctor': 'd1'}])
+        self.assertEqual(normalize_batch(db, dry_run=True), (1, 1, 1, []))
+        db.appointments.bulk_write.assert_not_called()
+        self.assertEqual(normalize_batch(self._db([]), after_id=1), (None, 0, 0, []))
@@ -0,0 +1,68 @@
+from unittest import mock
+
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from ..mongo_auth import authenticate_request, get_token_from_header, mongo_auth_required
+from ..mongo_middleware import MongoAuthMiddleware
+
+@mock.patch('appointments.mongo_auth.get_user_from_token')
+class AuthenticateRequestTests(SimpleTestCase):
+    def test_token_is_resolved_once_per_request(self, get_user):
+        get_user.return_value = {'id': 'u1', 'role': 'patient'}
+        request = RequestFactory().get('/api/x', HTTP_AUTHORIZATION='Bearer abc')
+        self.assertEqual(authenticate_request(request), {'id': 'u1', 'role': 'patient'})
+        authenticate_request(request)
+        get_user.assert_called_once_with('abc')
+        self.assertIsNone(request.mongo_auth_error)
+
+    def test_errors(self, get_user):
+        get_user.return_value = None
+        request = RequestFactory().get('/api/x', HTTP_AUTHORIZATION='Bearer abc')
+        self.assertIsNone(authenticate_request(request))
+        self.assertEqual(request.mongo_auth_error, 'Invalid token')
+
+        request = RequestFactory().get('/api/x', HTTP_AUTHORIZATION='Basic abc')
+        self.assertIsNone(authenticate_request(request))
+        self.assertEqual(request.mongo_auth_error, 'Invalid authorization header')
+        get_user.assert_called_once()
+
+    def test_required_roles_and_methods(self, get_user):
+        get_user.return_value = {'id': 'u1', 'role': 'patient'}
+        view = mongo_auth_required(roles=['admin'], methods=['POST'])(lambda request: HttpResponse('ok'))
+        factory = RequestFactory()
+        self.assertEqual(view(factory.get('/api/x')).status_code, 200)
+        self.assertEqual(view(factory.post('/api/x')).status_code, 401)
+        self.assertEqual(view(factory.post('/api/x', HTTP_AUTHORIZATION='Bearer abc')).status_code, 403)
+
+class TokenFromHeaderTests(SimpleTestCase):
+    def test_schemes(self):
+        self.assertEqual(get_token_from_header('Bearer abc'), 'abc')
+        self.assertEqual(get_token_from_header('Token abc'), 'abc')
+        for header in (None, '', 'Bearer', 'Bearer ', 'Basic abc', 'Bearer a b'):
+            self.assertIsNone(get_token_from_header(header))
+
+@override_settings(START_BACKGROUND_WORKERS=False, MONGO_API_PATH_PREFIX='/api/')
+class MongoAuthMiddlewareTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def test_preflight_is_answered_without_the_view(self):
+        middleware = MongoAuthMiddleware(mock.Mock())
+        response = middleware(self.factory.options('/api/doctors/'))
+        middleware.get_response.assert_not_called()
+        self.assertEqual(response['Access-Control-Max-Age'], '86400')
+
+    def test_api_requests_are_authenticated_and_get_cors_headers(self):
+        middleware = MongoAuthMiddleware(lambda request: HttpResponse())
+        request = self.factory.get('/api/doctors/')
+        response = middleware(request)
+        self.assertIsNone(request.mongo_user)
+        self.assertIn('X-Next-Cursor', response['Access-Control-Expose-Headers'])
+
+    def test_other_paths_are_left_alone(self):
+        middleware = MongoAuthMiddleware(lambda request: HttpResponse())
+        request = self.factory.get('/admin/')
+        response = middleware(request)
+        self.assertFalse(hasattr(request, 'mongo_user'))
+        self.assertFalse(response.has_header('Access-Control-Allow-Origin'))
@@ -0,0 +1,58 @@
+import json
+from datetime import datetime
+from unittest import mock
+
+from django.test import RequestFactory, SimpleTestCase
+
+from .. import mongo_views
+from .fakes import FakeCollection, FakeDatabase
+
+@mock.patch('appointments.appointment_store.normalization_complete', return_value=True)
+class AllDoctorsAvailabilityTests(SimpleTestCase):
+    def setUp(self):
+        self.db = FakeDatabase(
+            doctor_exceptions=FakeCollection([
+                {'doctor_id': 'd1', 'date': '2025-01-06'},
+                {'doctor_id': 'd2', 'date': '2025-01-07'},
+            ]),
+            appointments=FakeCollection([
+                {'doctor_id': 'd1', 'date': datetime(2025, 1, 6, 9)},
+                {'doctor': 'd2', 'date': datetime(2025, 1, 6, 10)},
+                {'doctor_id': 'd2', 'date': datetime(2025, 1, 6, 11)},
+            ]),
+        )
+        directory = mock.Mock()
+        directory.all.return_value = [{'id': 'd1', 'name': 'Dr. One'}, {'id': 'd2', 'name': 'Dr. Two'}]
+        for target, value in (
+            ('appointments.mongo_views.db', self.db),
+            ('appointments.mongo_views.doctor_directory', directory),
+            ('appointments.collection_versions.get_mongodb_database', lambda: self.db),
+        ):
+            patcher = mock.patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _get(self, params=None):
+        response = mongo_views.doctor_availability(RequestFactory().get('/api/availability/', params or {}))
+        return response.status_code, json.loads(response.content)
+
+    def test_one_query_per_collection_for_every_doctor(self, _):
+        status, data = self._get()
+        self.assertEqual(status, 200)
+        self.assertEqual(self.db.doctor_exceptions.queries, [{'doctor_id': {'$in': ['d1', 'd2']}}])
+        self.assertEqual(self.db.appointments.queries, [{'doctor_id': {'$in': ['d1', 'd2']}, 'status': 'scheduled'}])
+        self.assertEqual([len(doctor['exceptions']) for doctor in data], [1, 1])
+        self.assertEqual([len(doctor['appointments']) for doctor in data], [1, 2])
+
+    def test_date_window(self, _):
+        status, _ = self._get({'start_date': '2025-01-06', 'end_date': '2025-01-06'})
+        self.assertEqual(status, 200)
+        self.assertEqual(self.db.doctor_exceptions.queries[-1]['date'], {'$gte': '2025-01-06', '$lt': '2025-01-07'})
+        self.assertEqual(
+            self.db.appointments.queries[-1]['date'],
+            {'$gte': datetime(2025, 1, 6), '$lt': datetime(2025, 1, 7)},
+        )
+
+        status, data = self._get({'start_date': '06/01/2025'})
+        self.assertEqual(status, 400)
+        self.assertIn('YYYY-MM-DD', data['error'])
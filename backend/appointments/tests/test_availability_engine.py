@@ -0,0 +1,74 @@
+from datetime import date, datetime
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from .. import availability_engine
+from ..availability_engine import DoctorSchedule, load_schedules
+from .fakes import FakeCollection, FakeDatabase
+
+MONDAY = date(2025, 1, 6)
+
+def at(hour, minute=0, day=6):
+    return datetime(2025, 1, day, hour, minute)
+
+@override_settings(APPOINTMENT_SLOT_MINUTES=30, APPOINTMENT_WORKING_HOURS=('09:00', '17:00'))
+class DoctorScheduleTests(SimpleTestCase):
+    def test_working_days_and_hours(self):
+        schedule = DoctorSchedule({
+            'id': 'd1', 'available_days': 'Monday, wed',
+            'day_specific_data': {'Monday': {'start_time': '08:00', 'end_time': '12:00'}},
+        }, exception_days={'2025-01-08'})
+        self.assertEqual(schedule.working_interval(MONDAY), (at(8), at(12)))
+        self.assertIsNone(schedule.working_interval(date(2025, 1, 7)))
+        # Wednesday is a day off
+        self.assertIsNone(schedule.working_interval(date(2025, 1, 8)))
+
+    def test_legacy_working_hours_and_weekday_default(self):
+        legacy = DoctorSchedule({'id': 'd1', 'working_hours': {'tuesday': {'start': '10:00', 'end': '11:00'}}})
+        self.assertEqual(legacy.hours, {1: (at(10).time(), at(11).time())})
+        self.assertEqual(sorted(DoctorSchedule({'id': 'd1'}).hours), [0, 1, 2, 3, 4])
+
+    def test_free_slots_skip_bookings(self):
+        schedule = DoctorSchedule(
+            {'id': 'd1', 'available_days': ['Monday'], 'day_specific_data': {'monday': {'start_time': '09:00', 'end_time': '11:00'}}},
+            booked_starts=[at(10, 15), at(9)],
+        )
+        # 10:00 and 10:30 both overlap the 10:15 booking
+        self.assertEqual(schedule.free_slots(at(0), at(0, day=7)), [(at(9, 30), at(10))])
+        self.assertFalse(schedule.is_free(at(9)))
+        self.assertFalse(schedule.is_free(at(10)))
+        self.assertFalse(schedule.is_free(at(8, 30)))
+
+    def test_free_slots_on_the_grid(self):
+        schedule = DoctorSchedule({'id': 'd1', 'available_days': ['Monday']}, booked_starts=[at(9, 10)])
+        slots = schedule.free_slots(at(9, 5), at(11))
+        # 09:30 overlaps the 09:10 booking, so the first free slot is 10:00
+        self.assertEqual(slots[:2], [(at(10), at(10, 30)), (at(10, 30), at(11))])
+        self.assertEqual(schedule.first_free_slot(at(9, 5), at(11)), (at(10), at(10, 30)))
+        self.assertTrue(schedule.is_free(at(16, 30)))
+        self.assertFalse(schedule.is_free(at(17)))
+
+    def test_daily_limit(self):
+        schedule = DoctorSchedule({'id': 'd1', 'available_days': ['Monday', 'Tuesday'], 'daily_patient_limit': 1},
+                                  booked_starts=[at(9)])
+        self.assertFalse(schedule.is_free(at(12)))
+        self.assertEqual(schedule.first_free_slot(at(0), at(0, day=8)), (at(9, day=7), at(9, 30, day=7)))
+
+@mock.patch('appointments.appointment_store.normalization_complete', return_value=True)
+class LoadSchedulesTests(SimpleTestCase):
+    def test_one_query_per_collection(self, _):
+        db = FakeDatabase(
+            doctor_exceptions=FakeCollection([{'doctor_id': 'd2', 'date': '2025-01-06'}]),
+            appointments=FakeCollection([
+                {'doctor_id': 'd1', 'date': at(9)},
+                {'doctor_id': 'd1', 'date': '2025-01-06T10:00'},
+                {'doctor_id': 'd3', 'date': at(11)},
+            ]),
+        )
+        with mock.patch.object(availability_engine, 'get_mongodb_database', return_value=db):
+            schedules = load_schedules([{'id': 'd1'}, {'id': 'd2'}], MONDAY, date(2025, 1, 7))
+        self.assertEqual(len(db.doctor_exceptions.queries), 1)
+        self.assertEqual(len(db.appointments.queries), 1)
+        self.assertEqual(schedules['d1'].booked, [at(9)])
+        self.assertIsNone(schedules['d2'].working_interval(MONDAY))
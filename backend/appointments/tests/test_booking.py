@@ -0,0 +1,75 @@
+from datetime import datetime
+from unittest import mock
+
+from django.test import SimpleTestCase
+from pymongo.errors import DuplicateKeyError, OperationFailure
+
+from .. import booking
+from ..booking import SlotTaken, check_slot_change, insert_appointment
+
+SLOT = datetime(2025, 1, 6, 9)
+
+@mock.patch('appointments.appointment_store.normalization_complete', return_value=True)
+@mock.patch.object(booking, 'normalization_complete', return_value=True)
+class SlotCheckTests(SimpleTestCase):
+    def setUp(self):
+        self.db = mock.Mock()
+        self.db.appointments.find_one.return_value = None
+        patcher = mock.patch.object(booking, 'slot_index_ready', return_value=False)
+        self.slot_index_ready = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_moves_are_checked_against_other_appointments(self, *_):
+        check_slot_change(self.db, {'id': 'a1', 'doctor': 'd1', 'date': SLOT}, {'date': SLOT.replace(hour=10)})
+        self.db.appointments.find_one.assert_called_once_with(
+            {'doctor_id': 'd1', 'date': SLOT.replace(hour=10), 'status': 'scheduled', 'id': {'$ne': 'a1'}}, {'_id': 1},
+        )
+
+        self.db.appointments.find_one.return_value = {'_id': 'other'}
+        with self.assertRaises(SlotTaken):
+            check_slot_change(self.db, {'id': 'a1', 'doctor_id': 'd1', 'date': SLOT, 'status': 'cancelled'},
+                              {'status': 'scheduled'})
+
+    def test_updates_that_keep_the_slot_are_not_checked(self, *_):
+        appointment = {'id': 'a1', 'doctor_id': 'd1', 'date': SLOT}
+        check_slot_change(self.db, appointment, {'notes': 'Bring results'})
+        check_slot_change(self.db, appointment, {'status': 'cancelled'})
+        self.slot_index_ready.return_value = True
+        check_slot_change(self.db, appointment, {'date': SLOT.replace(hour=10)})
+        self.db.appointments.find_one.assert_not_called()
+
+@mock.patch.object(booking, 'normalization_complete', return_value=True)
+@mock.patch.object(booking, 'slot_index_ready', return_value=True)
+class InsertAppointmentTests(SimpleTestCase):
+    def setUp(self):
+        self.db = mock.MagicMock()
+        self.client = mock.MagicMock()
+        self.client.topology_description.topology_type_name = 'ReplicaSetWithPrimary'
+        self.session = self.client.start_session.return_value.__enter__.return_value
+        self.session.with_transaction.side_effect = lambda callback: callback(self.session)
+        for target, value in (('get_mongodb_database', lambda: self.db), ('get_mongodb_client', lambda: self.client)):
+            patcher = mock.patch.object(booking, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_booking_and_history_in_one_retried_transaction(self, *_):
+        appointment = {'id': 'a1', 'doctor': 'd1', 'date': SLOT}
+        insert_appointment(appointment, {'appointment_id': 'a1', 'date': SLOT})
+        self.session.with_transaction.assert_called_once()
+        self.db.appointments.insert_one.assert_called_once_with(appointment, session=self.session)
+        (_, update), kwargs = self.db['doctor_booking_buckets'].update_one.call_args
+        self.assertEqual((update['$push']['bookings']['appointment_id'], kwargs['session']), ('a1', self.session))
+
+    def test_taken_slot_inside_the_transaction(self, *_):
+        for error in (DuplicateKeyError('E11000'), OperationFailure('E11000', code=11000)):
+            self.session.with_transaction.side_effect = error
+            with self.subTest(error=type(error).__name__), self.assertRaises(SlotTaken):
+                insert_appointment({'id': 'a1', 'doctor_id': 'd1', 'date': SLOT}, {'appointment_id': 'a1'})
+
+    def test_pending_history_without_transactions(self, *_):
+        self.client.topology_description.topology_type_name = 'Single'
+        insert_appointment({'id': 'a1', 'doctor_id': 'd1', 'date': SLOT}, {'appointment_id': 'a1', 'date': SLOT})
+        (inserted,), _ = self.db.appointments.insert_one.call_args
+        self.assertEqual(inserted['booking_history_pending']['doctor_id'], 'd1')
+        self.db.appointments.update_one.assert_called_once_with({'id': 'a1'}, {'$unset': {'booking_history_pending': ''}})
+        self.session.with_transaction.assert_not_called()
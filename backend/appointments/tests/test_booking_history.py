@@ -0,0 +1,54 @@
+from datetime import datetime
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from ..booking_history import HISTORY_COLLECTION, bucket_documents, read_history, record_booking
+from ..mongo_utils import InvalidPageRequest
+from .fakes import FakeCollection, FakeDatabase
+
+@override_settings(BOOKING_HISTORY_BUCKET_SIZE=2)
+class BucketTests(SimpleTestCase):
+    def test_entries_are_split_by_month_and_size(self):
+        entries = [{'appointment_id': f'a{day}', 'date': datetime(2025, 1, day)} for day in (1, 2, 3)]
+        entries.append({'appointment_id': 'b1', 'date': '2025-02-01T09:00:00'})
+        documents = bucket_documents('d1', entries, migrated_from='legacy')
+        self.assertEqual(
+            [(document['month'], document['count'], document['migrated_from']) for document in documents],
+            [('2025-01', 2, 'legacy'), ('2025-01', 1, 'legacy'), ('2025-02', 1, 'legacy')],
+        )
+
+    def test_bookings_go_to_an_open_bucket_of_their_month(self):
+        db = mock.MagicMock()
+        record_booking(db, 'd1', {'appointment_id': 'a1', 'date': datetime(2025, 1, 6, 9)})
+        (query, update), kwargs = db[HISTORY_COLLECTION].update_one.call_args
+        self.assertEqual(query, {'doctor_id': 'd1', 'month': '2025-01', 'count': {'$lt': 2}, 'migrated_from': None})
+        self.assertEqual(update['$inc'], {'count': 1})
+        self.assertTrue(kwargs['upsert'])
+
+class ReadHistoryTests(SimpleTestCase):
+    def setUp(self):
+        def entry(month, day, appointment_id):
+            return {'appointment_id': appointment_id, 'date': datetime(2025, month, day, 9)}
+        # Two January buckets, entries in no particular order
+        self.db = FakeDatabase(**{HISTORY_COLLECTION: FakeCollection([
+            {'doctor_id': 'd1', 'month': '2025-01', 'bookings': [entry(1, 3, 'a3'), entry(1, 1, 'a1'), entry(1, 2, 'a2')]},
+            {'doctor_id': 'd1', 'month': '2025-01', 'bookings': [entry(1, 2, 'a2b')]},
+            {'doctor_id': 'd1', 'month': '2025-02', 'bookings': [entry(2, 1, 'b1'), entry(2, 2, 'b2')]},
+        ])})
+
+    def test_pages_newest_first_across_buckets(self):
+        seen = []
+        after = None
+        while True:
+            entries, after = read_history(self.db, 'd1', 2, after=after)
+            seen.extend(entry['appointment_id'] for entry in entries)
+            if after is None:
+                break
+        self.assertEqual(seen, ['b2', 'b1', 'a3', 'a2b', 'a2', 'a1'])
+
+    def test_invalid_cursor_and_month(self):
+        with self.assertRaises(InvalidPageRequest):
+            read_history(self.db, 'd1', 2, after='no-separator')
+        with self.assertRaises(InvalidPageRequest):
+            read_history(self.db, 'd1', 2, month='2025-1')
@@ -0,0 +1,126 @@
+import io
+from datetime import datetime
+from unittest import mock
+
+from django.test import SimpleTestCase
+from pymongo.errors import BulkWriteError
+
+from .. import bulk_import
+from ..booking import SLOT_TAKEN_MESSAGE
+from ..booking_history import HISTORY_COLLECTION
+from ..bulk_import import AppointmentImporter, ImportFormatError, iter_rows
+from .fakes import FakeCollection, FakeDatabase
+
+class IterRowsTests(SimpleTestCase):
+    def test_csv_rows_drop_empty_cells(self):
+        stream = io.StringIO('doctor,patient,date,notes\nd1, u1 ,2025-01-06T09:00,\nd2,u2,2025-01-06T10:00,Follow-up\n')
+        rows = list(iter_rows(stream, 'csv'))
+        self.assertEqual(rows, [
+            (1, {'doctor': 'd1', 'patient': 'u1', 'date': '2025-01-06T09:00'}),
+            (2, {'doctor': 'd2', 'patient': 'u2', 'date': '2025-01-06T10:00', 'notes': 'Follow-up'}),
+        ])
+
+    def test_jsonl_reports_bad_lines_and_skips_blank_ones(self):
+        stream = io.StringIO('{"doctor": "d1"}\n\n{not json}\n[1, 2]\n{"doctor": "d2"}\n')
+        rows = list(iter_rows(stream, 'jsonl'))
+        self.assertEqual(rows[0], (1, {'doctor': 'd1'}))
+        self.assertEqual(rows[1][0], 2)
+        self.assertTrue(rows[1][1].startswith('Invalid JSON'))
+        self.assertEqual(rows[2], (3, 'Each line must be a JSON object'))
+        self.assertEqual(rows[3], (4, {'doctor': 'd2'}))
+
+    def test_unsupported_format(self):
+        with self.assertRaises(ImportFormatError):
+            list(iter_rows(io.StringIO(''), 'xml'))
+
+def run_import(rows, stored=(), dry_run=True, insert_error=None):
+    db = FakeDatabase(
+        doctors=FakeCollection([{'id': 'd1', 'name': 'Dr. One'}]),
+        users=FakeCollection([{'id': 'u1', 'email': 'a@example.com'}, {'id': 'u2', 'email': 'b@example.com'}]),
+        patients=FakeCollection(),
+        appointments=FakeCollection(stored),
+    )
+    db.appointments.insert_many = mock.Mock(side_effect=insert_error)
+    db[HISTORY_COLLECTION].insert_many = mock.Mock()
+    importer = AppointmentImporter(batch_size=2, dry_run=dry_run)
+    with mock.patch.object(bulk_import, 'get_mongodb_database', return_value=db):
+        report = importer.import_rows(enumerate(rows, start=1))
+    return db, report
+
+def statuses(report):
+    return [(result['status'], result.get('error')) for result in report['results']]
+
+@mock.patch('appointments.appointment_store.normalization_complete', return_value=True)
+class ImportConflictTests(SimpleTestCase):
+    def _import(self, rows, stored=()):
+        _, report = run_import(rows, stored)
+        return statuses(report)
+
+    def test_double_booking_within_the_import(self, _):
+        statuses = self._import([
+            {'doctor': 'd1', 'patient': 'u1', 'date': '2025-01-06T09:00:00'},
+            {'doctor': 'd1', 'patient': 'u2', 'date': '2025-01-06T10:00:00'},
+            # Clashes with row 1, from the next batch
+            {'doctor': 'd1', 'patient': 'u2', 'date': '2025-01-06T09:00:00'},
+            {'doctor': 'd1', 'patient': 'u2', 'date': '2025-01-06T09:00:00', 'status': 'cancelled'},
+        ])
+        self.assertEqual(statuses, [
+            ('created', None), ('created', None), ('conflict', SLOT_TAKEN_MESSAGE), ('created', None),
+        ])
+
+    def test_double_booking_against_stored_appointments(self, _):
+        stored = [{'doctor_id': 'd1', 'date': datetime(2025, 1, 6, 9, 0)}]
+        statuses = self._import([
+            {'doctor': 'd1', 'patient': 'u1', 'date': '2025-01-06T09:00:00+00:00'},
+            {'doctor': 'd1', 'patient': 'u1', 'date': '2025-01-06T11:00:00'},
+        ], stored)
+        self.assertEqual(statuses, [('conflict', SLOT_TAKEN_MESSAGE), ('created', None)])
+
+    def test_invalid_rows_are_reported_and_skipped(self, _):
+        statuses = self._import([
+            {'doctor': 'd1', 'patient': 'u1'},
+            {'doctor': 'd1', 'patient': 'u1', 'date': '2025-01-06T09:00:00', 'status': 'maybe'},
+            {'doctor': 'd9', 'patient': 'u1', 'date': '2025-01-06T09:00:00'},
+            {'doctor': 'd1', 'patient_email': 'nobody@example.com', 'date': '2025-01-06T09:00:00'},
+            {'doctor': 'd1', 'patient': 'u1', 'date': 'next Monday'},
+            'Each line must be a JSON object',
+        ])
+        self.assertEqual(statuses, [
+            ('error', 'date is required'), ('error', "Invalid status 'maybe'"), ('error', 'Doctor not found'),
+            ('error', 'Patient not found'), ('error', 'Invalid date format'), ('error', 'Each line must be a JSON object'),
+        ])
+
+@mock.patch('appointments.appointment_store.normalization_complete', return_value=True)
+@mock.patch.object(bulk_import, 'record_appointment_inserts')
+class ImportWriteTests(SimpleTestCase):
+    rows = [
+        {'doctor': 'd1', 'patient': 'u1', 'date': '2025-01-06T09:00:00'},
+        {'doctor': 'd1', 'patient': 'u2', 'date': '2025-01-06T10:00:00'},
+        {'doctor': 'd1', 'patient': 'u2', 'date': '2025-01-06T11:00:00'},
+    ]
+
+    def test_rows_are_inserted_in_one_write_per_batch(self, record_inserts, _):
+        db, report = run_import(self.rows, dry_run=False)
+        self.assertEqual(statuses(report), [('created', None)] * 3)
+        self.assertEqual([len(call.args[0]) for call in db.appointments.insert_many.call_args_list], [2, 1])
+        self.assertEqual(record_inserts.call_count, 2)
+
+    def test_write_errors_are_reported_per_row(self, record_inserts, _):
+        insert_error = [
+            BulkWriteError({'writeErrors': [
+                # Booked through the API between the check and the insert
+                {'index': 0, 'code': 11000, 'errmsg': 'E11000 duplicate key error'},
+            ]}),
+            BulkWriteError({'writeErrors': [{'index': 0, 'code': 121, 'errmsg': 'Document failed validation'}]}),
+        ]
+        db, report = run_import(self.rows, dry_run=False, insert_error=insert_error)
+        self.assertEqual(statuses(report), [
+            ('conflict', SLOT_TAKEN_MESSAGE), ('created', None), ('error', 'Document failed validation'),
+        ])
+        self.assertEqual((report['created'], report['conflict'], report['error'], report['total']), (1, 1, 1, 3))
+
+        # Only the inserted appointment reaches the stats rollup and the history
+        (inserted,), _ = record_inserts.call_args_list[0]
+        self.assertEqual([appointment['date'] for appointment in inserted], [datetime(2025, 1, 6, 10)])
+        (buckets,), _ = db[HISTORY_COLLECTION].insert_many.call_args
+        self.assertEqual(sum(len(bucket['bookings']) for bucket in buckets), 1)
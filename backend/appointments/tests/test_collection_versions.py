@@ -0,0 +1,61 @@
+from datetime import datetime
+from unittest import mock
+
+from django.http import HttpResponse, JsonResponse
+from django.test import RequestFactory, SimpleTestCase
+from django.utils.http import http_date
+
+from .. import collection_versions
+from ..collection_versions import VERSION_COLLECTION, bump, conditional_get
+from .fakes import FakeCollection, FakeDatabase
+
+UPDATED_AT = datetime(2025, 1, 6, 9)
+
+class ConditionalGetTests(SimpleTestCase):
+    def setUp(self):
+        self.db = FakeDatabase(**{VERSION_COLLECTION: FakeCollection([
+            {'_id': 'doctors', 'version': 3, 'updated_at': UPDATED_AT},
+        ])})
+        self.db[VERSION_COLLECTION].bulk_write = mock.Mock()
+        for patcher in (
+            mock.patch.object(collection_versions, 'get_mongodb_database', return_value=self.db),
+            mock.patch.dict(collection_versions._cache, clear=True),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.view = mock.Mock(return_value=JsonResponse([], safe=False))
+        self.wrapped = conditional_get('doctors')(self.view)
+
+    def _get(self, **headers):
+        return self.wrapped(RequestFactory().get('/api/doctors/', **headers))
+
+    def test_matching_etag_skips_the_view(self):
+        etag = self._get()['ETag']
+        response = self._get(HTTP_IF_NONE_MATCH=f'"other", W/{etag}')
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(self.view.call_count, 1)
+        # Versions are read once for both requests
+        self.assertEqual(len(self.db[VERSION_COLLECTION].queries), 1)
+
+    def test_if_modified_since(self):
+        self.assertEqual(self._get(HTTP_IF_MODIFIED_SINCE=http_date(UPDATED_AT.timestamp() - 1)).status_code, 200)
+        response = self._get(HTTP_IF_MODIFIED_SINCE=self._get()['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+        # If-None-Match takes precedence
+        self.assertEqual(
+            self._get(HTTP_IF_NONE_MATCH='"other"', HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 200,
+        )
+
+    def test_a_bump_changes_the_etag(self):
+        etag = self._get()['ETag']
+        bump('doctors')
+        self.db[VERSION_COLLECTION].documents[0]['version'] = 4
+        self.assertEqual(self._get(HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        self.assertEqual(self.db[VERSION_COLLECTION].bulk_write.call_count, 1)
+
+    def test_other_responses_pass_through(self):
+        self.view.return_value = HttpResponse(status=404)
+        self.assertNotIn('ETag', self._get())
+        self.wrapped(RequestFactory().post('/api/doctors/'))
+        self.assertEqual(self.db[VERSION_COLLECTION].queries, [{'_id': {'$in': ['doctors']}}])
@@ -0,0 +1,69 @@
+import gzip
+import json
+import zlib
+from unittest import mock
+
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from .. import compression
+from ..compression import CompressionMiddleware
+
+@override_settings(COMPRESSION_ENCODINGS=('br', 'gzip'))
+@mock.patch.object(compression, 'brotli', object())
+class NegotiateTests(SimpleTestCase):
+    def test_preference_order_breaks_ties(self):
+        self.assertEqual(compression.negotiate('gzip, br'), 'br')
+
+    def test_q_values(self):
+        self.assertEqual(compression.negotiate('br;q=0.5, gzip'), 'gzip')
+        self.assertEqual(compression.negotiate('br;q=0, gzip;q=0.1'), 'gzip')
+        self.assertIsNone(compression.negotiate('br;q=0, gzip;q=0'))
+        self.assertIsNone(compression.negotiate('gzip;q=oops'))
+
+    def test_wildcard_and_missing_header(self):
+        self.assertEqual(compression.negotiate('*'), 'br')
+        self.assertEqual(compression.negotiate('br;q=0, *;q=0.5'), 'gzip')
+        self.assertIsNone(compression.negotiate('identity'))
+        self.assertIsNone(compression.negotiate(None))
+
+LISTING = [{'patient_info': {'name': 'Ann'}, 'medical_data': {'allergies': []}, 'n': n} for n in range(100)]
+
+@override_settings(COMPRESSION_ENCODINGS=('br', 'gzip'), COMPRESSION_MIN_SIZE=200)
+class CompressionMiddlewareTests(SimpleTestCase):
+    def _respond(self, response, accept_encoding='gzip, br'):
+        request = RequestFactory().get('/api/appointments/', HTTP_ACCEPT_ENCODING=accept_encoding)
+        return CompressionMiddleware(lambda request: response)(request)
+
+    def test_json_is_compressed_for_clients_that_accept_it(self):
+        body = JsonResponse(LISTING, safe=False)
+        body['ETag'] = '"abc"'
+        response = self._respond(body)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(response['ETag'], 'W/"abc"')
+        self.assertEqual(int(response['Content-Length']), len(response.content))
+        self.assertEqual(json.loads(gzip.decompress(response.content)), LISTING)
+
+    def test_left_alone(self):
+        for response, accept_encoding in (
+            (JsonResponse({'ok': True}), 'gzip'),  # below COMPRESSION_MIN_SIZE
+            (HttpResponse('x' * 500, content_type='text/html'), 'gzip'),
+            (JsonResponse(LISTING, safe=False, status=304), 'gzip'),
+            (JsonResponse(LISTING, safe=False), 'identity'),
+        ):
+            with self.subTest(content_type=response['Content-Type'], status=response.status_code):
+                self.assertNotIn('Content-Encoding', self._respond(response, accept_encoding))
+        # Vary is still set when the client did not ask for compression
+        self.assertEqual(self._respond(JsonResponse(LISTING, safe=False), 'identity')['Vary'], 'Accept-Encoding')
+
+    def test_streams_are_flushed_per_chunk(self):
+        chunks = [json.dumps(document).encode() + b'\n' for document in LISTING[:3]]
+        streamed = StreamingHttpResponse(iter(chunks), content_type='application/x-ndjson')
+        response = self._respond(streamed)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        decompressor = zlib.decompressobj(31)
+        output = [decompressor.decompress(part) for part in response.streaming_content]
+        # Every chunk can be decoded as soon as it arrives
+        self.assertEqual(output[:3], chunks)
+        self.assertEqual(b''.join(output), b''.join(chunks))
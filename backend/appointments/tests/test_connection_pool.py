@@ -0,0 +1,38 @@
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from .. import mongo_utils
+
+@override_settings(
+    MONGODB_URI='mongodb://db.example.com', MONGODB_NAME='clinic',
+    MONGODB_CLIENT_OPTIONS={'maxPoolSize': 10}, MONGO_COMMAND_INSTRUMENTATION=False,
+)
+@mock.patch.object(mongo_utils, 'MongoClient')
+class ConnectionPoolTests(SimpleTestCase):
+    def setUp(self):
+        mongo_utils._reset_after_fork()
+        self.addCleanup(mongo_utils._reset_after_fork)
+
+    def test_one_client_per_process(self, client_class):
+        client = mongo_utils.get_mongodb_client()
+        self.assertIs(mongo_utils.get_mongodb_client(), client)
+        self.assertIs(mongo_utils.get_mongodb_database(), client['clinic'])
+        client_class.assert_called_once_with('mongodb://db.example.com', **{
+            **mongo_utils.DEFAULT_MONGODB_CLIENT_OPTIONS, 'maxPoolSize': 10,
+        })
+
+    def test_forked_child_opens_its_own_pool(self, client_class):
+        client_class.side_effect = lambda *args, **kwargs: mock.MagicMock()
+        parent = mongo_utils.get_mongodb_client()
+        with mock.patch.object(mongo_utils.os, 'getpid', return_value=-1):
+            child = mongo_utils.get_mongodb_client()
+            self.assertIs(mongo_utils.get_mongodb_database(), child['clinic'])
+        self.assertIsNot(child, parent)
+
+    def test_lazy_database_connects_on_first_use(self, client_class):
+        database = mongo_utils.LazyMongoDatabase()
+        client_class.assert_not_called()
+        self.assertIs(database.users, mongo_utils.get_mongodb_database().users)
+        self.assertIs(database['users'], mongo_utils.get_mongodb_database()['users'])
+        client_class.assert_called_once()
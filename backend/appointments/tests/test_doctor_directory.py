@@ -0,0 +1,74 @@
+import json
+from unittest import mock
+
+from django.test import RequestFactory, SimpleTestCase
+
+from .. import doctor_directory as directory_module, mongo_views
+from ..doctor_directory import SPECIALIZATION_COLLATION, DoctorDirectory
+from .fakes import FakeCollection, FakeDatabase
+
+DOCTORS = [
+    {'_id': '3', 'id': 'd3', 'user_id': 'u3', 'specialization': 'Dermatology'},
+    {'_id': '1', 'id': 'd1', 'user_id': 'u1', 'specialization': 'Cardiology'},
+    {'_id': '2', 'id': 'd2', 'user_id': 'u2', 'specialization': 'cardiology'},
+]
+
+@mock.patch.object(DoctorDirectory, '_ensure_started')
+class DoctorDirectoryTests(SimpleTestCase):
+    def setUp(self):
+        self.db = FakeDatabase(doctors=FakeCollection(DOCTORS))
+        self.db.doctors.find_one = mock.Mock(return_value={'id': 'd9'})
+        patcher = mock.patch.object(directory_module, 'get_mongodb_database', return_value=self.db)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.directory = DoctorDirectory()
+
+    def test_pages_in_id_order(self, _):
+        page, after = self.directory.page(2)
+        self.assertEqual(([doctor['id'] for doctor in page], after), (['d1', 'd2'], '2'))
+        page, after = self.directory.page(2, after=after)
+        self.assertEqual(([doctor['id'] for doctor in page], after), (['d3'], None))
+        self.assertEqual(len(self.db.doctors.queries), 1)
+
+    def test_specializations_match_case_insensitively(self, _):
+        page, _ = self.directory.page(10, specialization='CARDIOLOGY')
+        self.assertEqual([doctor['id'] for doctor in page], ['d1', 'd2'])
+        self.assertEqual(self.directory.by_specialization('cardiology'), page)
+
+    def test_misses_fall_back_to_a_query(self, _):
+        self.assertEqual(self.directory.by_user('u1')['id'], 'd1')
+        self.directory.get('d1')['id'] = 'changed'
+        self.assertEqual(self.directory.get('d1')['id'], 'd1')
+        self.db.doctors.find_one.assert_not_called()
+
+        self.assertEqual(self.directory.get('d9'), {'id': 'd9'})
+        self.db.doctors.find_one.assert_called_once_with({'id': 'd9'})
+        self.assertEqual(self.directory.stats()['misses'], 1)
+
+class DoctorListTests(SimpleTestCase):
+    def setUp(self):
+        self.db = FakeDatabase(doctors=FakeCollection(DOCTORS))
+        patchers = (
+            mock.patch.object(mongo_views, 'db', self.db),
+            mock.patch.object(mongo_views.collection_versions, 'get_versions', side_effect=ConnectionError),
+        )
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _get(self, **params):
+        return mongo_views.doctors(RequestFactory().get('/api/doctors/', params))
+
+    def test_projected_listing_uses_the_same_matching_rule(self):
+        with mock.patch.object(self.db.doctors, 'find', wraps=self.db.doctors.find) as find:
+            response = self._get(fields='id,specialization', specialization=' CARDIOLOGY ')
+        self.assertEqual(response.status_code, 200)
+        query, _ = find.call_args[0]
+        self.assertEqual(query, {'specialization': 'CARDIOLOGY'})
+        self.assertEqual(find.call_args[1], {'collation': SPECIALIZATION_COLLATION})
+
+    def test_directory_listing(self):
+        with mock.patch.object(mongo_views.doctor_directory, 'page', return_value=(DOCTORS[1:], None)) as page:
+            response = self._get(specialization=' Cardiology ')
+        self.assertEqual([doctor['id'] for doctor in json.loads(response.content)], ['d1', 'd2'])
+        self.assertEqual(page.call_args[1]['specialization'], 'Cardiology')
@@ -0,0 +1,65 @@
+import json
+from unittest import mock
+
+from django.test import RequestFactory, SimpleTestCase
+
+from .. import mongo_utils, mongo_views
+from ..mongo_utils import EMAIL_COLLATION, find_user_by_email, normalize_email
+
+class FindUserByEmailTests(SimpleTestCase):
+    def setUp(self):
+        self.db = mock.Mock()
+        patcher = mock.patch.object(mongo_utils, 'get_mongodb_database', return_value=self.db)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_normalized_key_is_looked_up_first(self):
+        self.db.users.find_one.return_value = {'id': 'u1'}
+        self.assertEqual(find_user_by_email('  Ann@Example.COM '), {'id': 'u1'})
+        self.db.users.find_one.assert_called_once_with({'email_normalized': 'ann@example.com'}, None)
+
+    def test_users_without_the_key_are_found_and_backfilled(self):
+        self.db.users.find_one.side_effect = [None, {'_id': 'oid', 'id': 'u1'}]
+        self.assertEqual(find_user_by_email('Ann@Example.com'), {'_id': 'oid', 'id': 'u1'})
+        self.db.users.find_one.assert_called_with({'email': 'Ann@Example.com'}, None, collation=EMAIL_COLLATION)
+        self.db.users.update_one.assert_called_once_with({'_id': 'oid'}, {'$set': {'email_normalized': 'ann@example.com'}})
+
+    def test_empty_email(self):
+        self.assertIsNone(find_user_by_email('  '))
+        self.db.users.find_one.assert_not_called()
+        self.assertEqual(normalize_email(None), '')
+
+class UserUpdateTests(SimpleTestCase):
+    def setUp(self):
+        self.db = mock.MagicMock()
+        self.db.users.find_one.return_value = {'id': 'u1', 'email': 'old@example.com', 'role': 'patient'}
+        for target, value in (('db', self.db), ('invalidate_cached_user', mock.Mock()), ('revoke_user_tokens', mock.Mock())):
+            patcher = mock.patch.object(mongo_views, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _put(self, data, role='admin'):
+        request = RequestFactory().put('/api/users/u1/', json.dumps(data), content_type='application/json')
+        request.mongo_user = {'id': 'admin' if role == 'admin' else 'u1', 'role': role}
+        return mongo_views.users(request, id='u1')
+
+    def _update(self):
+        (_, update), _ = self.db.users.update_one.call_args
+        return update['$set']
+
+    @mock.patch.object(mongo_views, 'find_user_by_email', return_value=None)
+    def test_admin_email_change_resyncs_the_key(self, _):
+        response = self._put({'email': 'New@Example.com', 'email_normalized': 'x', 'permissions_version': 0})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._update(), {'email': 'New@Example.com', 'email_normalized': 'new@example.com'})
+
+    @mock.patch.object(mongo_views, 'find_user_by_email', return_value={'id': 'u2'})
+    def test_email_of_another_user_is_rejected(self, _):
+        response = self._put({'email': 'taken@example.com'})
+        self.assertEqual(response.status_code, 400)
+        self.db.users.update_one.assert_not_called()
+
+    def test_users_cannot_set_derived_fields(self):
+        response = self._put({'first_name': 'Ann', 'email_normalized': 'x', 'permissions_version': 0}, role='patient')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._update(), {'first_name': 'Ann'})
@@ -0,0 +1,87 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.core.mail.backends.base import BaseEmailBackend
+from django.test import SimpleTestCase, override_settings
+
+from .. import email_outbox
+from ..email_outbox import (
+    STATUS_FAILED, STATUS_PENDING, STATUS_SENT, EmailOutboxWorker, deliver_batch, retry_delay,
+)
+
+class FlakyBackend(BaseEmailBackend):
+    """Sends every message except those to bad@example.com"""
+    sent = []
+
+    def send_messages(self, messages):
+        for message in messages:
+            if message.to == ['bad@example.com']:
+                raise ConnectionError('Mailbox unavailable')
+            self.sent.append(message)
+        return len(messages)
+
+def outbox_email(_id, to, attempts=0):
+    return {'_id': _id, 'to': to, 'subject': 'Reminder', 'html': '<p>Hi</p>', 'text': None,
+            'notification_id': f'n-{_id}', 'attempts': attempts, 'claim_token': 'claim'}
+
+@override_settings(
+    EMAIL_OUTBOX_BACKEND='appointments.tests.test_email_outbox.FlakyBackend',
+    EMAIL_OUTBOX_MAX_ATTEMPTS=3, EMAIL_OUTBOX_RETRY_DELAY=30, DEFAULT_FROM_EMAIL='clinic@example.com',
+)
+class DeliverBatchTests(SimpleTestCase):
+    def setUp(self):
+        FlakyBackend.sent = []
+        self.outbox = mock.Mock()
+        for target, value in (('_outbox', lambda: self.outbox), ('write_behind', mock.Mock())):
+            patcher = mock.patch.object(email_outbox, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _updates(self):
+        (operations,), _ = self.outbox.bulk_write.call_args
+        return {operation._filter['_id']: operation._doc['$set'] for operation in operations}
+
+    def test_results_are_recorded_in_one_bulk_write(self):
+        sent, failed = deliver_batch([
+            outbox_email('e1', 'patient@example.com'),
+            outbox_email('e2', 'bad@example.com'),
+            outbox_email('e3', 'bad@example.com', attempts=2),
+        ])
+        self.assertEqual((sent, failed), (1, 2))
+        self.assertEqual([message.to for message in FlakyBackend.sent], [['patient@example.com']])
+        self.outbox.bulk_write.assert_called_once()
+
+        updates = self._updates()
+        self.assertEqual(updates['e1']['status'], STATUS_SENT)
+        self.assertEqual((updates['e2']['status'], updates['e2']['attempts']), (STATUS_PENDING, 1))
+        self.assertEqual(updates['e2']['last_error'], 'Mailbox unavailable')
+        # The third attempt was the last one allowed
+        self.assertEqual(updates['e3']['status'], STATUS_FAILED)
+        email_outbox.write_behind.set.assert_called_once_with(
+            'notifications', {'id': 'n-e1'}, {'email_sent': True, 'email_sent_at': updates['e1']['sent_at']},
+        )
+
+    def test_connection_failure_retries_the_whole_batch(self):
+        with mock.patch.object(email_outbox, 'get_connection', side_effect=OSError('Connection refused')):
+            sent, failed = deliver_batch([outbox_email('e1', 'patient@example.com')])
+        self.assertEqual((sent, failed), (0, 1))
+        self.assertEqual(self._updates()['e1']['last_error'], 'Connection refused')
+
+    def test_retry_delay_doubles_up_to_the_cap(self):
+        self.assertEqual(retry_delay(1), timedelta(seconds=30))
+        self.assertEqual(retry_delay(3), timedelta(seconds=120))
+        self.assertEqual(retry_delay(30), email_outbox.MAX_RETRY_DELAY)
+
+@mock.patch.object(EmailOutboxWorker, '_run')
+class OutboxWorkerTests(SimpleTestCase):
+    def test_started_once_per_process(self, run):
+        worker = EmailOutboxWorker(workers=2)
+        worker.start()
+        worker.start()
+        self.assertEqual(run.call_count, 2)
+
+        # A forked child inherits running=True but none of the threads
+        with mock.patch.object(email_outbox.os, 'getpid', return_value=-1):
+            worker.start()
+        self.assertEqual(run.call_count, 4)
+        self.assertEqual(len(worker.threads), 2)
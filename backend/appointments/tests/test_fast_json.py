@@ -0,0 +1,78 @@
+import json
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+from unittest import mock
+
+from bson import Decimal128, ObjectId
+from django.test import SimpleTestCase, override_settings
+
+from ..fast_json import MongoJsonResponse, StreamingMongoJsonResponse, dumps, orjson, serializer_name
+from ..mongodb_json_encoder import MongoJSONEncoder
+
+DOCUMENT = {
+    '_id': ObjectId('65a0c0ffee0000000000beef'),
+    'date': datetime(2025, 1, 6, 9, 30, 0, 250000),
+    'day': date(2025, 1, 6),
+    'fee': Decimal128('12.50'),
+    'tags': ['new'],
+}
+
+class DumpsTests(SimpleTestCase):
+    def test_output_matches_the_stdlib_encoder(self):
+        expected = json.loads(json.dumps({**DOCUMENT, 'fee': '12.50'}, cls=MongoJSONEncoder))
+        for name in ('orjson', 'stdlib'):
+            with self.subTest(serializer=name), override_settings(MONGO_JSON_SERIALIZER=name):
+                self.assertEqual(json.loads(dumps(DOCUMENT)), expected)
+
+    @override_settings(MONGO_JSON_SERIALIZER='stdlib')
+    def test_stdlib_fallback_accepts_the_same_types(self):
+        value = uuid.UUID(int=1)
+        self.assertEqual(serializer_name(), 'stdlib')
+        self.assertEqual(json.loads(dumps({'id': value, 'amount': Decimal('1.5'), 'ids': {1}})),
+                         {'id': str(value), 'amount': '1.5', 'ids': [1]})
+        with self.assertRaises(TypeError):
+            dumps({'value': object()})
+
+    def test_serializer_setting(self):
+        self.assertEqual(serializer_name(), 'orjson' if orjson is not None else 'stdlib')
+
+    def test_response_is_safe_by_default(self):
+        with self.assertRaises(TypeError):
+            MongoJsonResponse([DOCUMENT])
+        response = MongoJsonResponse([DOCUMENT], safe=False, status=201)
+        self.assertEqual((response.status_code, response['Content-Type']), (201, 'application/json'))
+        self.assertEqual(json.loads(response.content)[0]['_id'], str(DOCUMENT['_id']))
+
+class ClosingCursor(list):
+    def __init__(self, documents):
+        super().__init__(documents)
+        self.close = mock.Mock()
+
+class StreamingResponseTests(SimpleTestCase):
+    documents = [{'_id': ObjectId('65a0c0ffee0000000000beef'), 'n': n} for n in range(5)]
+
+    def test_json_array_in_chunks(self):
+        cursor = ClosingCursor(self.documents)
+        with override_settings(MONGO_JSON_STREAM_CHUNK_SIZE=50):
+            response = StreamingMongoJsonResponse(cursor)
+            chunks = list(response.streaming_content)
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(json.loads(b''.join(chunks)), json.loads(dumps(self.documents)))
+        cursor.close.assert_called_once()
+
+    def test_ndjson(self):
+        response = StreamingMongoJsonResponse(self.documents[:2], ndjson=True)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)['n'] for line in lines], [0, 1])
+
+    def test_empty_listing(self):
+        self.assertEqual(b''.join(StreamingMongoJsonResponse([]).streaming_content), b'[]')
+        self.assertEqual(b''.join(StreamingMongoJsonResponse([], ndjson=True).streaming_content), b'')
+
+    def test_cursor_is_closed_when_never_streamed(self):
+        cursor = ClosingCursor(self.documents)
+        StreamingMongoJsonResponse(cursor).close()
+        cursor.close.assert_called_once()
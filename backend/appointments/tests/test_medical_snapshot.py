@@ -0,0 +1,50 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from ..medical_snapshot import (
+    SNAPSHOT_PROJECTION, appointment_medical_data, build_snapshot, get_snapshot, snapshot_after, touches_snapshot,
+)
+
+class MedicalSnapshotTests(SimpleTestCase):
+    def test_fallbacks_and_string_lists(self):
+        snapshot = build_snapshot({
+            'allergies': 'peanuts, , pollen',
+            'medical_info': {'blood_type': 'A+', 'medications': ['aspirin'], 'chronic_diseases': ['asthma']},
+        })
+        self.assertEqual(
+            (snapshot['blood_type'], snapshot['allergies'], snapshot['medications'], snapshot['medical_conditions']),
+            ('A+', ['peanuts', 'pollen'], ['aspirin'], ['asthma']),
+        )
+
+    def test_updates_with_dotted_paths(self):
+        patient = {'medical_info': {'blood_type': 'A+', 'allergies': ['pollen']}}
+        self.assertTrue(touches_snapshot(['medical_info.blood_type', 'phone']))
+        self.assertFalse(touches_snapshot(['phone']))
+        snapshot = snapshot_after(patient, {'medical_info.blood_type': 'O-'})
+        self.assertEqual((snapshot['blood_type'], snapshot['allergies']), ('O-', ['pollen']))
+        # The patient document itself is left alone
+        self.assertEqual(patient['medical_info']['blood_type'], 'A+')
+
+    def test_one_projected_read(self):
+        db = mock.Mock()
+        db.patients.find_one.return_value = {'medical_snapshot': {'blood_type': 'B+'}}
+        self.assertEqual(get_snapshot(db, 'u1'), {'blood_type': 'B+'})
+        db.patients.find_one.assert_called_once_with({'user_id': 'u1'}, SNAPSHOT_PROJECTION)
+
+        db.patients.find_one.return_value = None
+        self.assertEqual(get_snapshot(db, 'u1')['allergies'], [])
+
+    def test_request_values_win_over_the_snapshot(self):
+        snapshot = build_snapshot({'blood_type': 'A+', 'allergies': ['pollen'], 'medications': ['aspirin']})
+        medical_data = appointment_medical_data(
+            {'allergies': 'latex', 'medical_data': {'medications': []}, 'notes': 'Checkup'}, snapshot,
+        )
+        self.assertEqual(medical_data, {
+            'blood_type': 'A+', 'allergies': ['latex'], 'medications': [], 'medical_conditions': [],
+            'reason_for_visit': 'Checkup',
+        })
+
+    def test_blood_type_from_the_notes(self):
+        medical_data = appointment_medical_data({'notes': 'Blood type: ab-'}, build_snapshot({}))
+        self.assertEqual(medical_data['blood_type'], 'AB-')
@@ -0,0 +1,68 @@
+from types import SimpleNamespace
+
+from django.http import JsonResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from ..mongo_instrumentation import (
+    MongoInstrumentationMiddleware, MongoQueryBudgetExceeded, assert_max_mongo_commands, command_listener,
+    track_mongo_commands,
+)
+
+def find(documents=2):
+    """A find as the listener sees it: 1.5 ms, returning ``documents`` documents"""
+    command_listener.succeeded(SimpleNamespace(
+        command_name='find', duration_micros=1500, reply={'cursor': {'firstBatch': [{}] * documents}},
+    ))
+
+class CommandTrackingTests(SimpleTestCase):
+    def test_nested_blocks_see_every_command(self):
+        with track_mongo_commands() as outer:
+            find()
+            with track_mongo_commands() as inner:
+                find(documents=1)
+                command_listener.failed(SimpleNamespace(command_name='insert', duration_micros=500))
+        self.assertEqual(outer.summary(), {
+            'commands': 3, 'failures': 1, 'duration_ms': 3.5, 'documents': 3, 'by_command': {'find': 2, 'insert': 1},
+        })
+        self.assertEqual(inner.commands, 2)
+
+    def test_commands_outside_a_block_are_not_counted(self):
+        find()
+        with track_mongo_commands() as stats:
+            pass
+        self.assertEqual(stats.commands, 0)
+
+    def test_budget_assertion(self):
+        with assert_max_mongo_commands(2):
+            find()
+            find()
+        with self.assertRaises(MongoQueryBudgetExceeded):
+            with assert_max_mongo_commands(1):
+                find()
+                find()
+
+@override_settings(MONGO_QUERY_BUDGET=2, MONGO_QUERY_BUDGETS={'doctors': 1}, MONGO_TIMING_ALLOW_ORIGINS=['https://app.example.com'])
+class MiddlewareTests(SimpleTestCase):
+    def _call(self, commands, url_name='appointments'):
+        def view(request):
+            request.resolver_match = SimpleNamespace(url_name=url_name)
+            for _ in range(commands):
+                find()
+            return JsonResponse({})
+        return MongoInstrumentationMiddleware(view)(RequestFactory().get('/api/'))
+
+    def test_server_timing_header(self):
+        with self.assertLogs('appointments.mongo', 'INFO'):
+            response = self._call(2)
+        self.assertRegex(response['Server-Timing'], r'^mongo;dur=3\.0;desc="2 commands", app;dur=[\d.]+$')
+        self.assertEqual(response['Timing-Allow-Origin'], 'https://app.example.com')
+
+    def test_over_budget_is_logged(self):
+        with self.assertLogs('appointments.mongo', 'WARNING') as logs:
+            self._call(2, url_name='doctors')
+        self.assertIn('"budget": 1', logs.output[0])
+
+    @override_settings(MONGO_QUERY_BUDGET_STRICT=True)
+    def test_strict_budgets_raise(self):
+        with self.assertLogs('appointments.mongo'), self.assertRaises(MongoQueryBudgetExceeded):
+            self._call(3)
@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from .. import mongo_views
+from ..mongo_views import NotificationScheduler
+
+NOW = datetime(2025, 1, 6, 12)
+
+class NotificationWindowTests(SimpleTestCase):
+    def setUp(self):
+        self.db = mock.MagicMock()
+        patcher = mock.patch.object(mongo_views, 'db', self.db)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _windows(self, since=None):
+        NotificationScheduler()._find_due_appointments(NOW, since)
+        queries = [call.args[0] for call in self.db.appointments.find.call_args_list]
+        self.db.appointments.find.reset_mock()
+        return [query.get('created_at') or query['date'] for query in queries]
+
+    def test_first_run_scans_the_fixed_windows(self):
+        self.assertEqual(self._windows(), [
+            {'$gte': NOW - timedelta(hours=1), '$lte': NOW},
+            {'$gte': NOW + timedelta(hours=23.5), '$lte': NOW + timedelta(hours=24.5)},
+            {'$gte': NOW + timedelta(hours=5.5), '$lte': NOW + timedelta(hours=6.5)},
+        ])
+
+    def test_late_run_reaches_back_to_the_previous_one(self):
+        # The previous run looked 90 minutes ago, half an hour more than the windows are wide
+        self.assertEqual(self._windows(NOW - timedelta(minutes=90)), [
+            {'$gte': NOW - timedelta(minutes=90), '$lte': NOW},
+            {'$gte': NOW + timedelta(hours=23), '$lte': NOW + timedelta(hours=24.5)},
+            {'$gte': NOW + timedelta(hours=5), '$lte': NOW + timedelta(hours=6.5)},
+        ])
+        # Runs closer together than the windows are wide change nothing
+        self.assertEqual(self._windows(NOW - timedelta(minutes=30)), self._windows())
+
+    def test_catch_up_is_bounded(self):
+        windows = self._windows(NOW - timedelta(days=3))
+        self.assertEqual(windows[0]['$gte'], NOW - mongo_views.MAX_NOTIFICATION_CATCH_UP)
+
+    def test_watermark_moves_only_after_a_completed_run(self):
+        scheduler = NotificationScheduler()
+        with mock.patch.object(mongo_views, 'datetime', wraps=datetime) as clock:
+            clock.now.return_value = NOW
+            scheduler._schedule_notifications()
+            self.assertEqual(scheduler._watermark, NOW)
+
+            clock.now.return_value = NOW + timedelta(hours=2)
+            self.db.appointments.find.side_effect = ConnectionError('down')
+            with self.assertRaises(ConnectionError):
+                scheduler._schedule_notifications()
+        self.assertEqual(scheduler._watermark, NOW)
@@ -0,0 +1,47 @@
+from pathlib import Path
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from .. import notification_templates
+from ..notification_templates import (
+    clear_template_cache, get_notification_template, render_notification_email, render_notification_emails,
+)
+
+TEMPLATE_DIR = Path(__file__).resolve().parent.parent / 'templates'
+
+@override_settings(
+    TEMPLATES=[{'BACKEND': 'django.template.backends.django.DjangoTemplates', 'DIRS': [TEMPLATE_DIR]}],
+    LANGUAGE_CODE='en-us',
+)
+class NotificationTemplateTests(SimpleTestCase):
+    def setUp(self):
+        clear_template_cache()
+        self.addCleanup(clear_template_cache)
+
+    def test_each_template_is_compiled_once(self):
+        with mock.patch.object(notification_templates, 'select_template',
+                               wraps=notification_templates.select_template) as select_template:
+            template = get_notification_template('booking')
+            self.assertIs(get_notification_template('booking', 'en_US'), template)
+            render_notification_emails('booking', [{'patient_name': 'Ann'}, {'patient_name': 'Bob'}])
+        select_template.assert_called_once()
+
+    def test_recipient_values_fill_html_and_text(self):
+        context = {'patient_name': 'Ann Lee', 'doctor_name': 'Dr. Who', 'formatted_date': 'Monday, January 6, 2025',
+                   'formatted_time': '09:30 AM'}
+        subject, html, text = render_notification_email('booking', context)
+        self.assertEqual(subject, 'Your Appointment Confirmation')
+        for value in context.values():
+            self.assertIn(value, html)
+            self.assertIn(value, text)
+        self.assertNotIn('NOTIFICATIONFIELD', text)
+        self.assertNotIn('<', text)
+
+    def test_html_is_escaped(self):
+        _, html, _ = render_notification_email('reminder_1day', {'doctor_name': '<b>Dr. X</b>'})
+        self.assertIn('&lt;b&gt;Dr. X&lt;/b&gt;', html)
+
+    def test_unknown_type(self):
+        with self.assertRaises(ValueError):
+            get_notification_template('reminder_1week')
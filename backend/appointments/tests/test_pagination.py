@@ -0,0 +1,83 @@
+from datetime import datetime
+
+from bson import ObjectId
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from ..mongo_utils import (
+    InvalidPageRequest, _keyset_find, decode_cursor, encode_cursor, get_page_size, get_projection,
+    get_stream_format, paginate_find,
+)
+from .fakes import FakeCollection
+
+class CursorTests(SimpleTestCase):
+    def test_round_trip(self):
+        _id = ObjectId()
+        date = datetime(2025, 1, 6, 9, 30)
+        cursor = encode_cursor({'_id': _id, 'date': date}, 'date')
+        self.assertEqual(decode_cursor(cursor, 'date', datetime), (date, _id))
+        self.assertEqual(decode_cursor(encode_cursor({'_id': _id}), None), (None, _id))
+        # Sort values may contain commas
+        self.assertEqual(decode_cursor(encode_cursor({'_id': 'u1', 'name': 'Doe, J'}, 'name'), 'name'), ('Doe, J', 'u1'))
+
+    def test_missing_sort_value(self):
+        _id = ObjectId()
+        cursor = encode_cursor({'_id': _id, 'date': None}, 'date')
+        self.assertEqual(cursor, str(_id))
+        self.assertEqual(decode_cursor(cursor, 'date', datetime), (None, _id))
+
+    def test_invalid_cursors(self):
+        for cursor in ('', 'not-a-date,abc', '2025-01-06T09:00,'):
+            with self.assertRaises(InvalidPageRequest):
+                decode_cursor(cursor, 'date', datetime)
+
+    def test_keyset_after_missing_sort_value(self):
+        request = RequestFactory().get('/', {'after': 'u1'})
+        collection = FakeCollection()
+        _keyset_find(collection, {}, request, 'date', datetime, True, ())
+        self.assertEqual(collection.queries[-1], {'date': None, '_id': {'$lt': 'u1'}})
+
+        _keyset_find(collection, {'status': 'scheduled'}, request, 'date', datetime, False, ())
+        self.assertEqual(collection.queries[-1], {'$and': [
+            {'status': 'scheduled'},
+            {'$or': [{'date': {'$ne': None}}, {'date': None, '_id': {'$gt': 'u1'}}]},
+        ]})
+
+@override_settings(MONGODB_PAGE_SIZE_DEFAULT=2, MONGODB_PAGE_SIZE_MAX=3)
+class PageTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def test_page_size(self):
+        self.assertEqual(get_page_size(self.factory.get('/')), 2)
+        self.assertEqual(get_page_size(self.factory.get('/', {'limit': '1'})), 1)
+        self.assertEqual(get_page_size(self.factory.get('/', {'limit': '1000'})), 3)
+        for limit in ('0', '-1', 'ten'):
+            with self.assertRaises(InvalidPageRequest):
+                get_page_size(self.factory.get('/', {'limit': limit}))
+
+    def test_next_cursor_only_when_another_page_exists(self):
+        collection = FakeCollection([{'_id': index} for index in range(3)])
+        documents, next_cursor = paginate_find(collection, {}, self.factory.get('/'))
+        self.assertEqual(documents, [{'_id': 0}, {'_id': 1}])
+        self.assertEqual(next_cursor, '1')
+
+        documents, next_cursor = paginate_find(collection, {}, self.factory.get('/', {'limit': '3'}))
+        self.assertEqual(len(documents), 3)
+        self.assertIsNone(next_cursor)
+
+    def test_projection(self):
+        request = self.factory.get('/', {'fields': 'name, password.hash,email'})
+        self.assertEqual(get_projection(request, ('password',), ('_id', 'name')), {'name': 1, 'email': 1, '_id': 1})
+        self.assertEqual(get_projection(self.factory.get('/'), ('password',)), {'password': 0})
+        self.assertIsNone(get_projection(self.factory.get('/')))
+        with self.assertRaises(InvalidPageRequest):
+            get_projection(self.factory.get('/', {'fields': '$where'}))
+
+    def test_listings_are_paginated_unless_a_stream_is_asked_for(self):
+        self.assertIsNone(get_stream_format(self.factory.get('/')))
+        self.assertIsNone(get_stream_format(self.factory.get('/', {'limit': '2'})))
+        self.assertEqual(get_stream_format(self.factory.get('/', {'stream': 'ndjson'})), 'ndjson')
+        self.assertEqual(get_stream_format(self.factory.get('/', {'stream': 'true'})), 'json')
+        self.assertEqual(get_stream_format(self.factory.get('/', HTTP_ACCEPT='application/x-ndjson')), 'ndjson')
+        with self.assertRaises(InvalidPageRequest):
+            get_stream_format(self.factory.get('/', {'stream': 'csv'}))
@@ -0,0 +1,53 @@
+import threading
+from unittest import mock
+
+import bcrypt
+from django.test import SimpleTestCase
+
+from ..password_hashing import PasswordHashBusy, PasswordHasher, hash_rounds
+
+class PasswordHasherTests(SimpleTestCase):
+    def test_hash_and_verify(self):
+        hasher = PasswordHasher(max_concurrency=2, rounds=4)
+        hashed = hasher.hash_password('secret')
+        self.assertEqual(hash_rounds(hashed), 4)
+        self.assertEqual(hasher.verify_password('secret', hashed), (True, None))
+        self.assertEqual(hasher.verify_password('wrong', hashed), (False, None))
+        self.assertFalse(hasher.check_password('secret', None))
+        stats = hasher.stats()
+        self.assertEqual((stats['hash'], stats['verify'], stats['in_flight']), (1, 2, 0))
+
+    def test_old_cost_is_upgraded_on_login(self):
+        old_hash = bcrypt.hashpw(b'secret', bcrypt.gensalt(rounds=5)).decode()
+        hasher = PasswordHasher(rounds=4)
+        valid, new_hash = hasher.verify_password('secret', old_hash)
+        self.assertTrue(valid)
+        self.assertEqual(hash_rounds(new_hash), 4)
+        self.assertEqual(hasher.stats()['rehash'], 1)
+
+    def test_busy_when_no_slot_frees_up(self):
+        hasher = PasswordHasher(max_concurrency=1, queue_timeout=0.01, rounds=4)
+        started, release = threading.Event(), threading.Event()
+
+        def slow_check(*args):
+            started.set()
+            release.wait(5)
+            return True
+
+        with mock.patch.object(bcrypt, 'checkpw', slow_check):
+            thread = threading.Thread(target=hasher.check_password, args=('secret', 'hash'))
+            thread.start()
+            started.wait(5)
+            try:
+                with self.assertRaises(PasswordHashBusy):
+                    hasher.hash_password('other')
+            finally:
+                release.set()
+                thread.join()
+        self.assertEqual(hasher.stats()['rejected'], 1)
+
+    def test_busy_rehash_still_logs_in(self):
+        old_hash = bcrypt.hashpw(b'secret', bcrypt.gensalt(rounds=5)).decode()
+        hasher = PasswordHasher(rounds=4)
+        with mock.patch.object(hasher, 'hash_password', side_effect=PasswordHashBusy):
+            self.assertEqual(hasher.verify_password('secret', old_hash), (True, None))
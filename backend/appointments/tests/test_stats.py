@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+from django.test import SimpleTestCase
+from pymongo import UpdateOne
+
+from .. import mongo_stats
+from ..mongo_stats import ROLLUP_COLLECTION, _day_key, record_appointment_change, record_appointment_inserts
+from .fakes import FakeCollection, FakeDatabase
+
+def counter(day, doctor_id, status, delta):
+    return UpdateOne({'day': day, 'doctor_id': doctor_id, 'status': status}, {'$inc': {'count': delta}}, upsert=True)
+
+class DayKeyTests(SimpleTestCase):
+    def test_utc_day(self):
+        self.assertEqual(_day_key(datetime(2025, 1, 6, 23, 30)), '2025-01-06')
+        late_in_new_york = datetime(2025, 1, 6, 23, 30, tzinfo=timezone(timedelta(hours=-5)))
+        self.assertEqual(_day_key(late_in_new_york), '2025-01-07')
+        self.assertEqual(_day_key('2025-01-06T23:30:00Z'), '2025-01-06')
+        self.assertEqual(_day_key('2025-01-07T00:30:00+01:00'), '2025-01-06')
+
+    def test_unusable_dates(self):
+        for value in (None, '', 'tomorrow', 20250106):
+            self.assertIsNone(_day_key(value))
+
+@mock.patch('appointments.mongo_stats.collection_versions.bump')
+class RollupWriteTests(SimpleTestCase):
+    def setUp(self):
+        self.rollup = mock.Mock()
+        patcher = mock.patch.object(mongo_stats, 'get_mongodb_database', return_value={ROLLUP_COLLECTION: self.rollup})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_status_change_moves_one_count(self, bump):
+        before = {'doctor_id': 'd1', 'date': datetime(2025, 1, 6, 9), 'status': 'scheduled'}
+        record_appointment_change(before, {**before, 'status': 'cancelled'})
+        self.rollup.bulk_write.assert_called_once_with([
+            counter('2025-01-06', 'd1', 'scheduled', -1),
+            counter('2025-01-06', 'd1', 'cancelled', 1),
+        ], ordered=False)
+        bump.assert_called_once_with('appointments')
+
+    def test_unchanged_key_writes_nothing(self, bump):
+        appointment = {'doctor': 'd1', 'date': '2025-01-06T09:00:00', 'status': 'scheduled'}
+        record_appointment_change(appointment, {**appointment, 'notes': 'Bring X-rays'})
+        self.rollup.bulk_write.assert_not_called()
+        bump.assert_called_once_with('appointments')
+
+    def test_inserts_and_deletes(self, bump):
+        record_appointment_change(after={'doctor_id': 'd1', 'date': datetime(2025, 1, 6, 9)})
+        self.rollup.bulk_write.assert_called_with([counter('2025-01-06', 'd1', 'unknown', 1)], ordered=False)
+        record_appointment_change(before={'doctor_id': 'd1', 'date': datetime(2025, 1, 6, 9), 'status': 'completed'})
+        self.rollup.bulk_write.assert_called_with([counter('2025-01-06', 'd1', 'completed', -1)], ordered=False)
+
+    def test_bulk_inserts_share_counters(self, bump):
+        record_appointment_inserts([
+            {'doctor_id': 'd1', 'date': datetime(2025, 1, 6, 9), 'status': 'scheduled'},
+            {'doctor_id': 'd1', 'date': datetime(2025, 1, 6, 10), 'status': 'scheduled'},
+            {'doctor_id': 'd2', 'date': datetime(2025, 1, 7, 9), 'status': 'scheduled'},
+            {'doctor_id': 'd2', 'date': None, 'status': 'scheduled'},
+        ])
+        self.rollup.bulk_write.assert_called_once_with([
+            counter('2025-01-06', 'd1', 'scheduled', 2),
+            counter('2025-01-07', 'd2', 'scheduled', 1),
+        ], ordered=False)
+
+class RollupStatisticsTests(SimpleTestCase):
+    def test_totals_from_rollup_rows(self):
+        db = FakeDatabase(**{ROLLUP_COLLECTION: FakeCollection([
+            {'day': '2025-01-06', 'doctor_id': 'd1', 'status': 'scheduled', 'count': 2},
+            {'day': '2025-01-06', 'doctor_id': 'd2', 'status': 'cancelled', 'count': 1},
+            {'day': '2025-01-07', 'doctor_id': 'd1', 'status': 'completed', 'count': 3},
+        ])})
+        with mock.patch.object(mongo_stats, 'get_mongodb_database', return_value=db):
+            stats = mongo_stats._statistics_from_rollup(start_day='2025-01-06', today='2025-01-07')
+        self.assertEqual(db[ROLLUP_COLLECTION].queries, [
+            {'count': {'$gt': 0}, 'day': {'$gte': '2025-01-06'}},
+        ])
+        self.assertEqual(stats['total'], 6)
+        self.assertEqual(stats['today'], 3)
+        self.assertEqual(stats['by_weekday']['Monday'], 3)
+        self.assertEqual(stats['by_status'], {'scheduled': 2, 'cancelled': 1, 'completed': 3})
+        self.assertEqual(stats['by_doctor']['d1'], {'total': 5, 'by_status': {'scheduled': 2, 'completed': 3}})
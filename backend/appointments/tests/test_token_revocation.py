@@ -0,0 +1,99 @@
+from datetime import datetime, timedelta
+from unittest import mock
+
+import jwt
+from django.test import SimpleTestCase, override_settings
+
+from .. import mongo_auth
+from ..mongo_auth import (
+    REFRESH_TOKEN, TokenUser, decode_token, generate_refresh_token, generate_token, get_user_from_token,
+    refresh_access_token, revoke_token,
+)
+from ..token_revocation import TokenRevocationList
+from .fakes import FakeCollection
+
+def revocation_list(entries=()):
+    revocations = TokenRevocationList(sync_interval=3600, sync_overlap=60)
+    collection = FakeCollection(entries)
+    collection.update_one = mock.Mock()
+    revocations._collection = lambda: collection
+    return revocations, collection
+
+class TokenRevocationListTests(SimpleTestCase):
+    def test_local_revocations_apply_at_once(self):
+        revocations, collection = revocation_list()
+        revocations.revoke_token('j1', datetime.utcnow() + timedelta(minutes=5))
+        revocations.revoke_user('u1', 3, datetime.utcnow() + timedelta(days=7))
+        self.assertTrue(revocations.is_revoked({'jti': 'j1', 'user_id': 'u2'}))
+        self.assertTrue(revocations.is_revoked({'jti': 'j2', 'user_id': 'u1', 'pv': 2}))
+        self.assertFalse(revocations.is_revoked({'jti': 'j2', 'user_id': 'u1', 'pv': 3}))
+        self.assertEqual(collection.update_one.call_count, 2)
+
+    def test_sync_reaches_back_by_the_overlap(self):
+        now = datetime.utcnow()
+        revocations, collection = revocation_list([
+            {'kind': 'jti', 'jti': 'j1', 'expires_at': now + timedelta(minutes=5), 'updated_at': now},
+            {'kind': 'user', 'user_id': 'u1', 'pv': 2, 'expires_at': now + timedelta(days=7), 'updated_at': now},
+        ])
+        revocations.sync(force=True)
+        self.assertIn('expires_at', collection.queries[0])
+        self.assertTrue(revocations.is_revoked({'jti': 'j1'}))
+        self.assertTrue(revocations.is_revoked({'user_id': 'u1', 'pv': 1}))
+
+        synced_until = revocations._synced_until
+        revocations.sync(force=True)
+        self.assertEqual(collection.queries[1], {'updated_at': {'$gte': synced_until - timedelta(seconds=60)}})
+
+    @override_settings(MONGO_ACCESS_TOKEN_LIFETIME=900)
+    def test_expired_entries_are_dropped(self):
+        revocations, _ = revocation_list()
+        long_ago = datetime.utcnow() - timedelta(hours=1)
+        revocations._jtis['j1'] = long_ago
+        revocations._user_versions['u1'] = (2, long_ago)
+        revocations._revoke_user_locally('u2', 1, datetime.utcnow())
+        revocations.sync(force=True)
+        self.assertEqual(revocations.stats()['revoked_tokens'], 0)
+        self.assertEqual(list(revocations._user_versions), ['u2'])
+
+@override_settings(JWT_SECRET_KEY='test-secret-at-least-thirty-two-bytes')
+class SelfContainedTokenTests(SimpleTestCase):
+    user = {'id': 'u1', 'email': 'ann@example.com', 'role': 'doctor', 'permissions_version': 2}
+
+    def setUp(self):
+        self.revocations, _ = revocation_list()
+        self.db = mock.MagicMock()
+        for target, value in (('revocation_list', self.revocations), ('get_mongodb_database', lambda: self.db)):
+            patcher = mock.patch.object(mongo_auth, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_access_token_resolves_without_a_lookup(self):
+        user = get_user_from_token(generate_token(self.user, doctor_id='d1'))
+        self.assertIsInstance(user, TokenUser)
+        self.assertEqual((user['id'], user['role'], user.claims['doctor_id'], user.claims['pv']), ('u1', 'doctor', 'd1', 2))
+        self.db.users.find_one.assert_not_called()
+
+    def test_token_types_are_not_interchangeable(self):
+        refresh_token = generate_refresh_token(self.user, doctor_id='d1')
+        self.assertIsNone(get_user_from_token(refresh_token))
+        self.assertIsNone(decode_token(generate_token(self.user, doctor_id='d1'), REFRESH_TOKEN))
+        self.assertIsNone(get_user_from_token(jwt.encode({'type': 'access', 'user_id': 'u1'}, 'wrong-secret-at-least-thirty-two-bytes')))
+
+    def test_revoked_token(self):
+        token = generate_token(self.user, doctor_id='d1')
+        revoke_token(decode_token(token))
+        self.assertIsNone(get_user_from_token(token))
+
+    def test_refresh_checks_the_permissions_version(self):
+        refresh_token = generate_refresh_token(self.user, doctor_id='d1')
+        self.db.users.find_one.return_value = {**self.user, 'permissions_version': 3}
+        self.assertIsNone(refresh_access_token(refresh_token))
+
+        self.db.users.find_one.return_value = {**self.user, 'is_active': False}
+        self.assertIsNone(refresh_access_token(refresh_token))
+
+        self.db.users.find_one.return_value = dict(self.user)
+        self.db.doctors.find_one.return_value = {'id': 'd2'}
+        refreshed = refresh_access_token(refresh_token)
+        # Profile ids are looked up again, not copied from the refresh token
+        self.assertEqual(decode_token(refreshed['token'])['doctor_id'], 'd2')
@@ -0,0 +1,57 @@
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from ..mongo_auth import TokenUserCache
+
+class TokenUserCacheTests(SimpleTestCase):
+    def test_hit_returns_a_copy(self):
+        cache = TokenUserCache()
+        cache.set('u1', None, {'id': 'u1', 'password': 'hash'})
+        user = cache.get('u1', None)
+        user.pop('password')
+        self.assertEqual(cache.get('u1', None), {'id': 'u1', 'password': 'hash'})
+        self.assertEqual((cache.hits, cache.misses), (2, 0))
+
+    def test_entries_are_keyed_per_token(self):
+        cache = TokenUserCache()
+        exp = time.time() + 600
+        cache.set('u1', exp, {'id': 'u1'})
+        self.assertIsNone(cache.get('u1', exp + 1))
+        self.assertEqual(cache.get('u1', exp), {'id': 'u1'})
+
+    def test_expiry_never_outlives_the_token(self):
+        cache = TokenUserCache(ttl=60)
+        cache.set('u1', time.time() - 1, {'id': 'u1'})
+        self.assertEqual(cache.stats()['size'], 0)
+
+        exp = time.time() + 5
+        cache.set('u1', exp, {'id': 'u1'})
+        with mock.patch('appointments.mongo_auth.time.monotonic', return_value=time.monotonic() + 10):
+            self.assertIsNone(cache.get('u1', exp))
+        self.assertEqual(cache.stats()['size'], 0)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = TokenUserCache(max_size=2)
+        cache.set('u1', None, {'id': 'u1'})
+        cache.set('u2', None, {'id': 'u2'})
+        cache.get('u1', None)
+        cache.set('u3', None, {'id': 'u3'})
+        self.assertIsNone(cache.get('u2', None))
+        self.assertIsNotNone(cache.get('u1', None))
+        self.assertIsNotNone(cache.get('u3', None))
+
+    def test_invalidate_drops_every_token_of_the_user(self):
+        cache = TokenUserCache()
+        cache.set('u1', time.time() + 600, {'id': 'u1'})
+        cache.set('u1', time.time() + 900, {'id': 'u1'})
+        cache.set('u2', None, {'id': 'u2'})
+        cache.invalidate('u1')
+        self.assertEqual(cache.stats()['size'], 1)
+        self.assertEqual(cache.invalidations, 2)
+
+    def test_disabled_cache_stores_nothing(self):
+        cache = TokenUserCache(max_size=0)
+        cache.set('u1', None, {'id': 'u1'})
+        self.assertIsNone(cache.get('u1', None))
@@ -0,0 +1,54 @@
+from collections import defaultdict
+from unittest import mock
+
+from django.test import SimpleTestCase
+from pymongo import UpdateOne
+
+from .. import write_behind
+from ..write_behind import WriteBehindBuffer
+
+@mock.patch.object(WriteBehindBuffer, '_ensure_started')
+class WriteBehindBufferTests(SimpleTestCase):
+    def setUp(self):
+        # One mock collection per name
+        self.db = defaultdict(mock.Mock)
+        patcher = mock.patch.object(write_behind, 'get_mongodb_database', return_value=self.db)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_writes_to_a_document_are_coalesced(self, _):
+        buffer = WriteBehindBuffer(flush_interval=60, max_pending=100)
+        buffer.set('users', {'id': 'u1'}, {'last_login': 1})
+        buffer.set('users', {'id': 'u1'}, {'last_login': 2, 'login_count': 5})
+        buffer.set('users', {'id': 'u2'}, {'last_login': 3})
+        buffer.set('notifications', {'id': 'n1'}, {'email_sent': True})
+
+        self.assertEqual(buffer.flush(), 3)
+        self.db['users'].bulk_write.assert_called_once_with([
+            UpdateOne({'id': 'u1'}, {'$set': {'last_login': 2, 'login_count': 5}}),
+            UpdateOne({'id': 'u2'}, {'$set': {'last_login': 3}}),
+        ], ordered=False)
+        self.db['notifications'].bulk_write.assert_called_once_with(
+            [UpdateOne({'id': 'n1'}, {'$set': {'email_sent': True}})], ordered=False,
+        )
+        stats = buffer.stats()
+        self.assertEqual((stats['queued'], stats['coalesced'], stats['written'], stats['pending']), (4, 1, 3, 0))
+
+    def test_nothing_pending(self, _):
+        self.assertEqual(WriteBehindBuffer().flush(), 0)
+        self.assertEqual(self.db, {})
+
+    def test_a_full_buffer_wakes_the_flusher(self, _):
+        buffer = WriteBehindBuffer(max_pending=2)
+        buffer.set('users', {'id': 'u1'}, {'last_login': 1})
+        self.assertFalse(buffer._wakeup.is_set())
+        buffer.set('users', {'id': 'u2'}, {'last_login': 1})
+        self.assertTrue(buffer._wakeup.is_set())
+
+    def test_failed_collection_does_not_stop_the_others(self, _):
+        self.db['users'].bulk_write.side_effect = ConnectionError('down')
+        buffer = WriteBehindBuffer()
+        buffer.set('users', {'id': 'u1'}, {'last_login': 1})
+        buffer.set('notifications', {'id': 'n1'}, {'email_sent': True})
+        self.assertEqual(buffer.flush(), 1)
+        self.assertEqual(buffer.stats()['errors'], 1)
@@ -0,0 +1,174 @@
+# appointments/token_revocation.py
+"""
+Revocation list for self-contained access and refresh tokens.
+
+Tokens are checked against an in-memory copy of the ``token_revocations``
+collection, so revocation costs no MongoDB round-trip per request. The copy
+is refreshed incrementally (only entries changed since the last sync) at
+most every TOKEN_REVOCATION_SYNC_INTERVAL seconds, which bounds how long a
+token revoked in another worker process stays usable. Revocations made in
+this process apply immediately.
+
+Each sync re-reads the last TOKEN_REVOCATION_SYNC_OVERLAP seconds as well,
+so an entry stamped by a worker whose clock is behind, or committed after
+the previous sync's query ran, is still picked up. Entries only ever
+revoke more (a jti is added, a user's version only goes up), so reading
+one twice is harmless.
+
+The in-memory copy of a user entry is dropped once every access token it
+could match has expired (the access token lifetime after the revocation,
+plus the overlap). Refresh tokens don't need it by then:
+refresh_access_token checks the permissions version on the user document.
+
+Two kinds of entries are kept, each removed by a TTL index once every token
+it could match has expired:
+    jti   One token (e.g. logout)
+    user  Every token of a user issued with a permissions version below
+          ``pv`` (role change, deactivation, deletion)
+
+Times are naive UTC, like the tokens' exp claims.
+
+Settings (all optional):
+    TOKEN_REVOCATION_SYNC_INTERVAL  Seconds between syncs (default 15)
+    TOKEN_REVOCATION_SYNC_OVERLAP   Seconds each sync reaches back before the last one (default 60)
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from pymongo import ASCENDING
+
+from .mongo_utils import get_mongodb_database
+
+REVOCATION_COLLECTION = 'token_revocations'
+
+class TokenRevocationList:
+    """In-memory view of the token_revocations collection"""
+    def __init__(self, sync_interval=None, sync_overlap=None):
+        self.sync_interval = sync_interval if sync_interval is not None else getattr(settings, 'TOKEN_REVOCATION_SYNC_INTERVAL', 15)
+        self.sync_overlap = timedelta(seconds=(
+            sync_overlap if sync_overlap is not None else getattr(settings, 'TOKEN_REVOCATION_SYNC_OVERLAP', 60)
+        ))
+        self._jtis = {}
+        # {user_id: (permissions version, when it was revoked)}
+        self._user_versions = {}
+        self._synced_until = None
+        self._next_sync = 0
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._stats = {'checks': 0, 'revoked': 0, 'syncs': 0, 'sync_errors': 0}
+
+    def _collection(self):
+        return get_mongodb_database()[REVOCATION_COLLECTION]
+
+    def _revoke_user_locally(self, user_id, permissions_version, revoked_at):
+        current = self._user_versions.get(user_id)
+        if current:
+            permissions_version = max(permissions_version, current[0])
+            revoked_at = max(revoked_at, current[1])
+        self._user_versions[user_id] = (permissions_version, revoked_at)
+
+    def _apply(self, entry):
+        if entry.get('kind') == 'jti':
+            self._jtis[entry['jti']] = entry['expires_at']
+        elif entry.get('kind') == 'user':
+            self._revoke_user_locally(entry['user_id'], entry['pv'], entry['updated_at'])
+
+    def _user_retention(self):
+        # Imported here: mongo_auth imports this module
+        from .mongo_auth import access_token_lifetime
+        return access_token_lifetime() + self.sync_overlap
+
+    def sync(self, force=False):
+        """Pull entries changed since the last sync from MongoDB"""
+        if not force and time.monotonic() < self._next_sync:
+            return
+        # One thread syncs; the others carry on with the current copy
+        if not self._sync_lock.acquire(blocking=force):
+            return
+        try:
+            if not force and time.monotonic() < self._next_sync:
+                return
+            started = datetime.utcnow()
+            if self._synced_until:
+                query = {'updated_at': {'$gte': self._synced_until - self.sync_overlap}}
+            else:
+                query = {'expires_at': {'$gt': started}}
+            try:
+                entries = list(self._collection().find(query, {'_id': 0}).sort('updated_at', ASCENDING))
+            except Exception as e:
+                with self._lock:
+                    self._stats['sync_errors'] += 1
+                print(f"Token revocation sync error: {str(e)}")
+                entries = None
+
+            with self._lock:
+                if entries is not None:
+                    for entry in entries:
+                        self._apply(entry)
+                    self._synced_until = started
+                    self._stats['syncs'] += 1
+                # Forget revoked tokens that have expired anyway
+                self._jtis = {jti: expires for jti, expires in self._jtis.items() if expires > started}
+                retained_since = started - self._user_retention()
+                self._user_versions = {
+                    user_id: version for user_id, version in self._user_versions.items()
+                    if version[1] >= retained_since
+                }
+                self._next_sync = time.monotonic() + self.sync_interval
+        finally:
+            self._sync_lock.release()
+
+    def is_revoked(self, claims):
+        """True if the token with these (already verified) claims was revoked"""
+        self.sync()
+        with self._lock:
+            self._stats['checks'] += 1
+            revoked = (
+                claims.get('jti') in self._jtis
+                or claims.get('pv', 0) < self._user_versions.get(claims.get('user_id'), (0, None))[0]
+            )
+            if revoked:
+                self._stats['revoked'] += 1
+        return revoked
+
+    def revoke_token(self, jti, expires_at):
+        """Revoke one token until it expires"""
+        now = datetime.utcnow()
+        with self._lock:
+            self._jtis[jti] = expires_at
+        self._collection().update_one(
+            {'_id': f'jti:{jti}'},
+            {'$set': {'kind': 'jti', 'jti': jti, 'expires_at': expires_at, 'updated_at': now}},
+            upsert=True
+        )
+
+    def revoke_user(self, user_id, permissions_version, expires_at):
+        """Revoke a user's tokens issued with a permissions version below this one"""
+        now = datetime.utcnow()
+        with self._lock:
+            self._revoke_user_locally(user_id, permissions_version, now)
+        self._collection().update_one(
+            {'_id': f'user:{user_id}'},
+            {
+                '$max': {'pv': permissions_version},
+                '$set': {'kind': 'user', 'user_id': user_id, 'expires_at': expires_at, 'updated_at': now}
+            },
+            upsert=True
+        )
+
+    def stats(self):
+        with self._lock:
+            return {
+                'revoked_tokens': len(self._jtis),
+                'revoked_users': len(self._user_versions),
+                'sync_interval': self.sync_interval,
+                'last_sync': self._synced_until,
+                **self._stats,
+            }
+
+revocation_list = TokenRevocationList()
+
+def get_revocation_stats():
+    return revocation_list.stats()
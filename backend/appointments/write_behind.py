@@ -0,0 +1,129 @@
+# appointments/write_behind.py
+"""
+Write-behind buffer for non-critical field updates.
+
+Some writes don't need to finish before a response is sent: a user's
+last_login, a notification's email_sent flag. Instead of a round-trip per
+write they are queued here, coalesced per document (the latest value of
+each field wins) and written periodically with one unordered bulk_write
+per collection. Pending writes are flushed when the process exits.
+
+Settings (all optional):
+    WRITE_BEHIND_FLUSH_INTERVAL  Seconds between flushes (default 2)
+    WRITE_BEHIND_MAX_PENDING     Documents pending before an early flush (default 1000)
+"""
+import atexit
+import os
+import threading
+import time
+from datetime import datetime
+
+from django.conf import settings
+from pymongo import UpdateOne
+
+from .mongo_utils import get_mongodb_database
+
+class WriteBehindBuffer:
+    """Coalesces $set updates per document and flushes them in bulk"""
+    def __init__(self, flush_interval=None, max_pending=None):
+        self.flush_interval = flush_interval or getattr(settings, 'WRITE_BEHIND_FLUSH_INTERVAL', 2)
+        self.max_pending = max_pending or getattr(settings, 'WRITE_BEHIND_MAX_PENDING', 1000)
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._stats = {'queued': 0, 'coalesced': 0, 'written': 0, 'flushes': 0, 'errors': 0, 'last_flush_ms': 0}
+
+    def set(self, collection, match, fields):
+        """
+        Queue {'$set': fields} on the document matching `match` (an exact
+        match such as {'id': user_id}) in `collection`.
+        """
+        key = (collection, tuple(sorted(match.items())))
+        with self._lock:
+            self._ensure_started()
+            self._stats['queued'] += 1
+            if key in self._pending:
+                self._stats['coalesced'] += 1
+                self._pending[key].update(fields)
+            else:
+                self._pending[key] = dict(fields)
+            pending = len(self._pending)
+        if pending >= self.max_pending:
+            self._wakeup.set()
+
+    def _ensure_started(self):
+        # Threads don't survive a fork, so each worker process starts its own
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, name='write-behind')
+        self._thread.daemon = True  # Allow the thread to exit when the main program exits
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[{datetime.now()}] Error in write-behind flush: {str(e)}")
+
+    def flush(self):
+        """Write everything pending now; returns the number of documents written"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        started = time.perf_counter()
+        by_collection = {}
+        for (collection, match_items), fields in pending.items():
+            by_collection.setdefault(collection, []).append(UpdateOne(dict(match_items), {'$set': fields}))
+
+        db = get_mongodb_database()
+        written = errors = 0
+        for collection, operations in by_collection.items():
+            try:
+                db[collection].bulk_write(operations, ordered=False)
+                written += len(operations)
+            except Exception as e:
+                # These writes are best effort by design; log and move on
+                errors += 1
+                print(f"Write-behind flush error on {collection}: {str(e)}")
+
+        with self._lock:
+            self._stats['written'] += written
+            self._stats['errors'] += errors
+            self._stats['flushes'] += 1
+            self._stats['last_flush_ms'] = round((time.perf_counter() - started) * 1000, 2)
+        return written
+
+    def stats(self):
+        with self._lock:
+            return {'pending': len(self._pending), 'flush_interval': self.flush_interval, **self._stats}
+
+write_behind = WriteBehindBuffer()
+
+def _reset_after_fork():
+    # The child gets a fresh lock and no copy of the parent's pending writes
+    write_behind._lock = threading.Lock()
+    write_behind._wakeup = threading.Event()
+    write_behind._pending = {}
+    write_behind._thread = None
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+def _flush_on_exit():
+    try:
+        write_behind.flush()
+    except Exception as e:
+        print(f"Write-behind flush on shutdown failed: {str(e)}")
+
+atexit.register(_flush_on_exit)
+
+def get_write_behind_stats():
+    return write_behind.stats()
@@ -31,7 +31,7 @@ import { Input } from "@/components/ui/input"
 import { Label } from "@/components/ui/label"
 import { useToast } from "@/hooks/use-toast"
 import { ENDPOINTS, API_BASE_URL } from "@/config/api"
-import { fetchWithAuth } from "@/utils/api"
+import { fetchAllPages, fetchWithAuth } from "@/utils/api"
 import { ScrollArea } from "@/components/ui/scroll-area"
 import { Loader2, Search, CalendarIcon, Clock, AlertCircle } from "lucide-react"
 import { RequireAuth } from "@/components/auth/require-auth"
@@ -92,7 +92,7 @@ export default function AdminAppointmentsPage() {
       console.log("Fetching all appointments for admin...")
 
       // Use fetchWithAuth helper instead of direct fetch
-      const response = await fetchWithAuth(`${API_BASE_URL}/api/api/appointments/?admin=true`)
+      const response = await fetchAllPages(`${API_BASE_URL}/api/api/appointments/?admin=true`)
 
       console.log("Response status:", response.status)
 
@@ -275,9 +275,8 @@ export default function AdminAppointmentsPage() {
                     for (const endpoint of endpoints) {
                       try {
                         console.log(`Trying endpoint: ${endpoint}`)
-                        const response = await fetch(endpoint, {
+                        const response = await fetchWithAuth(endpoint, {
                           headers: {
-                            Authorization: `Token ${token}`,
                             "Content-Type": "application/json",
                           },
                         })
@@ -16,6 +16,7 @@ import { Loader2, ArrowLeft, AlertCircle } from "lucide-react"
 import Link from "next/link"
 import { ScrollArea } from "@/components/ui/scroll-area"
 import { Alert, AlertDescription } from "@/components/ui/alert"
+import { fetchWithAuth } from "@/lib/auth"
 
 // Form validation schema
 const doctorSchema = z.object({
@@ -141,6 +142,7 @@ export default function CreateDoctorPage() {
         console.error("Error parsing user data:", e)
         localStorage.removeItem("user")
         localStorage.removeItem("token")
+        localStorage.removeItem("refresh_token")
         router.push("/login")
       }
     }
@@ -200,11 +202,10 @@ export default function CreateDoctorPage() {
       console.log("Doctor data:", doctorData)
 
       // Send request to the doctors endpoint
-      const response = await fetch(`${apiBaseUrl}/api/api/doctors/`, {
+      const response = await fetchWithAuth(`${apiBaseUrl}/api/api/doctors/`, {
         method: "POST",
         headers: {
           "Content-Type": "application/json",
-          Authorization: `Bearer ${token}`,
         },
         body: JSON.stringify(doctorData),
       })
@@ -279,6 +280,7 @@ export default function CreateDoctorPage() {
   // Function to handle logout and redirect to login
   const handleLogout = () => {
     localStorage.removeItem("token")
+    localStorage.removeItem("refresh_token")
     localStorage.removeItem("user")
     router.push("/login")
   }
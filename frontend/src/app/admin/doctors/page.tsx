@@ -31,7 +31,7 @@ import {
 } from "@/components/ui/alert-dialog"
 import { useToast } from "@/hooks/use-toast"
 import { ENDPOINTS } from "@/config/api"
-import { fetchWithAuth } from "@/utils/api"
+import { fetchAllPages, fetchWithAuth } from "@/utils/api"
 import Link from "next/link"
 import { Plus, MoreHorizontal, Loader2, Search, RefreshCw } from "lucide-react"
 import { ScrollArea } from "@/components/ui/scroll-area"
@@ -103,7 +103,7 @@ export default function DoctorsManagementPage() {
 
   async function fetchDoctors() {
     try {
-      const response = await fetchWithAuth(ENDPOINTS.doctors())
+      const response = await fetchAllPages(ENDPOINTS.doctors())
       if (!response.ok) throw new Error("Failed to fetch doctors")
       const data = await response.json()
       setDoctors(data)
@@ -31,7 +31,7 @@ import {
 } from "@/components/ui/alert-dialog"
 import { useToast } from "@/hooks/use-toast"
 import { ENDPOINTS } from "@/config/api"
-import { fetchWithAuth } from "@/utils/api"
+import { fetchAllPages, fetchWithAuth } from "@/utils/api"
 import { MoreHorizontal, Loader2, Search, UserPlus, RefreshCw, LinkIcon, AlertCircle } from "lucide-react"
 import { ScrollArea } from "@/components/ui/scroll-area"
 import { Alert } from "@/components/ui/alert"
@@ -144,7 +144,7 @@ export default function AdminPatientsPage() {
 
   async function fetchPatients() {
     try {
-      const response = await fetchWithAuth(ENDPOINTS.users())
+      const response = await fetchAllPages(ENDPOINTS.users())
       if (!response.ok) throw new Error("Failed to fetch patients")
       const data = await response.json()
       const patientUsers = data.filter((user: any) => user.role === "patient")
@@ -165,7 +165,7 @@ export default function AdminPatientsPage() {
     setLoadingUsers(true)
     try {
       // Fetch all users
-      const response = await fetchWithAuth(ENDPOINTS.users())
+      const response = await fetchAllPages(ENDPOINTS.users())
       if (!response.ok) throw new Error("Failed to fetch users")
       const allUsers = await response.json()
 
@@ -397,11 +397,10 @@ export default function AdminPatientsPage() {
 
       // Make direct API call to create patient profile
       const baseUrl = process.env.NEXT_PUBLIC_API_URL || "http://localhost:8000"
-      const response = await fetch(`${baseUrl}/api/api/patients/`, {
+      const response = await fetchWithAuth(`${baseUrl}/api/api/patients/`, {
         method: "POST",
         headers: {
           "Content-Type": "application/json",
-          Authorization: `Token ${token}`,
         },
         body: JSON.stringify(patientData),
       })
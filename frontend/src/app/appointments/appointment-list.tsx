@@ -47,6 +47,7 @@ import {
   Stethoscope,
 } from "lucide-react"
 import { cn } from "@/lib/utils"
+import { fetchAllPages, fetchWithAuth } from "@/lib/auth"
 
 // Define interfaces for our data types
 interface Appointment {
@@ -132,9 +133,8 @@ export function AppointmentList() {
       }
 
       // Direct fetch with Bearer token for MongoDB
-      const response = await fetch(ENDPOINTS.appointments(), {
+      const response = await fetchAllPages(ENDPOINTS.appointments(), {
         headers: {
-          Authorization: `Bearer ${token}`, // Changed from Token to Bearer for MongoDB
           "Content-Type": "application/json",
         },
         credentials: "include", // Include cookies for cross-origin requests
@@ -193,9 +193,8 @@ export function AppointmentList() {
 
     for (const patientId of patientIds) {
       try {
-        const response = await fetch(`${ENDPOINTS.patients()}${patientId}`, {
+        const response = await fetchWithAuth(`${ENDPOINTS.patients()}${patientId}`, {
           headers: {
-            Authorization: `Bearer ${token}`,
             "Content-Type": "application/json",
           },
         })
@@ -222,10 +221,9 @@ export function AppointmentList() {
         throw new Error("No authentication token found")
       }
 
-      const response = await fetch(`${ENDPOINTS.appointments(id)}`, {
+      const response = await fetchWithAuth(`${ENDPOINTS.appointments(id)}`, {
         method: "DELETE",
         headers: {
-          Authorization: `Bearer ${token}`, // Changed from Token to Bearer for MongoDB
           "Content-Type": "application/json",
         },
         credentials: "include", // Include cookies for cross-origin requests
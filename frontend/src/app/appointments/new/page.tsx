@@ -13,7 +13,7 @@ import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from "@
 import { Calendar } from "@/components/ui/calendar"
 import { cn } from "@/lib/utils"
 import { format, isSameDay, addMinutes } from "date-fns"
-import { fetchWithAuth } from "@/utils/api"
+import { fetchAllPages, fetchWithAuth } from "@/utils/api"
 import { ENDPOINTS } from "@/config/api"
 import {
   CalendarIcon,
@@ -185,7 +185,7 @@ export default function NewAppointment() {
 
     try {
       debugLog += `User ID: ${user.id}\n`
-      const response = await fetchWithAuth(`${ENDPOINTS.patients()}?user_id=${user.id}`)
+      const response = await fetchAllPages(`${ENDPOINTS.patients()}?user_id=${user.id}`)
       debugLog += `Response status: ${response.status}\n`
 
       if (response.ok) {
@@ -301,7 +301,7 @@ export default function NewAppointment() {
     let debugLog = "Fetching doctors...\n"
 
     try {
-      const response = await fetchWithAuth(ENDPOINTS.doctors())
+      const response = await fetchAllPages(ENDPOINTS.doctors())
       debugLog += `Response status: ${response.status}\n`
 
       const data = await response.json()
@@ -369,9 +369,8 @@ export default function NewAppointment() {
       debugLog += `Availability URL: ${availabilityUrl}\n`
 
       // Use direct fetch with explicit headers for debugging
-      const availabilityResponse = await fetch(availabilityUrl, {
+      const availabilityResponse = await fetchWithAuth(availabilityUrl, {
         headers: {
-          Authorization: `Bearer ${token}`,
           "Content-Type": "application/json",
         },
       })
@@ -396,9 +395,8 @@ export default function NewAppointment() {
       const exceptionsUrl = ENDPOINTS.doctorExceptions(doctorId)
       debugLog += `Exceptions URL: ${exceptionsUrl}\n`
 
-      const exceptionsResponse = await fetch(exceptionsUrl, {
+      const exceptionsResponse = await fetchAllPages(exceptionsUrl, {
         headers: {
-          Authorization: `Bearer ${token}`,
           "Content-Type": "application/json",
         },
       })
@@ -587,7 +585,7 @@ export default function NewAppointment() {
 
     try {
       // Use the UUID format for the doctor ID
-      const response = await fetchWithAuth(`${ENDPOINTS.appointments()}?doctor=${doctorId}`)
+      const response = await fetchAllPages(`${ENDPOINTS.appointments()}?doctor=${doctorId}`)
       debugLog += `Response status: ${response.status}\n`
 
       if (!response.ok) throw new Error("Failed to fetch doctor appointments")
@@ -1015,7 +1013,7 @@ export default function NewAppointment() {
         debugLog += "Updating patient profile...\n"
 
         // Check if patient exists
-        const patientResponse = await fetchWithAuth(`${ENDPOINTS.patients()}?user_id=${user.id}`)
+        const patientResponse = await fetchAllPages(`${ENDPOINTS.patients()}?user_id=${user.id}`)
         const patients = await patientResponse.json()
         debugLog += `Found ${patients.length} patient records\n`
 
@@ -20,6 +20,7 @@ import { Alert, AlertDescription, AlertTitle } from "@/components/ui/alert"
 import { Badge } from "@/components/ui/badge"
 import { useToast } from "@/hooks/use-toast"
 import { API_BASE_URL } from "@/config/api"
+import { fetchWithAuth } from "@/lib/auth"
 
 export default function AppointmentsPage() {
   const { isAuthenticated, isLoading, user } = useAuth()
@@ -103,11 +104,7 @@ export default function AppointmentsPage() {
 
           console.log("Fetching patient record from:", patientUrl)
 
-          const response = await fetch(patientUrl, {
-            headers: {
-              Authorization: `Bearer ${token}`,
-            },
-          })
+          const response = await fetchWithAuth(patientUrl)
 
           debugLog += `Response status: ${response.status}\n`
 
@@ -173,11 +170,10 @@ export default function AppointmentsPage() {
               address: userData.address || "",
             }
 
-            const createResponse = await fetch(createUrl, {
+            const createResponse = await fetchWithAuth(createUrl, {
               method: "POST",
               headers: {
                 "Content-Type": "application/json",
-                Authorization: `Bearer ${token}`,
               },
               body: JSON.stringify(createData),
             })
@@ -284,11 +280,10 @@ export default function AppointmentsPage() {
       console.log("Updating patient medical info:", medicalData)
       console.log("Sending to URL:", updateUrl)
 
-      const response = await fetch(updateUrl, {
+      const response = await fetchWithAuth(updateUrl, {
         method: "PATCH", // Use PATCH to update existing record
         headers: {
           "Content-Type": "application/json",
-          Authorization: `Bearer ${token}`,
         },
         body: JSON.stringify(medicalData),
       })
@@ -8,7 +8,7 @@ import { Button } from "@/components/ui/button"
 import { Badge } from "@/components/ui/badge"
 import { RequireAuth } from "@/components/auth/require-auth"
 import { useToast } from "@/hooks/use-toast"
-import { fetchWithAuth } from "@/utils/api"
+import { fetchAllPages, fetchWithAuth } from "@/utils/api"
 import { format, isSameDay, parseISO } from "date-fns"
 import {
   Dialog,
@@ -128,7 +128,7 @@ export default function DoctorAppointmentsPage() {
         const profileUrl = `${apiBaseUrl}/api/api/doctors/`
         console.log("Fetching doctors list from:", profileUrl)
 
-        const response = await fetchWithAuth(profileUrl)
+        const response = await fetchAllPages(profileUrl)
 
         if (!response.ok) {
           throw new Error(`Failed to fetch doctors list: ${response.status}`)
@@ -184,7 +184,7 @@ export default function DoctorAppointmentsPage() {
       // Collect debug info
       let debugText = `Appointments request to: ${url}\n`
 
-      const response = await fetchWithAuth(url)
+      const response = await fetchAllPages(url)
       debugText += `Response status: ${response.status}\n`
 
       if (!response.ok) {
@@ -350,11 +350,10 @@ export default function DoctorAppointmentsPage() {
       }
 
       // Use our custom API route with enhanced error handling
-      const response = await fetch("/api/appointments/update-status", {
+      const response = await fetchWithAuth("/api/appointments/update-status", {
         method: "POST",
         headers: {
           "Content-Type": "application/json",
-          Authorization: `Token ${token}`,
         },
         body: JSON.stringify({
           appointmentId,
@@ -10,7 +10,7 @@ import { Label } from "@/components/ui/label"
 import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from "@/components/ui/select"
 import { Textarea } from "@/components/ui/textarea"
 import { useToast } from "@/hooks/use-toast"
-import { fetchWithAuth } from "@/utils/api"
+import { fetchAllPages, fetchWithAuth } from "@/utils/api"
 import { format } from "date-fns"
 import { Loader2, AlertCircle, RefreshCw, ArrowLeft, Clock, CalendarDays, X } from "lucide-react"
 import { Alert, AlertDescription } from "@/components/ui/alert"
@@ -111,7 +111,7 @@ export default function DoctorAvailabilityPage() {
         const profileUrl = `${apiBaseUrl}/api/api/doctors/`
         console.log("Fetching doctors list from:", profileUrl)
 
-        const response = await fetchWithAuth(profileUrl)
+        const response = await fetchAllPages(profileUrl)
 
         if (!response.ok) {
           throw new Error(`Failed to fetch doctors list: ${response.status}`)
@@ -251,7 +251,7 @@ export default function DoctorAvailabilityPage() {
       const exceptionsUrl = `${apiBaseUrl}/api/api/doctors/${id}/exceptions/`
       console.log("Fetching exceptions from:", exceptionsUrl)
 
-      const response = await fetchWithAuth(exceptionsUrl)
+      const response = await fetchAllPages(exceptionsUrl)
       if (!response.ok) {
         const errorText = await response.text()
         console.error("Error response:", errorText)
@@ -10,7 +10,7 @@ import { Button } from "@/components/ui/button"
 import { useRouter } from "next/navigation"
 import { RequireAuth } from "@/components/auth/require-auth"
 import { useToast } from "@/hooks/use-toast"
-import { fetchWithAuth } from "@/utils/api"
+import { fetchAllPages } from "@/utils/api"
 
 interface Appointment {
   id: number
@@ -68,7 +68,7 @@ export default function DoctorDashboard() {
         const profileUrl = `${apiBaseUrl}/api/api/doctors/`
         console.log("Fetching doctors list from:", profileUrl)
 
-        const response = await fetchWithAuth(profileUrl)
+        const response = await fetchAllPages(profileUrl)
 
         if (!response.ok) {
           throw new Error(`Failed to fetch doctors list: ${response.status}`)
@@ -127,7 +127,7 @@ export default function DoctorDashboard() {
       const appointmentsUrl = `${apiBaseUrl}/api/api/appointments/?doctor=${id}`
       console.log("Fetching appointments from:", appointmentsUrl)
 
-      const appointmentsResponse = await fetchWithAuth(appointmentsUrl)
+      const appointmentsResponse = await fetchAllPages(appointmentsUrl)
 
       if (!appointmentsResponse.ok) {
         throw new Error(`Failed to fetch appointments: ${appointmentsResponse.status}`)
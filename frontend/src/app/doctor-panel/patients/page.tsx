@@ -8,7 +8,7 @@ import { Button } from "@/components/ui/button"
 import { Input } from "@/components/ui/input"
 import { RequireAuth } from "@/components/auth/require-auth"
 import { useToast } from "@/hooks/use-toast"
-import { fetchWithAuth } from "@/utils/api"
+import { fetchAllPages, fetchWithAuth } from "@/utils/api"
 import { format } from "date-fns"
 import {
   Dialog,
@@ -121,7 +121,7 @@ export default function DoctorPatientsPage() {
         const profileUrl = `${apiBaseUrl}/api/api/doctors/`
         console.log("Fetching doctors list from:", profileUrl)
 
-        const response = await fetchWithAuth(profileUrl)
+        const response = await fetchAllPages(profileUrl)
 
         if (!response.ok) {
           throw new Error(`Failed to fetch doctors list: ${response.status}`)
@@ -174,7 +174,7 @@ export default function DoctorPatientsPage() {
       const appointmentsUrl = `${apiBaseUrl}/api/api/appointments/?doctor=${doctorId}`
       console.log("Fetching appointments from:", appointmentsUrl)
 
-      const appointmentsResponse = await fetchWithAuth(appointmentsUrl)
+      const appointmentsResponse = await fetchAllPages(appointmentsUrl)
 
       if (!appointmentsResponse.ok) {
         throw new Error(`Failed to fetch appointments: ${appointmentsResponse.status}`)
@@ -290,7 +290,7 @@ export default function DoctorPatientsPage() {
         const url = `${apiBaseUrl}/api/api/appointments/?doctor=${doctorId}&patient=${patient.id}`
         console.log("Fetching patient appointments from:", url)
 
-        const response = await fetchWithAuth(url)
+        const response = await fetchAllPages(url)
 
         if (!response.ok) {
           throw new Error(`Failed to fetch patient appointments: ${response.status}`)
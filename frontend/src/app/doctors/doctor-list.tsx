@@ -4,7 +4,7 @@ import { useEffect, useState } from "react"
 import type { Doctor } from "@/types"
 import { ENDPOINTS } from "@/config/api"
 import { Table, TableBody, TableCell, TableHead, TableHeader, TableRow } from "@/components/ui/table"
-import { fetchWithAuth } from "@/utils/api"
+import { fetchAllPages } from "@/utils/api"
 import { useAuth } from "@/hooks/useAuth"
 
 export function DoctorList() {
@@ -20,7 +20,7 @@ export function DoctorList() {
 
   async function fetchDoctors() {
     try {
-      const response = await fetchWithAuth(ENDPOINTS.doctors())
+      const response = await fetchAllPages(ENDPOINTS.doctors())
       if (!response.ok) throw new Error("Failed to fetch doctors")
       const data = await response.json()
       setDoctors(data)
@@ -51,6 +51,7 @@ export default function LoginPage() {
       } catch (e) {
         // If parsing fails, clear invalid data
         localStorage.removeItem("token")
+        localStorage.removeItem("refresh_token")
         localStorage.removeItem("user")
       }
     }
@@ -141,6 +142,7 @@ export default function LoginPage() {
 
       // Store authentication data
       localStorage.setItem("token", data.token)
+      if (data.refresh_token) localStorage.setItem("refresh_token", data.refresh_token)
       localStorage.setItem("user", JSON.stringify(data.user))
       localStorage.setItem("justLoggedIn", "true")
 
@@ -16,6 +16,7 @@ import { X, Plus, AlertCircle, Loader2, CheckCircle2 } from "lucide-react"
 import { API_BASE_URL } from "@/config/api"
 import { useToast } from "@/hooks/use-toast"
 import { motion } from "framer-motion"
+import { fetchAllPages, fetchWithAuth } from "@/lib/auth"
 
 export default function MedicalInfoOnboarding() {
   const router = useRouter()
@@ -53,11 +54,7 @@ export default function MedicalInfoOnboarding() {
         const userData = JSON.parse(user)
         const userId = userData._id || userData.id
 
-        const response = await fetch(`${API_BASE_URL}/api/api/patients?user_id=${userId}`, {
-          headers: {
-            Authorization: `Bearer ${token}`,
-          },
-        })
+        const response = await fetchAllPages(`${API_BASE_URL}/api/api/patients?user_id=${userId}`)
 
         if (response.ok) {
           const patients = await response.json()
@@ -132,11 +129,10 @@ export default function MedicalInfoOnboarding() {
       }
 
       // Update patient record
-      const response = await fetch(`${API_BASE_URL}/api/api/patients/${patientId}`, {
+      const response = await fetchWithAuth(`${API_BASE_URL}/api/api/patients/${patientId}`, {
         method: "PATCH",
         headers: {
           "Content-Type": "application/json",
-          Authorization: `Bearer ${token}`,
         },
         body: JSON.stringify(medicalData),
       })
@@ -33,6 +33,7 @@ import {
   ShieldAlert,
 } from "lucide-react"
 import { API_BASE_URL } from "@/config/api"
+import { fetchAllPages } from "@/lib/auth"
 import { fetchWithAuth } from "@/utils/api-helpers"
 
 interface PatientProfile {
@@ -107,7 +108,7 @@ export default function PatientProfilePage() {
       }
 
       // First check if patient record exists by user_id
-      const response = await fetchWithAuth(`${API_BASE_URL}/api/api/patients/?user_id=${user.id}`)
+      const response = await fetchAllPages(`${API_BASE_URL}/api/api/patients/?user_id=${user.id}`, {}, fetchWithAuth)
 
       console.log("Patient lookup response status:", response.status)
 
@@ -262,11 +263,10 @@ export default function PatientProfilePage() {
       const url = `${API_BASE_URL}/api/api/patients/${profile.id}/`
       console.log("Sending PATCH request to:", url)
 
-      const response = await fetch(url, {
+      const response = await fetchWithAuth(url, {
         method: "PATCH",
         headers: {
           "Content-Type": "application/json",
-          Authorization: `Bearer ${token}`,
         },
         body: JSON.stringify(formattedData),
       })
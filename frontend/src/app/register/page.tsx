@@ -117,6 +117,7 @@ export default function RegisterPage() {
           console.log(`Received token: ${data.token.substring(0, 10)}...`)
 
           localStorage.setItem("token", data.token)
+          if (data.refresh_token) localStorage.setItem("refresh_token", data.refresh_token)
           localStorage.setItem("user", JSON.stringify(data.user))
           localStorage.setItem("justLoggedIn", "true")
 
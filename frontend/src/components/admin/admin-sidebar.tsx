@@ -93,6 +93,7 @@ export function AdminSidebar() {
   const handleLogout = () => {
     // Clear auth tokens
     localStorage.removeItem("token")
+    localStorage.removeItem("refresh_token")
     localStorage.removeItem("userName")
     localStorage.removeItem("userRole")
 
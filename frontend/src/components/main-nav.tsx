@@ -126,6 +126,7 @@ export function MainNav() {
         // Clear invalid data
         localStorage.removeItem("user")
         localStorage.removeItem("token")
+        localStorage.removeItem("refresh_token")
         setUserData(null)
       }
     }
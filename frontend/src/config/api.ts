@@ -20,6 +20,7 @@ export const ENDPOINTS = {
   patientRegister: `${API_BASE_URL}/api/api/register/patient/`,
   doctorRegister: `${API_BASE_URL}/api/api/register/doctor/`,
   validateToken: `${API_BASE_URL}/api/api/validate-token/`,
+  refreshToken: `${API_BASE_URL}/api/api/token/refresh/`,
   csrfToken: `${API_BASE_URL}/api/api/csrf/`,
   notifications: () => `${API_BASE_URL}/api/api/notifications`,
   // User endpoints
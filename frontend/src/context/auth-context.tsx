@@ -4,7 +4,7 @@ import { createContext, useContext, useState, useEffect, type ReactNode } from "
 import { useRouter, usePathname } from "next/navigation"
 import { ENDPOINTS } from "@/config/api"
 import type { User, LoginCredentials, RegisterData, AuthResponse } from "@/types"
-import { fetchApi } from "@/utils/api"
+import { fetchApi, fetchWithAuth } from "@/utils/api"
 import { useToast } from "@/hooks/use-toast"
 
 interface AuthContextType {
@@ -97,6 +97,7 @@ export function AuthProvider({ children }: { children: ReactNode }) {
         console.error("Failed to parse stored user:", parseError)
         localStorage.removeItem("user")
         localStorage.removeItem("token")
+        localStorage.removeItem("refresh_token")
         setIsAuthenticated(false)
         setUser(null)
         setIsLoading(false)
@@ -164,6 +165,7 @@ export function AuthProvider({ children }: { children: ReactNode }) {
 
       // IMPORTANT: Store authentication data in localStorage BEFORE updating state
       localStorage.setItem("token", data.token)
+      if (data.refresh_token) localStorage.setItem("refresh_token", data.refresh_token)
       localStorage.setItem("user", JSON.stringify(data.user))
       localStorage.setItem("justLoggedIn", "true")
 
@@ -209,17 +211,17 @@ export function AuthProvider({ children }: { children: ReactNode }) {
       const token = localStorage.getItem("token")
 
       if (token) {
-        await fetchApi(ENDPOINTS.logout, {
+        // Revokes the refresh token too, so it can't outlive the session
+        await fetchWithAuth(ENDPOINTS.logout, {
           method: "POST",
-          headers: {
-            Authorization: `Bearer ${token}`, // Updated to Bearer for MongoDB
-          },
+          body: JSON.stringify({ refresh_token: localStorage.getItem("refresh_token") }),
         })
       }
     } catch (error) {
       console.error("Logout error:", error)
     } finally {
       localStorage.removeItem("token")
+      localStorage.removeItem("refresh_token")
       localStorage.removeItem("user")
       localStorage.removeItem("intendedRole")
       localStorage.removeItem("justLoggedIn")
@@ -256,6 +258,7 @@ export function AuthProvider({ children }: { children: ReactNode }) {
       console.log("Registration success, received token and user data")
 
       localStorage.setItem("token", data.token)
+      if (data.refresh_token) localStorage.setItem("refresh_token", data.refresh_token)
       localStorage.setItem("user", JSON.stringify(data.user))
       localStorage.setItem("justLoggedIn", "true")
 
@@ -2,6 +2,7 @@
 
 import { useState, useEffect } from "react"
 import { ENDPOINTS } from "@/config/api"
+import { fetchWithAuth } from "@/lib/auth"
 import type { User, LoginCredentials, RegisterData, AuthResponse } from "@/types"
 import { useRouter } from "next/navigation"
 import { useToast } from "@/hooks/use-toast"
@@ -51,6 +52,7 @@ export function useAuth() {
         console.error("Failed to parse stored user:", parseError)
         localStorage.removeItem("user")
         localStorage.removeItem("token")
+        localStorage.removeItem("refresh_token")
         setIsAuthenticated(false)
         setUser(null)
         setIsLoading(false)
@@ -129,6 +131,7 @@ export function useAuth() {
 
         // IMPORTANT: Store authentication data in localStorage BEFORE updating state
         localStorage.setItem("token", data.token)
+        if (data.refresh_token) localStorage.setItem("refresh_token", data.refresh_token)
         localStorage.setItem("user", JSON.stringify(data.user))
 
         // Add flag to prevent redirect loops
@@ -190,13 +193,10 @@ export function useAuth() {
       if (token) {
         // Try to call logout endpoint
         try {
-          await fetch(ENDPOINTS.logout, {
+          // Revokes the refresh token too, so it can't outlive the session
+          await fetchWithAuth(ENDPOINTS.logout, {
             method: "POST",
-            headers: {
-              Authorization: `Token ${token}`,
-              "Content-Type": "application/json",
-            },
-            credentials: "include",
+            body: JSON.stringify({ refresh_token: localStorage.getItem("refresh_token") }),
           })
         } catch (error) {
           console.error("Logout API error:", error)
@@ -208,6 +208,7 @@ export function useAuth() {
     } finally {
       // Always clear local storage
       localStorage.removeItem("token")
+      localStorage.removeItem("refresh_token")
       localStorage.removeItem("user")
       localStorage.removeItem("intendedRole")
       localStorage.removeItem("justLoggedIn")
@@ -251,6 +252,7 @@ export function useAuth() {
       console.log("Registration success, received token and user data")
 
       localStorage.setItem("token", data.token)
+      if (data.refresh_token) localStorage.setItem("refresh_token", data.refresh_token)
       localStorage.setItem("user", JSON.stringify(data.user))
       localStorage.setItem("justLoggedIn", "true")
 
@@ -1,6 +1,42 @@
 // This file provides a consistent way to make authenticated requests
+import { ENDPOINTS } from "@/config/api"
 
-export async function fetchWithAuth(url: string, options: RequestInit = {}) {
+// Access tokens are short-lived; exchange the refresh token for a new one.
+// Concurrent requests that hit a 401 share a single refresh call.
+let refreshInFlight: Promise<string | null> | null = null
+
+export async function refreshAccessToken(): Promise<string | null> {
+  const refreshToken = localStorage.getItem("refresh_token")
+  if (!refreshToken) {
+    return null
+  }
+
+  if (!refreshInFlight) {
+    refreshInFlight = (async () => {
+      try {
+        const response = await fetch(ENDPOINTS.refreshToken, {
+          method: "POST",
+          headers: { "Content-Type": "application/json" },
+          body: JSON.stringify({ refresh_token: refreshToken }),
+        })
+        if (!response.ok) {
+          return null
+        }
+        const data = await response.json()
+        localStorage.setItem("token", data.token)
+        return data.token as string
+      } catch (error) {
+        console.error("Token refresh failed:", error)
+        return null
+      } finally {
+        refreshInFlight = null
+      }
+    })()
+  }
+  return refreshInFlight
+}
+
+export async function fetchWithAuth(url: string, options: RequestInit = {}, retried = false): Promise<Response> {
   const token = localStorage.getItem("token")
 
   // Create headers object
@@ -34,6 +70,11 @@ export async function fetchWithAuth(url: string, options: RequestInit = {}) {
     // Log response for debugging
     console.log(`API response from ${url}: ${response.status}`)
 
+    // An expired access token is refreshed once and the request retried
+    if (response.status === 401 && !retried && (await refreshAccessToken())) {
+      return fetchWithAuth(url, options, true)
+    }
+
     // Handle 401 Unauthorized errors
     if (response.status === 401) {
       console.error("Unauthorized request detected:", url)
@@ -54,6 +95,45 @@ export async function fetchWithAuth(url: string, options: RequestInit = {}) {
   }
 }
 
+// List endpoints return one page at a time, with the cursor for the next page
+// in the X-Next-Cursor header. This follows the cursors and answers with a
+// single response holding every item, so callers can keep treating lists as
+// one JSON array. Error and non-list responses are returned as they are.
+export async function fetchAllPages(
+  url: string,
+  options: RequestInit = {},
+  fetcher: (url: string, options?: RequestInit) => Promise<Response> = fetchWithAuth,
+): Promise<Response> {
+  const items: unknown[] = []
+  let pageUrl = url
+
+  while (true) {
+    const response = await fetcher(pageUrl, options)
+    if (!response.ok) {
+      return response
+    }
+
+    const page = await response.json()
+    if (!Array.isArray(page)) {
+      return new Response(JSON.stringify(page), { status: response.status, headers: response.headers })
+    }
+    items.push(...page)
+
+    const nextCursor = response.headers.get("X-Next-Cursor")
+    if (!nextCursor) {
+      break
+    }
+    const next = new URL(url, window.location.origin)
+    next.searchParams.set("after", nextCursor)
+    pageUrl = next.toString()
+  }
+
+  return new Response(JSON.stringify(items), {
+    status: 200,
+    headers: { "Content-Type": "application/json" },
+  })
+}
+
 // Special function for login that doesn't require authentication
 export async function fetchForLogin(url: string, options: RequestInit = {}) {
   // Create headers object
@@ -1,5 +1,6 @@
 import { clsx, type ClassValue } from "clsx"
 import { twMerge } from "tailwind-merge"
+import { fetchWithAuth as fetchWithRefresh } from "@/lib/auth"
 
 export function cn(...inputs: ClassValue[]) {
   return twMerge(clsx(inputs))
@@ -11,17 +12,12 @@ export async function fetchWithAuth(url: string, options: RequestInit = {}) {
     throw new Error("No authentication token found")
   }
 
-  const headers = new Headers(options.headers)
-  headers.set("Authorization", `Token ${token}`)
-  headers.set("Content-Type", "application/json")
-
-  const response = await fetch(url, {
-    ...options,
-    headers,
-  })
+  // Expired access tokens are refreshed by lib/auth
+  const response = await fetchWithRefresh(url, options)
 
   if (response.status === 401) {
     localStorage.removeItem("token")
+    localStorage.removeItem("refresh_token")
     localStorage.removeItem("user")
     window.location.href = "/login"
     throw new Error("Unauthorized")
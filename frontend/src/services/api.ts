@@ -1,8 +1,9 @@
 import { ENDPOINTS } from "@/config/api"
+import { fetchAllPages } from "@/lib/auth"
 import { fetchWithAuth } from "@/utils/api-helpers"
 
 export const getAppointments = async () => {
-  const response = await fetchWithAuth(ENDPOINTS.appointments())
+  const response = await fetchAllPages(ENDPOINTS.appointments(), {}, fetchWithAuth)
   return response.json()
 }
 
@@ -15,7 +16,7 @@ export const createAppointment = async (appointmentData: any) => {
 }
 
 export const getDoctors = async () => {
-  const response = await fetchWithAuth(ENDPOINTS.doctors())
+  const response = await fetchAllPages(ENDPOINTS.doctors(), {}, fetchWithAuth)
   return response.json()
 }
 
@@ -41,29 +42,11 @@ export const updateUserProfile = async (profileData: any) => {
 }
 
 export const uploadAvatar = async (formData: FormData) => {
-  const token = localStorage.getItem("token")
-  if (!token) {
-    throw new Error("No authentication token found")
-  }
-
-  const headers = new Headers()
-  headers.set("Authorization", `Token ${token}`)
-  // Don't set Content-Type for FormData
-
-  const response = await fetch(ENDPOINTS.avatarUpload, {
+  // Content-Type is left to the browser for FormData
+  const response = await fetchWithAuth(ENDPOINTS.avatarUpload, {
     method: "POST",
-    headers,
     body: formData,
-    credentials: "include",
   })
-
-  if (response.status === 401) {
-    localStorage.removeItem("token")
-    localStorage.removeItem("user")
-    window.location.href = "/login"
-    throw new Error("Unauthorized")
-  }
-
   return response.json()
 }
 
@@ -1,15 +1,13 @@
+import { fetchWithAuth } from "@/lib/auth"
+
 /**
  * Creates a patient record for a user (admin only)
  * This function should only be called by administrators
  */
 export async function createPatientRecord(token: string, userData: any) {
   try {
-    const response = await fetch(`http://localhost:8000/api/api/patients/`, {
+    const response = await fetchWithAuth(`http://localhost:8000/api/api/patients/`, {
       method: "POST",
-      headers: {
-        "Content-Type": "application/json",
-        Authorization: `Token ${token}`,
-      },
       body: JSON.stringify({
         name: `${userData.first_name || ""} ${userData.last_name || ""}`.trim(),
         email: userData.email,
@@ -1,10 +1,15 @@
 import { API_BASE_URL } from "@/config/api"
+import { fetchAllPages, fetchWithAuth as fetchWithRefresh } from "@/lib/auth"
 
 /**
  * Helper function to ensure URLs have trailing slashes
  */
 export function ensureTrailingSlash(url: string) {
-  return url.endsWith("/") ? url : `${url}/`
+  // The slash belongs at the end of the path, before any query string
+  const queryStart = url.indexOf("?")
+  const path = queryStart === -1 ? url : url.slice(0, queryStart)
+  const query = queryStart === -1 ? "" : url.slice(queryStart)
+  return (path.endsWith("/") ? path : `${path}/`) + query
 }
 
 /**
@@ -19,24 +24,14 @@ export async function fetchWithAuth(url: string, options: RequestInit = {}) {
   // Ensure URL has trailing slash for Django
   const urlWithSlash = ensureTrailingSlash(url)
 
-  const headers = new Headers(options.headers)
-  // Use Bearer format for MongoDB JWT authentication
-  headers.set("Authorization", `Bearer ${token}`)
-
-  // Set Content-Type if not already set and we have a body
-  if (!headers.has("Content-Type") && options.body) {
-    headers.set("Content-Type", "application/json")
-  }
-
   try {
-    const response = await fetch(urlWithSlash, {
-      ...options,
-      headers,
-    })
+    // Expired access tokens are refreshed by lib/auth
+    const response = await fetchWithRefresh(urlWithSlash, options)
 
     if (response.status === 401) {
-      // Token expired or invalid, redirect to login
+      // Refresh token expired or revoked, redirect to login
       localStorage.removeItem("token")
+      localStorage.removeItem("refresh_token")
       localStorage.removeItem("user")
       window.location.href = "/login"
       throw new Error("Unauthorized")
@@ -86,7 +81,7 @@ export async function getPatientByUserId(userId: string) {
     // First try to get the patient by querying with user_id parameter
     const url = ensureTrailingSlash(`${API_BASE_URL}/api/api/patients`) + `?user_id=${userId}`
 
-    const response = await fetchWithAuth(url)
+    const response = await fetchAllPages(url, {}, fetchWithAuth)
 
     if (!response.ok) {
       if (response.status === 404) {
@@ -196,19 +191,8 @@ export async function updatePatientMedicalInfo(patientId: string, medicalData: a
     const url = ensureTrailingSlash(`${API_BASE_URL}/api/api/patients/${patientId}`)
     console.log("Sending PATCH request to:", url)
 
-    // Get token directly for more explicit control
-    const token = localStorage.getItem("token")
-    if (!token) {
-      throw new Error("No authentication token found")
-    }
-
-    // Make a direct fetch call with detailed logging
-    const response = await fetch(url, {
+    const response = await fetchWithAuth(url, {
       method: "PATCH",
-      headers: {
-        "Content-Type": "application/json",
-        Authorization: `Bearer ${token}`,
-      },
       body: JSON.stringify(formattedData),
     })
 
@@ -1,4 +1,4 @@
-import { fetchWithAuth } from "@/lib/auth"
+import { fetchAllPages, fetchWithAuth } from "@/lib/auth"
 
 /**
  * Helper function to handle API responses
@@ -70,8 +70,8 @@ export async function fetchApi(url: string, options: RequestInit = {}) {
   }
 }
 
-// Re-export fetchWithAuth from lib/auth
-export { fetchWithAuth }
+// Re-export fetchWithAuth and fetchAllPages from lib/auth
+export { fetchAllPages, fetchWithAuth }
 
 // Define ENDPOINTS here or import it from a config file
 const ENDPOINTS = {
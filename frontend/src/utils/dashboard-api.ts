@@ -1,4 +1,5 @@
 // Utility functions for fetching dashboard data
+import { fetchAllPages, fetchWithAuth as fetchWithRefresh } from "@/lib/auth"
 
 // Define the base URL for API endpoints
 const API_BASE_URL = process.env.NEXT_PUBLIC_API_URL || "http://localhost:8000"
@@ -22,19 +23,8 @@ export async function fetchWithAuth(url: string, options = {}) {
       throw new Error("Authentication required")
     }
 
-    // Use Bearer format for MongoDB JWT authentication
-    const authHeader = `Bearer ${token}`
-    console.log(`Using auth header: ${authHeader.substring(0, 15)}...`)
-
-    const response = await fetch(url, {
-      ...options,
-      headers: {
-        "Content-Type": "application/json",
-        Authorization: authHeader,
-        ...(options as any).headers,
-      },
-      credentials: "include",
-    })
+    // Expired access tokens are refreshed by lib/auth
+    const response = await fetchWithRefresh(url, options)
 
     if (!response.ok) {
       const errorText = await response.text()
@@ -51,7 +41,7 @@ export async function fetchWithAuth(url: string, options = {}) {
 
 export async function fetchPatients() {
   try {
-    const response = await fetchWithAuth(`${API_BASE_URL}/api/api/patients/`)
+    const response = await fetchAllPages(`${API_BASE_URL}/api/api/patients/`, {}, fetchWithAuth)
     const data = await response.json()
     return Array.isArray(data) ? data.length : 0
   } catch (error) {
@@ -62,7 +52,7 @@ export async function fetchPatients() {
 
 export async function fetchDoctors() {
   try {
-    const response = await fetchWithAuth(`${API_BASE_URL}/api/api/doctors/`)
+    const response = await fetchAllPages(`${API_BASE_URL}/api/api/doctors/`, {}, fetchWithAuth)
     const data = await response.json()
     return Array.isArray(data) ? data.length : 0
   } catch (error) {
@@ -73,7 +63,7 @@ export async function fetchDoctors() {
 
 export async function fetchAppointments() {
   try {
-    const response = await fetchWithAuth(`${API_BASE_URL}/api/api/appointments/`)
+    const response = await fetchAllPages(`${API_BASE_URL}/api/api/appointments/`, {}, fetchWithAuth)
     const data = await response.json()
 
     // If data is an array, calculate stats
@@ -130,7 +120,7 @@ export async function fetchAppointmentStats() {
     const appointmentsUrl = `${API_BASE_URL}/api/api/appointments/`
     console.log("Appointments URL:", appointmentsUrl)
 
-    const response = await fetchWithAuth(appointmentsUrl)
+    const response = await fetchAllPages(appointmentsUrl, {}, fetchWithAuth)
 
     if (!response.ok) {
       throw new Error(`Failed to fetch appointments: ${response.status}`)
@@ -323,7 +313,7 @@ export async function fetchAppointmentCount() {
     }
 
     // If all else fails, try to get all appointments and count them
-    const response = await fetchWithAuth(`${API_BASE_URL}/api/api/appointments/`)
+    const response = await fetchAllPages(`${API_BASE_URL}/api/api/appointments/`, {}, fetchWithAuth)
     const data = await response.json()
 
     if (Array.isArray(data)) {
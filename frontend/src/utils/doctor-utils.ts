@@ -1,3 +1,5 @@
+import { fetchAllPages } from "@/lib/auth"
+
 /**
  * Utility function to get the doctor's actual ID (not user_id)
  * This fetches the doctor profile to get the actual ID
@@ -29,12 +31,7 @@ export async function getDoctorId(): Promise<string | null> {
 
     // Fetch the doctors list to find the doctor with matching user_id
     const apiBaseUrl = process.env.NEXT_PUBLIC_API_URL || "http://localhost:8000"
-    const response = await fetch(`${apiBaseUrl}/api/api/doctors/`, {
-      headers: {
-        Authorization: `Token ${token}`,
-        "Content-Type": "application/json",
-      },
-    })
+    const response = await fetchAllPages(`${apiBaseUrl}/api/api/doctors/`)
 
     if (!response.ok) {
       console.error("Failed to fetch doctors list:", response.status)